@@ -0,0 +1,31 @@
+"""Performance benchmarks of papis, they are not part of the package
+and are run from the root of the repository, e.g.
+
+.. code:: shell
+
+    python -m benchmarks.picker --help
+    python -m benchmarks.suite --help
+
+"""
+
+
+def summarize(values):
+    """Summarize a list of times in seconds as milliseconds.
+
+    >>> summarize([0.001, 0.003, 0.002])
+    {'count': 3, 'mean': 2.0, 'min': 1.0, 'p50': 2.0, 'p95': 3.0, 'max': 3.0}
+    """
+    count = len(values)
+    values = sorted(values) or [0]
+
+    def percentile(p):
+        return values[min(len(values) - 1, int(p * len(values)))]
+
+    return {
+        'count': count,
+        'mean': round(1000 * sum(values) / len(values), 3),
+        'min': round(1000 * values[0], 3),
+        'p50': round(1000 * percentile(0.5), 3),
+        'p95': round(1000 * percentile(0.95), 3),
+        'max': round(1000 * values[-1], 3),
+    }
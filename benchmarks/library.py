@@ -0,0 +1,247 @@
+"""Generator of synthetic libraries for the benchmarks.
+
+The libraries are deterministic, i.e., the same ``size`` and ``seed``
+always give the same documents, byte by byte, so that the benchmarks of
+different commits run on the same data. Every document gets a folder with
+an ``info.yaml`` file with the fields usually found in papis libraries,
+e.g., authors, tags, an abstract and citations, and a small dummy pdf.
+
+The libraries are written by hand instead of with :mod:`yaml`, which makes
+the generation of large libraries several times faster; the strings are
+written as json strings, which are valid yaml.
+
+Examples
+^^^^^^^^
+
+.. code:: shell
+
+    python -m benchmarks.library -n 10000 /tmp/library
+
+"""
+import json
+import os
+import random
+
+import click
+
+#: Version of the generator, it changes whenever the libraries change.
+VERSION = 1
+
+#: Name of the file marking a complete library, with the version,
+#: the size and the seed.
+STAMP_NAME = '.papis-benchmark-library'
+
+_GIVEN = (
+    'Albert Niels Werner Paul Richard Marie Max Emmy Erwin Wolfgang Max '
+    'Enrico Lev Hideki John Lise Chien-Shiung Satyendra Subrahmanyan Vera'
+).split()
+_FAMILY = (
+    'Einstein Bohr Heisenberg Dirac Feynman Curie Planck Noether '
+    'Schrodinger Pauli Born Fermi Landau Yukawa Wheeler Meitner Wu Bose '
+    'Chandrasekhar Rubin Müller García Ørsted'
+).split()
+_WORDS = (
+    'quantum field theory relativity electron spin lattice gauge symmetry '
+    'entropy gravity wave particle matrix operator boson fermion string '
+    'vacuum energy density cosmology neutrino scattering amplitude '
+    'renormalization topology superconductivity magnetic dark matter '
+    'inflation black hole horizon thermodynamics statistical mechanics'
+).split()
+_JOURNALS = [
+    'Physical Review Letters', 'Physical Review D', 'Annalen der Physik',
+    'Nature Physics', 'Journal of High Energy Physics',
+    'Communications in Mathematical Physics', 'Reviews of Modern Physics',
+]
+_TAGS = (
+    'qft gr cosmology condensed-matter hep-th hep-ph review classic '
+    'to-read numerics experiment lecture-notes'
+).split()
+_TYPES = ['article', 'article', 'article', 'book', 'inproceedings', 'misc']
+
+# A minimal pdf, so that papis recognizes the files as pdfs
+_PDF = (
+    b'%PDF-1.4\n1 0 obj<</Type/Catalog/Pages 2 0 R>>endobj\n'
+    b'2 0 obj<</Type/Pages/Kids[]/Count 0>>endobj\n'
+    b'trailer<</Root 1 0 R>>\n%%EOF\n'
+)
+
+
+def _sentence(rng, low, high):
+    return ' '.join(rng.choice(_WORDS) for _ in range(rng.randint(low, high)))
+
+
+def make_document_data(i, seed=0):
+    """Make the data of the ``i``-th document of a synthetic library.
+
+    :param i: Number of the document
+    :type  i: int
+    :param seed: Seed of the library
+    :type  seed: int
+    :returns: Dictionary with the data of the document
+    :rtype:  dict
+
+    >>> make_document_data(3) == make_document_data(3)
+    True
+    >>> make_document_data(3)['doi']
+    '10.5555/synthetic.0.3'
+    """
+    rng = random.Random('{0}-{1}'.format(seed, i))
+    authors = [
+        dict(given=rng.choice(_GIVEN), family=rng.choice(_FAMILY))
+        for _ in range(rng.choice([1, 1, 2, 2, 3, 4, 8]))
+    ]
+    year = rng.randint(1900, 2019)
+    title = _sentence(rng, 3, 12).capitalize()
+    data = dict()
+    data['author'] = ' and '.join(
+        '{family}, {given}'.format(**a) for a in authors)
+    data['author_list'] = authors
+    data['title'] = title
+    data['year'] = year
+    data['type'] = rng.choice(_TYPES)
+    data['journal'] = rng.choice(_JOURNALS)
+    data['volume'] = rng.randint(1, 120)
+    data['pages'] = '{0}--{1}'.format(*sorted(rng.sample(range(1, 999), 2)))
+    data['doi'] = '10.5555/synthetic.{0}.{1}'.format(seed, i)
+    data['url'] = 'https://example.org/papers/{0}/{1}'.format(seed, i)
+    data['tags'] = ' '.join(sorted(rng.sample(_TAGS, rng.randint(0, 3))))
+    data['abstract'] = '. '.join(
+        _sentence(rng, 8, 20).capitalize()
+        for _ in range(rng.randint(2, 6))) + '.'
+    data['citations'] = [
+        dict(
+            doi='10.5555/synthetic.{0}.{1}'.format(
+                seed, rng.randint(0, max(0, i - 1))),
+            title=_sentence(rng, 3, 8).capitalize()
+        )
+        for _ in range(rng.choice([0, 0, 1, 3, 10, 25]))
+    ]
+    data['ref'] = '{0}{1}{2}'.format(authors[0]['family'], year, i)
+    data['time-added'] = '{0}-{1:02}-{2:02}-12:00:{3:02}'.format(
+        2015 + i % 5, 1 + i % 12, 1 + i % 28, i % 60)
+    data['files'] = ['paper.pdf']
+    return data
+
+
+def _dump(value):
+    return json.dumps(value, ensure_ascii=False)
+
+
+def to_yaml(data):
+    """Write the data of a document as yaml, in the order of the keys.
+
+    :param data: Data made by :func:`make_document_data`
+    :type  data: dict
+    :returns: Yaml
+    :rtype:  str
+
+    >>> import yaml
+    >>> data = make_document_data(5)
+    >>> yaml.safe_load(to_yaml(data)) == data
+    True
+    """
+    lines = []
+    for key, value in data.items():
+        if isinstance(value, list) and value and isinstance(value[0], dict):
+            lines.append('{0}:'.format(key))
+            for item in value:
+                prefix = '- '
+                for item_key, item_value in item.items():
+                    lines.append('{0}{1}: {2}'.format(
+                        prefix, item_key, _dump(item_value)))
+                    prefix = '  '
+        else:
+            lines.append('{0}: {1}'.format(key, _dump(value)))
+    return '\n'.join(lines) + '\n'
+
+
+def get_folder_name(i):
+    """Get the folder of the ``i``-th document relative to the library,
+    the documents are spread over folders of at most 1000 documents,
+    as they would in a library organized by e.g. authors.
+
+    >>> get_folder_name(12345)
+    '12/12345'
+    """
+    return os.path.join(str(i // 1000), str(i))
+
+
+def make_library(folder, size, seed=0):
+    """Write a synthetic library with ``size`` documents in ``folder``.
+
+    If ``folder`` already has a complete library with the same version of
+    the generator, size and seed, nothing is written.
+
+    :param folder: Folder of the library
+    :type  folder: str
+    :param size: Number of documents
+    :type  size: int
+    :param seed: Seed of the library
+    :type  seed: int
+    :returns: ``folder``
+    :rtype:  str
+    """
+    stamp = _dump(dict(version=VERSION, size=size, seed=seed))
+    stamp_path = os.path.join(folder, STAMP_NAME)
+    if os.path.exists(stamp_path):
+        with open(stamp_path) as fd:
+            if fd.read() == stamp:
+                return folder
+        raise click.ClickException(
+            '{0} has another library, remove it first'.format(folder))
+    if os.path.exists(folder) and os.listdir(folder):
+        raise click.ClickException(
+            '{0} exists and is not a library'.format(folder))
+    for i in range(size):
+        document_folder = os.path.join(folder, get_folder_name(i))
+        os.makedirs(document_folder)
+        with open(os.path.join(document_folder, 'info.yaml'), 'w',
+                  encoding='utf-8') as fd:
+            fd.write(to_yaml(make_document_data(i, seed)))
+        with open(os.path.join(document_folder, 'paper.pdf'), 'wb') as fd:
+            fd.write(_PDF)
+    with open(stamp_path, 'w') as fd:
+        fd.write(stamp)
+    return folder
+
+
+def get_library(size, seed=0, folder=None):
+    """Get a synthetic library, it is generated the first time in
+    ``folder``, by default in the cache folder of the benchmarks, and
+    reused afterwards.
+
+    :param size: Number of documents
+    :type  size: int
+    :param seed: Seed of the library
+    :type  seed: int
+    :param folder: Folder where the libraries are kept
+    :type  folder: str
+    :returns: Folder of the library
+    :rtype:  str
+    """
+    if folder is None:
+        folder = os.path.join(
+            os.environ.get('XDG_CACHE_HOME', os.path.expanduser('~/.cache')),
+            'papis-benchmarks'
+        )
+    return make_library(
+        os.path.join(
+            folder, 'library-v{0}-{1}-{2}'.format(VERSION, size, seed)),
+        size, seed
+    )
+
+
+@click.command()
+@click.help_option('--help', '-h')
+@click.argument('folder', type=click.Path(file_okay=False))
+@click.option(
+    '-n', '--size', default=1000, type=int, help='Number of documents')
+@click.option('--seed', default=0, type=int, help='Seed of the library')
+def cli(folder, size, seed):
+    """Write a synthetic library to FOLDER"""
+    make_library(folder, size, seed)
+    click.echo('{0} documents in {1}'.format(size, folder))
+
+
+if __name__ == '__main__':
+    cli()
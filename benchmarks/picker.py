@@ -0,0 +1,292 @@
+"""Benchmark of the picker without a terminal.
+
+The :class:`papis.tui.app.Picker` is run on a synthetic list of options
+with a pipe as input and a dummy output, and the keys of a script are sent
+to it one by one. For every list size it reports
+
+- the time to construct the picker, to draw its first frame and to load
+  all the options,
+- for every key, the time until the options are filtered and the time
+  until the result is drawn,
+- the time to render a frame, and
+- the memory of the process.
+
+Examples
+^^^^^^^^
+
+.. code:: shell
+
+    python -m benchmarks.picker
+    python -m benchmarks.picker -n 1000 -n 200000 --query 'ein 19'
+    python -m benchmarks.picker --match-mode fuzzy --json > fuzzy.json
+
+"""
+import asyncio
+import contextlib
+import json
+import random
+import resource
+import sys
+import time
+import tracemalloc
+
+import click
+
+from benchmarks import summarize
+
+import papis.config
+from papis.tui.app import Picker
+
+from prompt_toolkit.application import create_app_session
+from prompt_toolkit.input import create_pipe_input
+from prompt_toolkit.output import DummyOutput
+
+#: Default sizes of the lists of options.
+SIZES = [1000, 10000, 100000, 200000]
+
+#: Keys for deleting a character and moving down in the picker.
+BACKSPACE = '\x7f'
+MOVE_DOWN = '\x0e'
+
+#: Seconds to wait for the picker to react to a key.
+TIMEOUT = 60
+
+_WORDS = (
+    'quantum field theory relativity electron spin lattice gauge '
+    'symmetry entropy gravity wave particle matrix operator boson '
+    'fermion string vacuum energy density cosmology neutrino'
+).split()
+_AUTHORS = (
+    'Einstein Bohr Heisenberg Dirac Feynman Curie Planck Noether '
+    'Schrodinger Pauli Born Fermi Landau Yukawa Wheeler'
+).split()
+
+
+def make_options(size, seed=0):
+    """Make a list of options that look like the headers of documents.
+
+    :param size: Number of options
+    :type  size: int
+    :param seed: Seed of the random generator, the same seed gives
+        the same options
+    :type  seed: int
+    :returns: List of strings
+    :rtype:  list
+
+    >>> make_options(2) == make_options(2)
+    True
+    >>> len(make_options(3))
+    3
+    """
+    rng = random.Random(seed)
+    return [
+        '{0} - {1} ({2})'.format(
+            ', '.join(rng.sample(_AUTHORS, rng.randint(1, 3))),
+            ' '.join(rng.choice(_WORDS) for _ in range(rng.randint(3, 9))),
+            rng.randint(1900, 2019)
+        )
+        for _ in range(size)
+    ]
+
+
+def get_queries(keys):
+    """Get the text of the search buffer after every key of a script.
+
+    :param keys: Keys sent to the picker
+    :type  keys: str
+    :returns: List of queries, None after keys that do not change the query
+    :rtype:  list
+
+    >>> get_queries('ab' + BACKSPACE + MOVE_DOWN)
+    ['a', 'ab', 'a', None]
+    """
+    query = ''
+    queries = []
+    for key in keys:
+        if key == BACKSPACE:
+            query = query[:-1]
+        elif key == MOVE_DOWN:
+            queries.append(None)
+            continue
+        else:
+            query += key
+        queries.append(query)
+    return queries
+
+
+@contextlib.contextmanager
+def pipe_input():
+    inp = create_pipe_input()
+    if hasattr(inp, 'send_text'):
+        # prompt_toolkit < 3.0.29 returns the input itself
+        try:
+            yield inp
+        finally:
+            inp.close()
+    else:
+        with inp as inp:
+            yield inp
+
+
+async def _wait_for(condition):
+    start = time.perf_counter()
+    while not condition():
+        if time.perf_counter() - start > TIMEOUT:
+            raise TimeoutError('the picker did not react in time')
+        await asyncio.sleep(0.0005)
+
+
+async def _drive(picker, inp, keys, results):
+    options_list = picker.options_list
+    state = {'frame': 0, 'query': None, 'index': None, 'searched': None}
+    frame_times = []
+
+    def before_render(_):
+        state['frame_start'] = time.perf_counter()
+
+    def after_render(_):
+        frame_times.append(time.perf_counter() - state['frame_start'])
+        state['frame'] += 1
+        state['query'] = options_list.last_query_text
+        state['index'] = options_list.current_index
+
+    def search_done(_):
+        state['searched'] = time.perf_counter()
+
+    # the handlers of the picker run before these ones, so the results of
+    # the searches are applied when the frame starts being timed
+    picker.before_render += before_render
+    picker.after_render += after_render
+    options_list.on_search_done += search_done
+
+    start = results['start']
+    task = asyncio.ensure_future(picker.run_async())
+    await _wait_for(lambda: state['frame'] > 0)
+    results['first_frame'] = time.perf_counter() - start
+    await _wait_for(lambda: not options_list.loading)
+    picker.invalidate()
+    await _wait_for(lambda: len(options_list.options) == results['size'])
+    results['loaded'] = time.perf_counter() - start
+
+    filter_times, visible_times, move_times = [], [], []
+    for key, query in zip(keys, get_queries(keys)):
+        index = options_list.current_index
+        state['searched'] = None
+        sent = time.perf_counter()
+        inp.send_text(key)
+        if query is None:
+            await _wait_for(lambda: state['index'] != index)
+            move_times.append(time.perf_counter() - sent)
+            continue
+        await _wait_for(lambda: state['query'] == query)
+        visible_times.append(time.perf_counter() - sent)
+        if state['searched'] is not None:
+            filter_times.append(state['searched'] - sent)
+
+    picker.exit()
+    await task
+    results['filter'] = summarize(filter_times)
+    results['visible'] = summarize(visible_times)
+    results['move'] = summarize(move_times)
+    results['frame'] = summarize(frame_times)
+    results['frames'] = len(frame_times)
+
+
+def run_benchmark(size, keys, match_mode='regex', trace_memory=False):
+    """Run the picker on ``size`` synthetic options and send it ``keys``.
+
+    :param size: Number of options
+    :type  size: int
+    :param keys: Keys sent to the picker one by one, see :func:`get_queries`
+    :type  keys: str
+    :param match_mode: ``match_mode`` setting of the picker
+    :type  match_mode: str
+    :param trace_memory: Trace the memory allocated by python, this makes
+        everything slower
+    :type  trace_memory: bool
+    :returns: Dictionary with the times in milliseconds and the memory
+        in MiB
+    :rtype:  dict
+    """
+    options = make_options(size)
+    papis.config.set('match_mode', match_mode, section='tui')
+    results = {'size': size, 'match_mode': match_mode}
+    if trace_memory:
+        tracemalloc.start()
+    with pipe_input() as inp:
+        with create_app_session(input=inp, output=DummyOutput()):
+            results['start'] = time.perf_counter()
+            picker = Picker(options)
+            results['construct'] = time.perf_counter() - results['start']
+            try:
+                asyncio.run(_drive(picker, inp, keys, results))
+            finally:
+                picker.close()
+    if trace_memory:
+        results['traced_peak'] = round(
+            tracemalloc.get_traced_memory()[1] / 2**20, 1
+        )
+        tracemalloc.stop()
+    # linux gives the maximum resident size in KiB, macos in bytes
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    results['max_rss'] = round(
+        max_rss / (2**20 if sys.platform == 'darwin' else 2**10), 1
+    )
+    del results['start']
+    for key in ['construct', 'first_frame', 'loaded']:
+        results[key] = round(1000 * results[key], 3)
+    return results
+
+
+def format_results(results):
+    """Format the results of :func:`run_benchmark` as a line of text."""
+    return (
+        '{size:>7} options  construct {construct:9.1f} ms  '
+        'first frame {first_frame:9.1f} ms  loaded {loaded:9.1f} ms\n'
+        '        filter  mean {filter[mean]:8.1f} ms  '
+        'p95 {filter[p95]:8.1f} ms  max {filter[max]:8.1f} ms\n'
+        '        visible mean {visible[mean]:8.1f} ms  '
+        'p95 {visible[p95]:8.1f} ms  max {visible[max]:8.1f} ms\n'
+        '        frame   mean {frame[mean]:8.1f} ms  '
+        'p95 {frame[p95]:8.1f} ms  max {frame[max]:8.1f} ms  '
+        '({frames} frames)\n'
+        '        max rss {max_rss:.1f} MiB'
+    ).format(**results)
+
+
+@click.command()
+@click.option(
+    '-n', '--size', 'sizes', multiple=True, type=int,
+    help='Number of options, it can be given several times '
+    '(default: {0})'.format(', '.join(map(str, SIZES))))
+@click.option(
+    '--query', default='einstein gauge',
+    help='Query typed in the picker, character by character')
+@click.option(
+    '--backspaces', default=4, type=int,
+    help='Characters deleted after typing the query')
+@click.option(
+    '--moves', default=10, type=int,
+    help='Moves down in the list at the end')
+@click.option(
+    '--match-mode', default='regex', type=click.Choice(['regex', 'fuzzy']),
+    help='Matching mode of the picker')
+@click.option(
+    '--trace-memory', is_flag=True,
+    help='Report the peak of the memory traced by python (slower)')
+@click.option(
+    '--json', 'as_json', is_flag=True,
+    help='Print the results as json, one line per size')
+def cli(sizes, query, backspaces, moves, match_mode, trace_memory, as_json):
+    """Benchmark the picker without a terminal"""
+    keys = query + BACKSPACE * backspaces + MOVE_DOWN * moves
+    for size in sizes or SIZES:
+        results = run_benchmark(size, keys, match_mode, trace_memory)
+        if as_json:
+            click.echo(json.dumps(results, sort_keys=True))
+        else:
+            click.echo(format_results(results))
+
+
+if __name__ == '__main__':
+    cli()
@@ -0,0 +1,449 @@
+"""Benchmarks of the main operations of papis on synthetic libraries.
+
+Every benchmark runs on a library made by :mod:`benchmarks.library`, which
+is generated once per size and reused, so that the results of different
+commits are comparable. The benchmarks are
+
+- ``crawl``: Looking for the documents in the library,
+  :func:`papis.utils.get_folders`,
+- ``parse``: Reading the documents, :func:`papis.utils.folders_to_documents`,
+- ``cache.save`` and ``cache.load``: Writing and reading the cache of the
+  ``papis`` database,
+- ``query.*``: Filtering and ranking the documents with the queries of the
+  ``papis`` database,
+- ``whoosh.index`` and ``whoosh.search``: Building the ``whoosh`` index
+  and querying it,
+- ``export.*``: Exporting all the documents,
+- ``picker.options`` and ``picker.filter``: Making the options of the
+  picker and filtering them.
+
+The results are written as one line of json per library size, together
+with the commit, the versions and the machine they were taken on, and
+two result files can be compared with ``compare``.
+
+Examples
+^^^^^^^^
+
+.. code:: shell
+
+    python -m benchmarks.suite run -o before.json
+    git checkout my-branch
+    python -m benchmarks.suite run -o after.json
+    python -m benchmarks.suite compare before.json after.json
+
+    python -m benchmarks.suite run -n 1000 -b 'query.*' -b crawl
+
+"""
+import collections
+import fnmatch
+import json
+import os
+import platform
+import shutil
+import subprocess
+import tempfile
+import time
+
+import click
+
+from benchmarks import summarize
+from benchmarks.library import VERSION, get_library
+
+import papis
+import papis.config
+import papis.library
+import papis.utils
+
+#: Default sizes of the libraries.
+SIZES = [1000, 10000, 100000]
+
+#: Registered benchmarks, see :func:`benchmark`.
+BENCHMARKS = collections.OrderedDict()
+
+#: Queries of the ``query.*`` and ``picker.filter`` benchmarks.
+QUERIES = collections.OrderedDict([
+    ('author', 'author = einstein'),
+    ('words', 'quantum field'),
+    ('year', 'year = 1990'),
+])
+
+
+class Context(object):
+    """What the benchmarks of a library share, the documents are only
+    read the first time they are needed.
+
+    :param folder: Folder of the library
+    :type  folder: str
+    :param work_dir: Folder for the caches and the indices
+    :type  work_dir: str
+    """
+
+    def __init__(self, folder, work_dir):
+        self.folder = folder
+        self.work_dir = work_dir
+        self.library = papis.library.Library(
+            'benchmark-' + os.path.basename(folder), [folder])
+        self._folders = None
+        self._documents = None
+
+    @property
+    def folders(self):
+        if self._folders is None:
+            self._folders = papis.utils.get_folders(self.folder)
+        return self._folders
+
+    @property
+    def documents(self):
+        if self._documents is None:
+            self._documents = papis.utils.folders_to_documents(self.folders)
+        return self._documents
+
+    def make_cache_dir(self):
+        """Point the ``cache-dir`` setting to a new folder, so that the
+        databases start from scratch.
+        """
+        path = tempfile.mkdtemp(dir=self.work_dir)
+        papis.config.set('cache-dir', path)
+        return path
+
+
+def benchmark(name):
+    """Register a benchmark. The decorated function gets a :class:`Context`
+    and returns the function to be timed, so that what is done to prepare
+    the benchmark is not timed. It can raise :class:`ImportError` to be
+    skipped.
+
+    :param name: Name of the benchmark
+    :type  name: str
+    """
+    def decorator(function):
+        BENCHMARKS[name] = function
+        return function
+    return decorator
+
+
+@benchmark('crawl')
+def bench_crawl(ctx):
+    return lambda: papis.utils.get_folders(ctx.folder)
+
+
+@benchmark('parse')
+def bench_parse(ctx):
+    folders = ctx.folders
+    return lambda: papis.utils.folders_to_documents(folders)
+
+
+@benchmark('cache.save')
+def bench_cache_save(ctx):
+    import papis.database.cache
+    ctx.make_cache_dir()
+    database = papis.database.cache.Database(ctx.library)
+    database.documents = ctx.documents
+    return database.save
+
+
+@benchmark('cache.load')
+def bench_cache_load(ctx):
+    import papis.database.cache
+    ctx.make_cache_dir()
+    database = papis.database.cache.Database(ctx.library)
+    database.documents = ctx.documents
+    database.save()
+
+    def load():
+        papis.database.cache.Database(ctx.library).get_documents()
+    return load
+
+
+def _bench_query(query, rank=False):
+    def bench(ctx):
+        import papis.database.cache
+        documents = ctx.documents
+        if rank:
+            return lambda: papis.database.cache.rank_documents(
+                documents, query, limit=20)
+        return lambda: papis.database.cache.filter_documents(
+            documents, query)
+    return bench
+
+
+for _name, _query in QUERIES.items():
+    benchmark('query.' + _name)(_bench_query(_query))
+benchmark('query.ranked')(_bench_query(QUERIES['words'], rank=True))
+
+
+@benchmark('whoosh.index')
+def bench_whoosh_index(ctx):
+    import papis.database.whoosh
+
+    def index():
+        ctx.make_cache_dir()
+        papis.database.whoosh.Database(ctx.library)
+    return index
+
+
+@benchmark('whoosh.search')
+def bench_whoosh_search(ctx):
+    import papis.database.whoosh
+    ctx.make_cache_dir()
+    database = papis.database.whoosh.Database(ctx.library)
+    return lambda: database.query('author:einstein')
+
+
+def _bench_export(to_format):
+    def bench(ctx):
+        import papis.commands.export
+        documents = ctx.documents
+        return lambda: papis.commands.export.run(documents, to_format)
+    return bench
+
+
+for _format in ['bibtex', 'yaml', 'json']:
+    benchmark('export.' + _format)(_bench_export(_format))
+
+
+def _make_options_list(documents):
+    from papis.tui.widgets.list import OptionsList
+    header_format = papis.config.get('header-format')
+    match_format = papis.config.get('match-format')
+    return OptionsList(
+        documents,
+        header_filter=lambda d: papis.utils.format_doc(header_format, d),
+        match_filter=lambda d: papis.utils.format_doc(match_format, d)
+    )
+
+
+@benchmark('picker.options')
+def bench_picker_options(ctx):
+    documents = ctx.documents
+    # import the picker before the timing
+    _make_options_list(documents[:1])
+    return lambda: _make_options_list(documents)
+
+
+@benchmark('picker.filter')
+def bench_picker_filter(ctx):
+    options_list = _make_options_list(ctx.documents)
+    indices = list(range(len(ctx.documents)))
+    query = QUERIES['words']
+    return lambda: options_list.match_indices(query, indices)
+
+
+def get_environment():
+    """Get what the results depend on besides the code, and the commit
+    of the code if papis runs from a git repository.
+
+    :returns: Dictionary
+    :rtype:  dict
+    """
+    environment = dict(
+        papis=papis.__version__,
+        python=platform.python_version(),
+        platform=platform.platform(),
+        machine=platform.machine(),
+        cpus=os.cpu_count(),
+        library_version=VERSION,
+        commit=None,
+        dirty=None,
+    )
+    root = os.path.dirname(os.path.dirname(os.path.abspath(papis.__file__)))
+    try:
+        environment['commit'] = subprocess.check_output(
+            ['git', 'rev-parse', 'HEAD'], cwd=root,
+            stderr=subprocess.DEVNULL, universal_newlines=True).strip()
+        environment['dirty'] = bool(subprocess.check_output(
+            ['git', 'status', '--porcelain', '--untracked-files=no'],
+            cwd=root, stderr=subprocess.DEVNULL, universal_newlines=True))
+    except (OSError, subprocess.CalledProcessError):
+        pass
+    return environment
+
+
+def select(patterns):
+    """Get the names of the benchmarks matching any of the shell style
+    ``patterns``, all of them if there are no patterns.
+
+    >>> select(['query.*', 'crawl'])
+    ['crawl', 'query.author', 'query.words', 'query.year', 'query.ranked']
+    """
+    return [
+        name for name in BENCHMARKS
+        if not patterns or any(fnmatch.fnmatch(name, p) for p in patterns)
+    ]
+
+
+def time_function(function, repeat, max_time):
+    """Time ``function`` ``repeat`` times, or less if the runs take
+    more than ``max_time`` seconds in total.
+
+    :returns: List of times in seconds
+    :rtype:  list
+    """
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+        if sum(times) > max_time:
+            break
+    return times
+
+
+def run_suite(size, names, seed=0, repeat=5, max_time=10, library_dir=None,
+              echo=lambda message: None):
+    """Run the benchmarks ``names`` on a library of ``size`` documents.
+
+    :param size: Number of documents
+    :type  size: int
+    :param names: Names of the benchmarks, see :func:`select`
+    :type  names: list
+    :param seed: Seed of the library
+    :type  seed: int
+    :param repeat: Maximum number of runs of every benchmark
+    :type  repeat: int
+    :param max_time: Seconds after which a benchmark is not run again
+    :type  max_time: float
+    :param library_dir: Folder where the libraries are kept
+    :type  library_dir: str
+    :param echo: Function called with the progress
+    :returns: Dictionary with the environment, the size and the times in
+        milliseconds of every benchmark, see :func:`benchmarks.summarize`,
+        or ``None`` for the skipped benchmarks
+    :rtype:  dict
+    """
+    echo('Generating library of {0} documents'.format(size))
+    folder = get_library(size, seed, library_dir)
+    work_dir = tempfile.mkdtemp(prefix='papis-benchmarks-')
+    cache_dir = papis.config.get('cache-dir')
+    results = dict(get_environment(), size=size, seed=seed, benchmarks={})
+    try:
+        ctx = Context(folder, work_dir)
+        for name in names:
+            try:
+                function = BENCHMARKS[name](ctx)
+            except ImportError as e:
+                echo('{0}: skipped ({1})'.format(name, e))
+                results['benchmarks'][name] = None
+                continue
+            times = time_function(function, repeat, max_time)
+            results['benchmarks'][name] = summarize(times)
+            echo('{0}: {1[p50]:.1f} ms'.format(
+                name, results['benchmarks'][name]))
+    finally:
+        papis.config.set('cache-dir', cache_dir)
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return results
+
+
+def compare(old, new, threshold=0.1):
+    """Compare the medians of two results of :func:`run_suite`.
+
+    :param threshold: Relative change from which a benchmark is marked
+        as faster or slower
+    :type  threshold: float
+    :returns: List of tuples with the size, the name, the old and new
+        medians in milliseconds, their ratio and a mark
+    :rtype:  list
+
+    >>> old = {'size': 10, 'benchmarks': {'crawl': {'p50': 2.0}}}
+    >>> new = {'size': 10, 'benchmarks': {'crawl': {'p50': 1.0}}}
+    >>> compare([old], [new])
+    [(10, 'crawl', 2.0, 1.0, 0.5, 'faster')]
+    """
+    old_results = dict(
+        ((r['size'], name), value['p50'])
+        for r in old for name, value in r['benchmarks'].items() if value)
+    rows = []
+    for result in new:
+        for name, value in result['benchmarks'].items():
+            key = (result['size'], name)
+            if not value or key not in old_results:
+                continue
+            ratio = value['p50'] / old_results[key] if old_results[key] \
+                else float('inf')
+            mark = ''
+            if ratio > 1 + threshold:
+                mark = 'slower'
+            elif ratio < 1 - threshold:
+                mark = 'faster'
+            rows.append(
+                key + (old_results[key], value['p50'], round(ratio, 3), mark))
+    return rows
+
+
+def read_results(path):
+    with open(path) as fd:
+        return [json.loads(line) for line in fd if line.strip()]
+
+
+@click.group()
+@click.help_option('--help', '-h')
+def cli():
+    """Benchmarks of papis on synthetic libraries"""
+
+
+@cli.command('run')
+@click.help_option('--help', '-h')
+@click.option(
+    '-n', '--size', 'sizes', multiple=True, type=int,
+    help='Number of documents, it can be given several times '
+    '(default: {0})'.format(', '.join(map(str, SIZES))))
+@click.option(
+    '-b', '--bench', 'patterns', multiple=True,
+    help='Run only the benchmarks matching a pattern, e.g. "query.*", '
+    'it can be given several times')
+@click.option('--seed', default=0, type=int, help='Seed of the libraries')
+@click.option(
+    '--repeat', default=5, type=int, help='Runs of every benchmark')
+@click.option(
+    '--max-time', default=10.0, type=float,
+    help='Seconds after which a benchmark is not run again')
+@click.option(
+    '--library-dir', default=None,
+    help='Folder where the libraries are generated and kept')
+@click.option(
+    '-o', '--out', default=None,
+    help='Append the results to this file, by default they are printed')
+def run_cli(sizes, patterns, seed, repeat, max_time, library_dir, out):
+    """Run the benchmarks"""
+    names = select(patterns)
+    if not names:
+        raise click.ClickException('No benchmark matches the patterns')
+    for size in sizes or SIZES:
+        results = run_suite(
+            size, names, seed, repeat, max_time, library_dir,
+            echo=lambda message: click.echo(message, err=True))
+        line = json.dumps(results, sort_keys=True)
+        if out is None:
+            click.echo(line)
+        else:
+            with open(out, 'a') as fd:
+                fd.write(line + '\n')
+
+
+@cli.command('compare')
+@click.help_option('--help', '-h')
+@click.argument('old', type=click.Path(exists=True, dir_okay=False))
+@click.argument('new', type=click.Path(exists=True, dir_okay=False))
+@click.option(
+    '--threshold', default=0.1, type=float,
+    help='Relative change from which a benchmark is faster or slower')
+def compare_cli(old, new, threshold):
+    """Compare the results of two runs"""
+    click.echo('{0:>7} {1:<16} {2:>10} {3:>10} {4:>7}'.format(
+        'size', 'benchmark', 'old ms', 'new ms', 'ratio'))
+    for row in compare(read_results(old), read_results(new), threshold):
+        click.echo('{0:>7} {1:<16} {2:>10.1f} {3:>10.1f} {4:>7.2f} {5}'
+                   .format(*row))
+
+
+@cli.command('list')
+@click.help_option('--help', '-h')
+def list_cli():
+    """List the benchmarks"""
+    for name in BENCHMARKS:
+        click.echo(name)
+
+
+if __name__ == '__main__':
+    cli()
@@ -61,7 +61,7 @@ def get_libraries():
 def pick_doc(documents):
     """Pick a document from documents with the correct formatting
 
-    :documents: List of documents
+    :documents: List or iterable of documents
     :returns: Document
 
     """
@@ -90,6 +90,8 @@ def pick(options, pick_config={}):
     :param options: List of different objects. The type of the objects within
         the list must be supported by the pickers. This is the reason why this
         function is difficult to generalize for external picker programs.
+        Any other iterable is also accepted, the default picker shows
+        the options as they come.
     :type  options: list
 
     :param pick_config: Dictionary with additional configuration for the used
@@ -100,6 +102,7 @@ def pick(options, pick_config={}):
     :rtype: Element(s) of ``options``
 
     """
+    import papis.pick
     return papis.pick.pick(options, **pick_config)
 
 
@@ -185,7 +188,7 @@ def get_documents_in_dir(directory, search=""):
     return get_documents_in_lib(directory, search)
 
 
-def get_documents_in_lib(library=None, search=""):
+def get_documents_in_lib(library=None, search="", sort=None, limit=None):
     """Get documents contained in the given library with possibly a search
     string.
 
@@ -195,11 +198,53 @@ def get_documents_in_lib(library=None, search=""):
     :param search: Search string
     :type  search: str
 
+    :param sort: Sort the documents by a key, e.g. ``year`` or
+        ``year:desc`` for descending order.
+    :type  sort: str
+
+    :param limit: Maximum number of documents to get.
+    :type  limit: int
+
     :returns: List of filtered documents.
     :rtype: list
 
     """
-    return papis.database.get(library=library).query(search)
+    return papis.database.get(library=library).query(
+        search, limit=limit, sort=sort
+    )
+
+
+def get_documents_in_libs(libraries=None, search="", sort=None, limit=None):
+    """Get documents contained in several libraries with possibly a search
+    string. The libraries are searched in parallel, see
+    :func:`papis.database.query_libraries`.
+
+    :param libraries: Library names, by default all the libraries.
+    :type  libraries: list
+
+    :param search: Search string
+    :type  search: str
+
+    :param sort: Sort the documents by a key, e.g. ``year`` or
+        ``year:desc`` for descending order.
+    :type  sort: str
+
+    :param limit: Maximum number of documents to get.
+    :type  limit: int
+
+    :returns: List of pairs with the library name and the document.
+    :rtype: list
+
+    >>> docs = get_documents_in_libs([get_lib_name()], limit=1)
+    >>> all(name == get_lib_name() for name, doc in docs)
+    True
+
+    """
+    if libraries is None:
+        libraries = get_libraries()
+    return papis.database.query_libraries(
+        libraries, search, limit=limit, sort=sort
+    )
 
 
 def clear_lib_cache(lib=None):
@@ -215,6 +260,30 @@ def clear_lib_cache(lib=None):
     papis.database.get(lib).clear()
 
 
+def get_database_metrics():
+    """Get the metrics of the databases used so far, e.g., the number
+    of documents loaded, the cache hits and misses, the bytes read and
+    written and the query latencies, see
+    :class:`papis.database.base.Database`. To follow the metrics as they
+    are recorded add a function to
+    :data:`papis.database.base.metrics_callbacks`.
+
+    :returns: Dictionary with the name of the library of every database
+        and its metrics
+    :rtype:  dict
+
+    >>> import tempfile
+    >>> folder = tempfile.mkdtemp()
+    >>> set_lib_from_name(folder)
+    >>> docs = get_documents_in_lib(folder, sort='year')
+    >>> metrics = get_database_metrics()[folder]
+    >>> metrics['query']['count'], metrics['query_results']
+    (1, 0)
+
+    """
+    return papis.database.get_metrics()
+
+
 def doi_to_data(doi):
     """Try to get from a DOI expression a dictionary with the document's data
     using the crossref module.
@@ -224,4 +293,5 @@ def doi_to_data(doi):
     :returns: Document's data
     :rtype: dict
     """
+    import papis.crossref
     return papis.crossref.doi_to_data(doi)
@@ -35,6 +35,34 @@ def git_option(**attrs):
     return decorator
 
 
+def check_sort(ctx, param, value):
+    """Check that the ``--sort`` of a command is ``KEY``, ``KEY:asc`` or
+    ``KEY:desc``, see :func:`papis.database.base.parse_sort`.
+    """
+    if value is None:
+        return value
+    from papis.database.base import parse_sort
+    try:
+        parse_sort(value)
+    except ValueError as e:
+        raise click.BadParameter(str(e))
+    return value
+
+
+def sort_option(**attrs):
+    """Adds a ``sort`` option as a decorator"""
+    def decorator(f):
+        attrs.setdefault('default', None)
+        attrs.setdefault(
+            'help',
+            "Sort documents by a key, use KEY:desc for descending order, "
+            "e.g. 'year:desc'"
+        )
+        attrs.setdefault('callback', check_sort)
+        return click.decorators.option('--sort', **attrs)(f)
+    return decorator
+
+
 def bypass(group, command, command_name):
     """
     This function is specially important for people developing scripts in
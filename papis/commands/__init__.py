@@ -1,10 +1,21 @@
+import io
 import os
+import sys
 import glob
-from stevedore import extension
+import json
+import importlib
 import logging
+import papis
 import papis.config
+import papis.timing
 import re
 
+logger = logging.getLogger('commands')
+
+# Careful, the commands imported as submodules of this package, e.g.,
+# papis.commands.open or papis.commands.list, shadow the builtins of the
+# same name in this module.
+
 
 def stevedore_error_handler(manager, entrypoint, exception):
     logger = logging.getLogger('cmds:stevedore')
@@ -21,6 +32,7 @@ def _create_commands_mgr():
     if commands_mgr is not None:
         return
 
+    from stevedore import extension
     commands_mgr = extension.ExtensionManager(
         namespace='papis.command',
         invoke_on_load=False,
@@ -51,7 +63,6 @@ def get_external_scripts():
 
 
 def get_scripts():
-    global commands_mgr
     _create_commands_mgr()
     scripts_dict = dict()
     for command_name in commands_mgr.names():
@@ -61,3 +72,132 @@ def get_scripts():
             plugin=commands_mgr[command_name].plugin
         )
     return scripts_dict
+
+
+def get_registry_path():
+    """Get the file where the registry of the commands is kept.
+
+    :returns: Path of the file
+    :rtype:  str
+    """
+    import papis.utils
+    return os.path.join(papis.utils.get_cache_home(), 'commands.json')
+
+
+def get_registry_key():
+    """Get what the registry of the commands depends on, i.e., the version
+    of papis and the modification times of the folders where the
+    distributions with entry points (``sys.path``) and the external scripts
+    (the scripts folder and ``PATH``) are installed. A distribution or a
+    script that is installed or removed changes the modification time of
+    its folder, so that the registry is made again, without listing any
+    folder when papis starts.
+
+    :returns: List that can be compared with the one in the registry
+    :rtype:  list
+    """
+    def mtime(path):
+        try:
+            return os.stat(path).st_mtime
+        except OSError:
+            return None
+
+    folders = (
+        [path or os.curdir for path in sys.path] +
+        [papis.config.get_scripts_folder()] +
+        os.environ["PATH"].split(":")
+    )
+    return [
+        papis.__version__,
+        sys.executable,
+        papis.config.get('scripts-short-help-regex'),
+        [[folder, mtime(folder)] for folder in folders]
+    ]
+
+
+def make_registry():
+    """Make the registry of the commands, this loads all the commands
+    and looks for external scripts.
+
+    :returns: Dictionary with the name of every command and its
+        ``command_name``, the ``entry_point`` of the python commands
+        or the ``path`` of the external scripts, its ``short_help``,
+        ``help`` and whether it is ``hidden``
+    :rtype:  dict
+    """
+    from papis.commands.external import get_command_help
+    _create_commands_mgr()
+    registry = dict()
+    for command_name in commands_mgr.names():
+        extension = commands_mgr[command_name]
+        plugin = extension.plugin
+        registry[command_name] = dict(
+            command_name=command_name,
+            entry_point=extension.entry_point_target,
+            path=None,
+            short_help=plugin.short_help,
+            help=plugin.help,
+            hidden=getattr(plugin, 'hidden', False)
+        )
+    for name, script in get_external_scripts().items():
+        # external scripts override the python commands of the same name
+        script_help = get_command_help(script['path'])
+        registry[name] = dict(
+            command_name=name,
+            entry_point=None,
+            path=script['path'],
+            short_help=script_help,
+            help=script_help,
+            hidden=False
+        )
+    return registry
+
+
+def get_registry(refresh=False):
+    """Get the registry of the commands, see :func:`make_registry`.
+    The registry is kept in the file :func:`get_registry_path`, so that
+    the commands do not need to be loaded every time papis runs, and it is
+    made again when :func:`get_registry_key` changes.
+
+    :param refresh: Make the registry again in any case
+    :type  refresh: bool
+    :returns: Registry
+    :rtype:  dict
+    """
+    path = get_registry_path()
+    key = get_registry_key()
+    if not refresh and os.path.exists(path):
+        try:
+            with io.open(path) as fd:
+                data = json.load(fd)
+            if data['key'] == key:
+                return data['commands']
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            logger.debug('Could not read the commands registry: {0}'.format(e))
+    logger.debug('making commands registry')
+    registry = make_registry()
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # write and rename, so that concurrent runs never read half a file
+        temp_path = '{0}.{1}'.format(path, os.getpid())
+        with io.open(temp_path, 'w') as fd:
+            json.dump(dict(key=key, commands=registry), fd)
+        os.replace(temp_path, path)
+    except OSError as e:
+        logger.debug('Could not write the commands registry: {0}'.format(e))
+    return registry
+
+
+@papis.timing.span('import command')
+def load_command(command):
+    """Import the python command of an entry of the registry.
+
+    :param command: Entry of :func:`get_registry`
+    :type  command: dict
+    :returns: Click command
+    """
+    module_name, attribute = command['entry_point'].split(':')
+    plugin = importlib.import_module(module_name.strip())
+    for name in attribute.strip().split('.'):
+        plugin = getattr(plugin, name)
+    return plugin
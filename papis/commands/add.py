@@ -79,6 +79,7 @@ from string import ascii_lowercase
 import os
 import re
 import tempfile
+import time
 import hashlib
 import shutil
 import subprocess
@@ -334,6 +335,9 @@ def run(
             shutil.copy(in_file_path, tmp_end_filepath)
 
     data['files'] = new_file_list
+    if papis.config.getboolean('add-time-stamp') and 'time-added' not in data:
+        # This format sorts chronologically also as a string
+        data['time-added'] = time.strftime('%Y-%m-%d-%H:%M:%S')
     tmp_document.update(data)
     tmp_document.save()
 
@@ -19,6 +19,16 @@ Examples
 
         papis --pick-lib open 'einstein relativity'
 
+- To search several libraries at the same time, give them separated by
+  commas, or ``all`` for all of them. Only ``papis list`` searches them
+  all, in parallel, every other command silently uses the first library
+  of the list
+
+    .. code:: shell
+
+        papis --lib papers,books list einstein
+        papis --lib all list --sort year
+
 Cli
 ^^^
 .. click:: papis.commands.default:run
@@ -28,6 +38,8 @@ Cli
 """
 import os
 import sys
+import json
+import time
 import papis
 import papis.api
 import papis.config
@@ -37,14 +49,22 @@ import colorama
 import logging
 import click
 import papis.cli
+import papis.timing
 
 
 class MultiCommand(click.MultiCommand):
 
-    scripts = papis.commands.get_scripts()
-    scripts.update(papis.commands.get_external_scripts())
     logger = logging.getLogger('multicommand')
 
+    @property
+    def scripts(self):
+        """Registry of the commands, see :func:`papis.commands.get_registry`,
+        it is only read the first time it is needed.
+        """
+        if not hasattr(self, '_scripts'):
+            self._scripts = papis.commands.get_registry()
+        return self._scripts
+
     def list_commands(self, ctx):
         """List all matched commands in the command folder and in path
 
@@ -58,7 +78,8 @@ class MultiCommand(click.MultiCommand):
         return rv
 
     def get_command(self, ctx, name):
-        """Get the command to be run
+        """Get the command to be run, only the module of this command
+        is imported
 
         >>> mc = MultiCommand()
         >>> cmd = mc.get_command(None, 'add')
@@ -70,17 +91,113 @@ class MultiCommand(click.MultiCommand):
             script = self.scripts[name]
         except KeyError:
             return None
-        if script['plugin']:
-            return script['plugin']
+        if script['entry_point']:
+            try:
+                return papis.commands.load_command(script)
+            except (ImportError, AttributeError) as e:
+                # the registry is out of date, e.g., a plugin was removed
+                # without changing the installed distributions
+                self.logger.debug(
+                    'Could not load {0}: {1}'.format(name, e))
+                self._scripts = papis.commands.get_registry(refresh=True)
+                script = self._scripts.get(name)
+                if script is None:
+                    return None
+                if script['entry_point']:
+                    return papis.commands.load_command(script)
         # If it gets here, it means that it is an external script
         from papis.commands.external import external_cli as cli
-        from papis.commands.external import get_command_help
         cli.context_settings['obj'] = script
-        cli.help = get_command_help(script['path'])
+        cli.help = script['help']
         cli.name = script["command_name"]
-        cli.short_help = cli.help
+        cli.short_help = script['short_help']
         return cli
 
+    def main(self, args=None, **kwargs):
+        """Run the command in the ``papis serve`` daemon when ``use-daemon``
+        is set, the daemon is running and the command can be run there,
+        see :mod:`papis.daemon`, and
+        in this process otherwise. Only the command line of ``papis``,
+        i.e., when ``args`` is not given, is sent to the daemon.
+        """
+        if args is None:
+            import papis.daemon
+            exit_code = papis.daemon.run_in_daemon(sys.argv[1:])
+            if exit_code is not None:
+                sys.exit(exit_code)
+        return click.MultiCommand.main(self, args=args, **kwargs)
+
+    def format_commands(self, ctx, formatter):
+        """Write the commands and their short help from the registry,
+        so that ``papis --help`` does not import every command
+        """
+        limit = formatter.width - 6 - max(
+            [len(name) for name in self.scripts] or [0])
+        rows = []
+        for name in self.list_commands(ctx):
+            script = self.scripts[name]
+            if script['hidden']:
+                continue
+            cmd = click.Command(
+                name, help=script['help'], short_help=script['short_help'])
+            rows.append((name, cmd.get_short_help_str(limit)))
+        if rows:
+            with formatter.section('Commands'):
+                formatter.write_dl(rows)
+
+
+def start_profile(ctx, param, value):
+    """Profile everything papis does with :mod:`cProfile` and write the
+    statistics to the file ``value`` when the command is done.
+    """
+    if value is None or ctx.resilient_parsing:
+        return
+    import cProfile
+    profiler = cProfile.Profile()
+
+    def dump_profile():
+        profiler.disable()
+        profiler.dump_stats(value)
+        click.echo('Profile written to {0}'.format(value), err=True)
+
+    ctx.call_on_close(dump_profile)
+    profiler.enable()
+
+
+def start_timings(ctx, param, value):
+    """Time the phases of papis, see :mod:`papis.timing`, and print
+    the report when the command is done.
+    """
+    if not value or ctx.resilient_parsing:
+        return
+
+    def print_timings():
+        papis.timing.disable()
+        click.echo(papis.timing.format_report(), err=True)
+
+    ctx.call_on_close(print_timings)
+    papis.timing.enable()
+
+
+def start_metrics(ctx, param, value):
+    """Append the metrics of the databases to the file ``value`` as a line
+    of json when the command is done, see
+    :func:`papis.database.get_metrics`.
+    """
+    if value is None or ctx.resilient_parsing:
+        return
+
+    def write_metrics():
+        with open(value, 'a') as fd:
+            json.dump(dict(
+                time=time.time(),
+                command=ctx.invoked_subcommand,
+                databases=papis.database.get_metrics()
+            ), fd, sort_keys=True)
+            fd.write('\n')
+
+    ctx.call_on_close(write_metrics)
+
 
 @click.group(
     cls=MultiCommand,
@@ -98,7 +215,9 @@ class MultiCommand(click.MultiCommand):
 @click.option(
     "-l",
     "--lib",
-    help="Choose a library name or library path (unamed library)",
+    help="Choose a library name or library path (unamed library), "
+         "several libraries separated by commas or all of them with all "
+         "(only list uses them all, other commands use the first one)",
     default=lambda: papis.config.get("default-library")
 )
 @click.option(
@@ -138,6 +257,34 @@ class MultiCommand(click.MultiCommand):
     default="auto",
     help="Prevent the output from having color"
 )
+@click.option(
+    "--profile",
+    help="Profile the command and write the statistics to a file, "
+         "e.g., to be read with python -m pstats",
+    metavar="FILE",
+    default=None,
+    is_eager=True,
+    expose_value=False,
+    callback=start_profile
+)
+@click.option(
+    "--metrics-file",
+    help="Append the metrics of the databases to a file as a line of json",
+    metavar="FILE",
+    default=None,
+    is_eager=True,
+    expose_value=False,
+    callback=start_metrics
+)
+@click.option(
+    "--timings",
+    help="Print how long the phases of the command took",
+    default=False,
+    is_flag=True,
+    is_eager=True,
+    expose_value=False,
+    callback=start_timings
+)
 def run(
         verbose,
         config,
@@ -174,37 +321,39 @@ def run(
     )
     logger = logging.getLogger('default')
 
-    for pair in set_list:
-        logger.debug('Setting "{0}" to "{1}"'.format(*pair))
-        papis.config.set(pair[0], pair[1])
-
-    if config:
-        papis.config.set_config_file(config)
-        papis.config.reset_configuration()
-
-    if pick_lib:
-        lib = papis.pick.pick(
-            papis.api.get_libraries(),
-            pick_config=dict(header_filter=lambda x: x)
-        )
-
-    papis.config.set_lib_from_name(lib)
-    library = papis.config.get_lib()
-
-    for path in library.paths:
-        # Now the library should be set, let us check if there is a
-        # local configuration file there, and if there is one, then
-        # merge its contents
-        local_config_file = os.path.expanduser(
-            os.path.join(
-                path,
-                papis.config.get("local-config-file")
+    with papis.timing.span('config'):
+        for pair in set_list:
+            logger.debug('Setting "{0}" to "{1}"'.format(*pair))
+            papis.config.set(pair[0], pair[1])
+
+        if config:
+            papis.config.set_config_file(config)
+            papis.config.reset_configuration()
+
+        if pick_lib:
+            lib = papis.api.pick(
+                papis.api.get_libraries(),
+                pick_config=dict(header_filter=lambda x: x)
+            )
+
+        papis.config.set_libs(papis.config.get_libs_from_name(lib))
+        library = papis.config.get_lib()
+
+        for path in library.paths:
+            # Now the library should be set, let us check if there is a
+            # local configuration file there, and if there is one, then
+            # merge its contents
+            local_config_file = os.path.expanduser(
+                os.path.join(
+                    path,
+                    papis.config.get("local-config-file")
+                )
+            )
+            papis.config.merge_configuration_from_path(
+                local_config_file,
+                papis.config.get_configuration()
             )
-        )
-        papis.config.merge_configuration_from_path(
-            local_config_file,
-            papis.config.get_configuration()
-        )
 
     if clear_cache:
-        papis.database.get().clear()
+        for library in papis.config.get_libs():
+            papis.database.get(library).clear()
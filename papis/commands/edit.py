@@ -57,7 +57,10 @@ def cli(
     """Edit document information from a given library"""
 
     logger = logging.getLogger('cli:edit')
-    documents = papis.database.get().query(query)
+    if all:
+        documents = papis.database.get().query(query)
+    else:
+        documents = papis.database.query_to_pick(query)
 
     if editor is not None:
         papis.config.set('editor', editor)
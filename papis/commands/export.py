@@ -48,8 +48,8 @@ import papis.cli
 import papis.api
 import papis.database
 import papis.strings
+import papis.timing
 import logging
-from stevedore import extension
 
 logger = logging.getLogger('cli:export')
 
@@ -80,17 +80,42 @@ def export_to_bibtex(documents):
         papis.document.to_bibtex(document) for document in documents
     ])
 
+exporters_mgr = None
+
+
+def _create_exporters_mgr():
+    global exporters_mgr
+
+    if exporters_mgr is not None:
+        return
+
+    from stevedore import extension
+    exporters_mgr = extension.ExtensionManager(
+        namespace='papis.exporter',
+        invoke_on_load=False,
+        verify_requirements=True,
+        propagate_map_exceptions=True,
+        on_load_failure_callback=stevedore_error_handler
+    )
+
+
 def available_formats():
+    _create_exporters_mgr()
     return exporters_mgr.entry_points_names()
 
-exporters_mgr = extension.ExtensionManager(
-    namespace='papis.exporter',
-    invoke_on_load=False,
-    verify_requirements=True,
-    propagate_map_exceptions=True,
-    on_load_failure_callback=stevedore_error_handler
-)
 
+def check_format(ctx, param, value):
+    """Check the value of ``--format`` when the command is called, the
+    exporters are only loaded then and not when the module is imported.
+    """
+    if value is not None and value not in available_formats():
+        raise click.BadParameter(
+            "invalid choice: {0}. (choose from {1})".format(
+                value, ", ".join(available_formats())))
+    return value
+
+
+@papis.timing.span('export')
 def run(
     documents,
     to_format,
@@ -103,6 +128,7 @@ def run(
     :param to_format: what format to use
     :type  to_format: str
     """
+    _create_exporters_mgr()
     try:
         ret_string = exporters_mgr[to_format].plugin(
             document for document in documents
@@ -132,8 +158,8 @@ def run(
 @click.option(
     "-f",
     "--format",
-    help="Format for the document",
-    type=click.Choice(available_formats()),
+    help="Format for the document, e.g. bibtex, json or yaml",
+    callback=check_format,
     default="bibtex",
 )
 @click.option(
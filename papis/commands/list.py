@@ -28,6 +28,22 @@ CLI Examples
         src="https://asciinema.org/a/NZ8Ii1wWYPo477CIL4vZhUqOy.js"
         id="asciicast-NZ8Ii1wWYPo477CIL4vZhUqOy" async></script>
 
+- List the folders of the 20 most recently added documents
+  (with the ``add-time-stamp`` setting on):
+
+    .. code:: bash
+
+        papis list --sort time-added:desc --limit 20
+
+- List the documents of two libraries, or of all of them, searched in
+  parallel. With ``--format`` every line starts with the name of the library
+  of the document and a tab:
+
+    .. code:: bash
+
+        papis --lib papers,books list einstein
+        papis --lib all list --format '{doc[title]}' einstein
+
 - List all documents according to the bibitem formatting (stored in a template
   file ``bibitem.template``):
 
@@ -69,10 +85,12 @@ Cli
 import logging
 import papis
 import os
+import threading
 import papis.utils
 import papis.strings
 import papis.config
 import papis.database
+import papis.timing
 import papis.downloaders
 import papis.cli
 import click
@@ -90,10 +108,17 @@ def run(
         folders=False,
         info_files=False,
         fmt="",
-        template=None
+        template=None,
+        sort=None,
+        limit=None
         ):
     """Main method to the list command
 
+    :param sort: Sort the documents by a key, e.g. ``year`` or
+        ``year:desc`` for descending order.
+    :type  sort: str
+    :param limit: List at most this number of documents.
+    :type  limit: int
     :returns: List different objects
     :rtype:  list
     """
@@ -122,37 +147,230 @@ def run(
             if 'dir' in config[section]
         ]
 
-    documents = db.query(query)
+    documents = db.query(query, limit=limit, sort=sort)
     if not documents:
         logger.warning(papis.strings.no_documents_retrieved_message)
 
     if pick:
         documents = filter(lambda x: x, [papis.api.pick_doc(documents)])
 
-    if files:
-        return [
-            doc_file for files in [
-                document.get_files() for document in documents
-            ] for doc_file in files
-        ]
-    elif info_files:
-        return [
-            os.path.join(
+    with papis.timing.span('format'):
+        return list(format_documents(
+            documents,
+            files=files,
+            folders=folders,
+            info_files=info_files,
+            fmt=fmt
+        ))
+
+
+def format_documents(
+        documents,
+        files=False,
+        folders=False,
+        info_files=False,
+        fmt=""
+        ):
+    """Iterate over what is listed of every document, i.e., its files,
+    its folder, its info file, the document formatted with ``fmt`` or the
+    document itself.
+
+    :param documents: Iterable with the documents
+    :type  documents: list
+    :returns: Iterator over the listed objects
+
+    >>> import papis.document
+    >>> doc = papis.document.from_data(dict(title='Relativity', year=1905))
+    >>> list(format_documents([doc], fmt='{doc[year]}: {doc[title]}'))
+    ['1905: Relativity']
+    """
+    for document in documents:
+        if files:
+            for doc_file in document.get_files():
+                yield doc_file
+        elif info_files:
+            yield os.path.join(
                 document.get_main_folder(),
                 document.get_info_file()
-            ) for document in documents
-        ]
-    elif fmt:
-        return [
-            papis.utils.format_doc(fmt, document)
-            for document in documents
-        ]
-    elif folders:
-        return [
-            document.get_main_folder() for document in documents
-        ]
-    else:
-        return documents
+            )
+        elif fmt:
+            yield papis.utils.format_doc(fmt, document)
+        elif folders:
+            yield document.get_main_folder()
+        else:
+            yield document
+
+
+def iter_run(
+        query="",
+        library=None,
+        files=False,
+        folders=False,
+        info_files=False,
+        fmt="",
+        template=None,
+        sort=None,
+        limit=None
+        ):
+    """Iterator variant of :func:`run` for listing documents, the listed
+    objects are yielded as soon as the documents are found, see
+    :meth:`papis.database.base.Database.iter_query`. Closing the iterator
+    stops the search.
+
+    :returns: Iterator over the listed objects
+    """
+    logger = logging.getLogger('cli:list')
+    if template is not None:
+        if not os.path.exists(template):
+            logger.error(
+                "Template file %s not found" % template
+            )
+            return
+        with open(template) as fd:
+            fmt = fd.read()
+
+    db = papis.database.get(library)
+    documents = db.iter_query(query, limit=limit, sort=sort)
+    found = False
+    try:
+        for document in documents:
+            found = True
+            for obj in format_documents(
+                    [document],
+                    files=files,
+                    folders=folders,
+                    info_files=info_files,
+                    fmt=fmt):
+                yield obj
+    finally:
+        if hasattr(documents, 'close'):
+            documents.close()
+    if not found:
+        logger.warning(papis.strings.no_documents_retrieved_message)
+
+
+def run_libraries(
+        libraries,
+        query="",
+        pick=False,
+        files=False,
+        folders=False,
+        info_files=False,
+        fmt="",
+        template=None,
+        sort=None,
+        limit=None
+        ):
+    """Variant of :func:`run` listing the documents of several libraries,
+    which are searched in parallel, see
+    :func:`papis.database.query_libraries`. The formatted documents are
+    prefixed with the name of their library and a tab, the paths are listed
+    as they are.
+
+    :param libraries: Libraries, their names or library objects
+    :type  libraries: list
+    :returns: List different objects
+    :rtype:  list
+    """
+    logger = logging.getLogger('cli:list')
+    if template is not None:
+        if not os.path.exists(template):
+            logger.error(
+                "Template file %s not found" % template
+            )
+            return
+        with open(template) as fd:
+            fmt = fd.read()
+
+    tagged = papis.database.query_libraries(
+        libraries, query, limit=limit, sort=sort
+    )
+    if not tagged:
+        logger.warning(papis.strings.no_documents_retrieved_message)
+
+    if pick:
+        names = dict((id(doc), name) for name, doc in tagged)
+        document = papis.api.pick_doc([doc for _, doc in tagged])
+        tagged = [(names[id(document)], document)] if document else []
+
+    with papis.timing.span('format'):
+        objects = []
+        for name, document in tagged:
+            for obj in format_documents(
+                    [document],
+                    files=files,
+                    folders=folders,
+                    info_files=info_files,
+                    fmt=fmt):
+                objects.append(
+                    '{0}\t{1}'.format(name, obj)
+                    if fmt and not (files or info_files) else obj
+                )
+        return objects
+
+
+#: Maximum number of lines that ``papis list`` writes at once.
+OUTPUT_BATCH_SIZE = 100
+
+#: Seconds after which ``papis list`` writes the lines it has anyway.
+OUTPUT_BATCH_TIME = 0.05
+
+
+def echo_objects(objects):
+    """Write the objects one per line, in batches, so that the output is
+    not flushed for every line. A batch is written when it has
+    ``OUTPUT_BATCH_SIZE`` lines, and a background thread writes the
+    waiting lines every ``OUTPUT_BATCH_TIME`` seconds, also while the
+    next object is being searched. If the reader of the output is gone,
+    e.g. in ``papis list | head``, the iterator of the objects is closed,
+    which stops the search.
+
+    :param objects: Iterable with the objects
+    :type  objects: list
+    """
+    batch = []
+    broken = []
+    lock = threading.Lock()
+    done = threading.Event()
+
+    def flush():
+        with lock:
+            if batch and not broken:
+                try:
+                    click.echo('\n'.join(batch))
+                except BrokenPipeError:
+                    broken.append(True)
+            del batch[:]
+
+    def flush_in_time():
+        while not done.wait(OUTPUT_BATCH_TIME):
+            flush()
+
+    flusher = threading.Thread(target=flush_in_time, daemon=True)
+    try:
+        for o in objects:
+            line = str(o)
+            with lock:
+                batch.append(line)
+                full = len(batch) >= OUTPUT_BATCH_SIZE
+            if full:
+                flush()
+            if broken:
+                break
+            if flusher.ident is None:
+                # started once the search is running, so that no thread
+                # is alive when the search forks its workers
+                flusher.start()
+        flush()
+    finally:
+        done.set()
+        if flusher.ident is not None:
+            flusher.join()
+    if broken:
+        logger.debug('The output was closed, stopping')
+        if hasattr(objects, 'close'):
+            objects.close()
+        papis.utils.discard_stdout()
 
 
 @click.command("list")
@@ -197,6 +415,13 @@ def run(
     default=False,
     is_flag=True
 )
+@papis.cli.sort_option()
+@click.option(
+    "--limit",
+    help="List at most this number of documents",
+    type=click.IntRange(min=0),
+    default=None
+)
 @click.option(
     "--downloaders",
     help="List available downloaders",
@@ -217,6 +442,8 @@ def cli(
         format,
         template,
         pick,
+        sort,
+        limit,
         downloaders,
         libraries
         ):
@@ -226,19 +453,49 @@ def cli(
         dir = True
 
     lib = papis.config.get_lib()
-
-    objects = run(
-        query=query,
-        library=lib,
-        libraries=libraries,
-        downloaders=downloaders,
-        pick=pick,
-        files=file,
-        folders=dir,
-        info_files=info,
-        fmt=format,
-        template=template
-    )
-    for o in objects:
-        click.echo(o)
+    libs = papis.config.get_libs()
+
+    if len(libs) > 1 and not libraries and not downloaders:
+        objects = run_libraries(
+            libs,
+            query=query,
+            pick=pick,
+            files=file,
+            folders=dir,
+            info_files=info,
+            fmt=format,
+            template=template,
+            sort=sort,
+            limit=limit
+        )
+    elif pick or libraries or downloaders:
+        objects = run(
+            query=query,
+            library=lib,
+            libraries=libraries,
+            downloaders=downloaders,
+            pick=pick,
+            files=file,
+            folders=dir,
+            info_files=info,
+            fmt=format,
+            template=template,
+            sort=sort,
+            limit=limit
+        )
+    else:
+        # the documents are written as they are found
+        objects = iter_run(
+            query=query,
+            library=lib,
+            files=file,
+            folders=dir,
+            info_files=info,
+            fmt=format,
+            template=template,
+            sort=sort,
+            limit=limit
+        )
+    with papis.timing.span('output'):
+        echo_objects(objects or [])
     return
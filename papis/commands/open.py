@@ -166,12 +166,20 @@ def cli(query, doc_folder, tool, folder, all, mark):
         papis.config.set("opentool", tool)
     logger = logging.getLogger('cli:run')
 
-    documents = papis.database.get().query(query)
+    if all:
+        documents = papis.database.get().query(query)
+    else:
+        documents = papis.database.query_to_pick(query)
 
     if doc_folder:
         documents = [from_folder(doc_folder)]
 
-    if not documents:
+    # the documents to pick come from an iterator, they are looked at
+    # before picking, so that cancelling the picker is not taken for
+    # a query without documents
+    from papis.pick import peek
+    found, documents = peek(documents)
+    if not found:
         logger.warning(papis.strings.no_documents_retrieved_message)
         return 0
 
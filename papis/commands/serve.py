@@ -0,0 +1,94 @@
+"""
+This command starts a daemon that keeps the libraries in memory, so that
+``papis`` does not have to read the configuration and load the documents
+every time it is called. While it runs, and if ``use-daemon`` is set,
+``papis list`` and ``papis export --all`` are answered by the daemon,
+which is much faster for scripts calling papis many times. The other
+commands, and the interactive ones like ``papis list --pick``, run as usual.
+
+See :mod:`papis.daemon` for the details and the ``use-daemon``,
+``daemon-socket`` and ``daemon-timeout`` settings.
+
+CLI Examples
+^^^^^^^^^^^^
+
+    - Start the daemon with the ``papers`` library loaded
+
+    .. code::
+
+        papis --lib papers serve &
+
+    - Start it and keep the library up to date when the info files are
+      edited outside of papis, see ``papis watch``
+
+    .. code::
+
+        papis serve --watch &
+
+    - Stop it
+
+    .. code::
+
+        papis serve --stop
+
+Cli
+^^^
+.. click:: papis.commands.serve:cli
+    :prog: papis serve
+"""
+import papis.config
+import papis.daemon
+import papis.database
+import logging
+import click
+
+logger = logging.getLogger('serve')
+
+
+def run(path=None, watch=False):
+    """Load the current library and answer the requests on the socket
+    ``path`` until the daemon is stopped.
+
+    :param path: Path of the socket, by default ``daemon-socket``
+    :type  path: str
+    :param watch: Keep the library up to date with the changes done outside
+        of papis, see :mod:`papis.watcher`
+    :type  watch: bool
+    """
+    path = path or papis.daemon.get_socket_path()
+    if papis.daemon.is_running(path):
+        raise click.ClickException(
+            'A daemon is already listening on {0}'.format(path))
+    logger.info('Loading library {0}'.format(papis.config.get_lib_name()))
+    papis.database.get().get_all_documents()
+    papis.daemon.Daemon(path).serve(watch=watch)
+
+
+@click.command("serve")
+@click.help_option('--help', '-h')
+@click.option(
+    "--socket",
+    help="Path of the socket, by default the daemon-socket setting",
+    default=None
+)
+@click.option(
+    "--watch",
+    help="Update the library when its info files change",
+    default=False,
+    is_flag=True
+)
+@click.option(
+    "--stop",
+    help="Stop the daemon",
+    default=False,
+    is_flag=True
+)
+def cli(socket, watch, stop):
+    """Keep the library in memory and answer the commands of papis"""
+    if stop:
+        try:
+            papis.daemon.request(dict(op='stop'), socket)
+        except OSError:
+            logger.warning('No daemon is running')
+        return
+    run(socket, watch)
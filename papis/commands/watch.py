@@ -0,0 +1,57 @@
+"""
+This command keeps the database of the library up to date with the changes
+done outside of papis, e.g., editing the info files by hand, ``git pull``
+or ``rsync`` from another machine, so that the cache does not have to be
+cleared with ``papis --clear-cache``. It runs until it is interrupted.
+
+The library is watched with inotify on linux, and by checking the info
+files every ``watch-poll-interval`` seconds otherwise, see
+:mod:`papis.watcher`. To watch the library in the ``papis serve`` daemon,
+use ``papis serve --watch``.
+
+CLI Examples
+^^^^^^^^^^^^
+
+    - Watch the ``papers`` library
+
+    .. code::
+
+        papis --lib papers watch
+
+    - Watch it by checking the info files every 10 seconds, e.g.,
+      for a library in a network filesystem
+
+    .. code::
+
+        papis --set watch-polling True --set watch-poll-interval 10 watch
+
+Cli
+^^^
+.. click:: papis.commands.watch:cli
+    :prog: papis watch
+"""
+import papis.config
+import papis.watcher
+import click
+
+
+def run(library=None, stop=None):
+    """Keep the database of ``library`` up to date until ``stop`` is set,
+    see :func:`papis.watcher.watch`.
+
+    :param library: Library, by default the current library
+    :type  library: papis.library.Library or str
+    :param stop: Event stopping the watcher
+    :type  stop: threading.Event
+    """
+    papis.watcher.watch(library, stop=stop)
+
+
+@click.command("watch")
+@click.help_option('--help', '-h')
+def cli():
+    """Update the library when its info files change"""
+    try:
+        run(papis.config.get_lib())
+    except KeyboardInterrupt:
+        pass
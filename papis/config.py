@@ -11,6 +11,7 @@ logger = logging.getLogger("config")
 logger.debug("importing")
 
 _CURRENT_LIBRARY = None  #: Current library in use
+_CURRENT_LIBRARIES = None  #: Libraries searched, see set_libs
 _CONFIGURATION = None  #: Global configuration object variable.
 _DEFAULT_SETTINGS = None  #: Default settings for the whole papis.
 _OVERRIDE_VARS = {
@@ -35,6 +36,7 @@ general_settings = {
     "local-config-file": ".papis.config",
     "database-backend": "papis",
     "default-query-string": ".",
+    "pick-query-limit": 0,
 
     "opentool": get_default_opener(),
     "dir-umask": 0o755,
@@ -47,6 +49,12 @@ general_settings = {
     "notes-name": "notes.tex",
     "use-cache": True,
     "cache-dir": None,
+    "use-daemon": False,
+    "daemon-socket": None,
+    "daemon-timeout": 2.0,
+    "watch-debounce": 0.5,
+    "watch-poll-interval": 2.0,
+    "watch-polling": False,
     "use-git": False,
 
     "add-confirm": False,
@@ -55,6 +63,7 @@ general_settings = {
     "add-interactive": False,
     "add-edit": False,
     "add-open": False,
+    "add-time-stamp": False,
 
     "browse-key": 'url',
     "browse-query-format": "{doc[title]} {doc[author]}",
@@ -96,12 +105,15 @@ general_settings = {
     "whoosh-schema-fields": "['doi']",
     "whoosh-schema-prototype":
     '{\n'
-    '"author": TEXT(stored=True),\n'
-    '"title": TEXT(stored=True),\n'
-    '"year": TEXT(stored=True),\n'
+    '"author": TEXT(stored=True, sortable=True),\n'
+    '"title": TEXT(stored=True, sortable=True),\n'
+    '"year": NUMERIC(stored=True, sortable=True),\n'
     '"tags": TEXT(stored=True),\n'
     '}',
 
+    "sqlite-schema-fields":
+    "['author', 'title', 'year', 'tags', 'doi', 'ref']",
+
     'unique-document-keys': "['doi','ref','isbn','isbn10','url','doc_url']",
 
     "downloader-proxy": None,
@@ -442,18 +454,78 @@ def set_lib(library):
     :type  library: papis.library.Library
 
     """
-    global _CURRENT_LIBRARY
+    global _CURRENT_LIBRARY, _CURRENT_LIBRARIES
     assert(isinstance(library, papis.library.Library))
     config = get_configuration()
     if library.name not in config.keys():
         config[library.name] = dict(dirs=library.paths)
     _CURRENT_LIBRARY = library
+    _CURRENT_LIBRARIES = None
 
 
 def set_lib_from_name(libname):
     set_lib(get_lib_from_name(libname))
 
 
+def set_libs(libraries):
+    """Set the libraries that the commands search, e.g., with
+    ``papis --lib all list``. The first one becomes the current library,
+    see :func:`set_lib`.
+
+    :param libraries: List of library objects
+    :type  libraries: list
+    """
+    global _CURRENT_LIBRARIES
+    assert(len(libraries) > 0), 'at least one library is needed'
+    set_lib(libraries[0])
+    _CURRENT_LIBRARIES = list(libraries)
+
+
+def get_libs():
+    """Get the libraries that the commands search, see :func:`set_libs`,
+    by default only the current library.
+
+    :returns: List of library objects
+    :rtype:  list
+
+    >>> get_libs() == [get_lib()]
+    True
+    """
+    if _CURRENT_LIBRARIES is None:
+        return [get_lib()]
+    return list(_CURRENT_LIBRARIES)
+
+
+def get_libs_from_name(libname):
+    """Get the libraries given by ``libname``, which is either the name or
+    the path of a library, ``all`` for all the libraries of the
+    configuration, or several of these separated by commas, e.g.,
+    ``papers,books``.
+
+    :param libname: Libraries
+    :type  libname: str
+    :returns: List of library objects
+    :rtype:  list
+    """
+    assert(isinstance(libname, str))
+    config = get_configuration()
+    if libname in config.keys() or os.path.exists(libname):
+        return [get_lib_from_name(libname)]
+    if libname == 'all':
+        names = [
+            key for key in config.keys()
+            if 'dir' in config[key] or 'dirs' in config[key]
+        ]
+    else:
+        names = []
+        for name in libname.split(','):
+            if name.strip() and name.strip() not in names:
+                names.append(name.strip())
+    if not names:
+        raise Exception("No library in '{0}'".format(libname))
+    return [get_lib_from_name(name) for name in names]
+
+
 def get_lib_from_name(libname):
     assert(isinstance(libname, str))
     config = get_configuration()
@@ -521,6 +593,52 @@ def get_lib():
     return _CURRENT_LIBRARY
 
 
+def get_state():
+    """Get a copy of the state of the configuration, i.e., the settings,
+    the current library and the overridden paths, so that it can be
+    restored later with :func:`set_state`. Long running processes, like
+    ``papis serve``, use it so that the settings of a command do not leak
+    into the next one.
+
+    :returns: State of the configuration
+    :rtype:  dict
+    """
+    configuration = get_configuration()
+    return dict(
+        sections=[
+            (name, OrderedDict(configuration.items(name, raw=True)))
+            for name in configuration.sections()
+        ],
+        library=_CURRENT_LIBRARY,
+        libraries=_CURRENT_LIBRARIES,
+        override_vars=dict(_OVERRIDE_VARS)
+    )
+
+
+def set_state(state):
+    """Restore a state of the configuration given by :func:`get_state`,
+    the state can be restored several times.
+
+    :param state: State of the configuration
+    :type  state: dict
+
+    >>> state = get_state()
+    >>> set('editor', 'blahblah')
+    >>> set_state(state)
+    >>> get('editor') == 'blahblah'
+    False
+    """
+    global _CURRENT_LIBRARY, _CURRENT_LIBRARIES
+    configuration = get_configuration()
+    for name in configuration.sections():
+        configuration.remove_section(name)
+    configuration.read_dict(OrderedDict(state['sections']))
+    _CURRENT_LIBRARY = state['library']
+    _CURRENT_LIBRARIES = state['libraries']
+    _OVERRIDE_VARS.clear()
+    _OVERRIDE_VARS.update(state['override_vars'])
+
+
 def reset_configuration():
     """Destroys existing configuration and returns a new one.
 
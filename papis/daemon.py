@@ -0,0 +1,578 @@
+"""A daemon keeping the libraries in memory, so that commands do not have to
+read the configuration and load the documents every time they are run.
+It is started with ``papis serve``.
+
+The daemon listens on a unix socket, see the ``daemon-socket`` setting.
+The clients connect to it, send a request as a line of json and get the
+answer as a line of json. The requests are
+
+- ``{"op": "ping"}``, answered with the version and the process id of
+  the daemon,
+- ``{"op": "run", "args": [...], "cwd": "...", "isatty": [true, false],
+  "env": {...}, "timeout": 2.0}``, which runs ``papis`` with the arguments
+  ``args`` in the folder ``cwd``. The output of the command is sent as it
+  is written, in lines ``{"stdout": "..."}`` and ``{"stderr": "..."}``,
+  with a line ``{"alive": true}`` every ``timeout / 2`` seconds without
+  output, and the last line has the ``exit_code``. The answer is only
+  ``fallback`` if the command has to be run by the client, e.g., because
+  it is interactive or the ``XDG_*`` and ``PAPIS_*`` variables of the
+  environment ``env`` of the client are not the ones of the daemon,
+- ``{"op": "query", "query": "...", "library": "...", "sort": "...",
+  "limit": 10}``, answered with the ``documents``, i.e., their ``folder``
+  and their ``data``, see :func:`query`,
+- ``{"op": "stop"}``, which stops the daemon.
+
+Requests that fail are answered with an ``error``. The requests are
+answered one after the other, and the configuration is restored after
+every request, so that e.g. ``--set`` does not change the next requests.
+It is read again when the configuration file changes.
+
+When a daemon is running and ``use-daemon`` is ``True``, ``papis`` sends
+the commands that only list or export documents to it, see
+:func:`run_in_daemon`. If the daemon does not answer within
+``daemon-timeout`` seconds, the command is run by ``papis`` itself.
+"""
+import contextlib
+import io
+import json
+import logging
+import os
+import socket
+import socketserver
+import sys
+import threading
+import time
+import traceback
+
+import papis
+import papis.config
+import papis.utils
+
+logger = logging.getLogger('daemon')
+
+#: Seconds that the clients wait for the daemon to accept a connection.
+CONNECT_TIMEOUT = 0.5
+
+#: Characters of output sent at most in one line.
+CHUNK_SIZE = 1 << 16
+
+
+def _is_list_served(params):
+    return not params['pick']
+
+
+def _is_export_served(params):
+    return params['all']
+
+
+#: Commands that the daemon runs, with a function telling from the
+#: parameters of the command if it is run, i.e., if it does not
+#: need to interact with the user.
+SERVED_COMMANDS = {
+    'list': _is_list_served,
+    'export': _is_export_served,
+}
+
+
+def get_socket_path():
+    """Get the path of the socket of the daemon, see ``daemon-socket``.
+
+    :returns: Path of the socket
+    :rtype:  str
+    """
+    path = papis.config.get('daemon-socket')
+    if path is None:
+        return os.path.join(papis.utils.get_cache_home(), 'daemon.sock')
+    return os.path.expanduser(path)
+
+
+def get_environment():
+    """Get the variables of the environment that change what papis does,
+    i.e., the ``XDG_*`` and ``PAPIS_*`` variables.
+
+    :returns: Dictionary with the variables
+    :rtype:  dict
+    """
+    return dict(
+        (key, value) for key, value in os.environ.items()
+        if key.startswith('XDG_') or key.startswith('PAPIS_')
+    )
+
+
+def _get_answers(message, path=None, timeout=None):
+    """Send a request to the daemon and iterate over the lines of its
+    answer, see the module documentation.
+    """
+    if timeout is None:
+        timeout = papis.config.getfloat('daemon-timeout')
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(CONNECT_TIMEOUT)
+        sock.connect(path or get_socket_path())
+        # a busy or stuck daemon does not keep the client waiting
+        sock.settimeout(timeout)
+        sock.sendall(json.dumps(message).encode('utf-8') + b'\n')
+        with sock.makefile('rb') as fd:
+            for line in fd:
+                answer = json.loads(line.decode('utf-8'))
+                if 'error' in answer:
+                    raise Exception('papis serve: {0}'.format(answer['error']))
+                yield answer
+
+
+def request(message, path=None, timeout=None):
+    """Send a request to the daemon and get its answer.
+
+    :param message: Request, see the module documentation
+    :type  message: dict
+    :param path: Path of the socket, by default :func:`get_socket_path`
+    :type  path: str
+    :param timeout: Seconds to wait for the answer, by default
+        ``daemon-timeout``
+    :type  timeout: float
+    :returns: Answer of the daemon
+    :rtype:  dict
+    :raises OSError: If there is no daemon listening on the socket or it
+        does not answer in time
+    :raises Exception: If the daemon could not answer the request
+    """
+    answers = _get_answers(message, path, timeout)
+    try:
+        for answer in answers:
+            return answer
+    finally:
+        answers.close()
+    raise ConnectionError('The daemon closed the connection')
+
+
+def is_running(path=None):
+    """Whether a daemon answers on the socket.
+
+    :param path: Path of the socket, by default :func:`get_socket_path`
+    :type  path: str
+    :rtype:  bool
+    """
+    try:
+        request(dict(op='ping'), path)
+    except OSError:
+        return False
+    return True
+
+
+def run_in_daemon(args, stdout=None, stderr=None):
+    """Run ``papis`` with the command line arguments ``args`` in the daemon,
+    if ``use-daemon`` is set, there is a daemon and it runs the command.
+    The output of the command is written as it comes.
+
+    :param args: Arguments of ``papis``, without the program name
+    :type  args: list
+    :param stdout: Where the output goes, by default ``sys.stdout``
+    :param stderr: Where the errors go, by default ``sys.stderr``
+    :returns: Exit code of the command, or None if the command has to be
+        run by the caller
+    :rtype:  int
+    """
+    if not papis.config.getboolean('use-daemon'):
+        return None
+    stdout = stdout or sys.stdout
+    stderr = stderr or sys.stderr
+    timeout = papis.config.getfloat('daemon-timeout')
+    answers = _get_answers(dict(
+        op='run',
+        args=list(args),
+        cwd=os.getcwd(),
+        isatty=[stdout.isatty(), stderr.isatty()],
+        env=get_environment(),
+        timeout=timeout
+    ), timeout=timeout)
+    written = False
+    try:
+        for answer in answers:
+            if answer.get('fallback'):
+                return None
+            if 'exit_code' in answer:
+                return answer['exit_code']
+            for name, stream in [('stdout', stdout), ('stderr', stderr)]:
+                if name in answer:
+                    written = True
+                    stream.write(answer[name])
+                    stream.flush()
+        raise ConnectionError('The daemon closed the connection')
+    except BrokenPipeError:
+        # the reader of the output is gone, closing the connection
+        # stops the command in the daemon
+        papis.utils.discard_stdout()
+        return 0
+    except OSError as e:
+        if written:
+            logger.error('The daemon stopped answering: {0}'.format(e))
+            return 1
+        logger.debug('The daemon did not answer: {0}'.format(e))
+        return None
+    finally:
+        answers.close()
+
+
+def query(query_string=None, library=None, sort=None, limit=None,
+          path=None, timeout=None):
+    """Query a library in the daemon, see
+    :meth:`papis.database.base.Database.query`.
+
+    :param query_string: Query, by default all the documents
+    :type  query_string: str
+    :param library: Name of the library, by default the default library of
+        the daemon
+    :type  library: str
+    :param path: Path of the socket, by default :func:`get_socket_path`
+    :type  path: str
+    :param timeout: Seconds to wait for the answer, by default
+        ``daemon-timeout``
+    :type  timeout: float
+    :returns: List of documents
+    :rtype:  list
+    :raises OSError: If there is no daemon listening on the socket
+    """
+    import papis.document
+    answer = request(dict(
+        op='query', query=query_string, library=library, sort=sort,
+        limit=limit
+    ), path, timeout)
+    documents = []
+    for item in answer['documents']:
+        document = papis.document.from_data(item['data'])
+        document.set_folder(item['folder'])
+        documents.append(document)
+    return documents
+
+
+class _Connection(object):
+    """Connection to a client, the lines of the answer can be sent from
+    several threads.
+    """
+
+    def __init__(self, wfile):
+        self.wfile = wfile
+        self.lock = threading.Lock()
+        self.last_sent = time.monotonic()
+
+    def send(self, message):
+        with self.lock:
+            self.wfile.write(
+                json.dumps(message, default=str).encode('utf-8') + b'\n')
+            self.wfile.flush()
+            self.last_sent = time.monotonic()
+
+
+class _Output(io.TextIOBase):
+    """Output of a command, it is sent to the client when it is flushed.
+    It is a terminal if the output of the client is one, so that the
+    commands color it in the same way.
+
+    When the client is gone, the first write raises a
+    :class:`BrokenPipeError`, so that the command can stop as it does when
+    the reader of its output is gone, the next writes are dropped.
+    """
+
+    def __init__(self, name, send, isatty):
+        io.TextIOBase.__init__(self)
+        self.name = name
+        self.send = send
+        self._isatty = isatty
+        self._buffer = []
+        self._size = 0
+        self.broken = False
+
+    def isatty(self):
+        return self._isatty
+
+    def writable(self):
+        return True
+
+    def write(self, text):
+        if self.broken:
+            return len(text)
+        self._buffer.append(text)
+        self._size += len(text)
+        if self._size >= CHUNK_SIZE:
+            self.flush()
+        return len(text)
+
+    def flush(self):
+        if not self._buffer or self.broken:
+            return
+        text = ''.join(self._buffer)
+        self._buffer, self._size = [], 0
+        try:
+            self.send({self.name: text})
+        except OSError:
+            self.broken = True
+            raise BrokenPipeError('The client is gone')
+
+
+def get_served_command(args):
+    """Get the name of the command that ``papis`` runs with the arguments
+    ``args`` if the daemon can run it, see :data:`SERVED_COMMANDS`.
+
+    :param args: Arguments of ``papis``, without the program name
+    :type  args: list
+    :returns: Name of the command or None
+
+    >>> get_served_command(['--lib', 'papers', 'list', 'einstein'])
+    'list'
+    >>> get_served_command(['list', '--pick']) is None
+    True
+    >>> get_served_command(['export', '--help']) is None
+    True
+    """
+    import click
+    import papis.commands.default
+    run = papis.commands.default.run
+    if any(arg in ['-h', '--help', '--version'] for arg in args):
+        return None
+    ctx = click.Context(run, info_name='papis', resilient_parsing=True)
+    rest = click.Command.parse_args(run, ctx, list(args))
+    if not rest or ctx.params['pick_lib']:
+        return None
+    name = rest[0]
+    if name not in SERVED_COMMANDS:
+        return None
+    command = run.get_command(ctx, name)
+    if command is None:
+        return None
+    subctx = click.Context(
+        command, info_name=name, parent=ctx, resilient_parsing=True)
+    command.parse_args(subctx, rest[1:])
+    return name if SERVED_COMMANDS[name](subctx.params) else None
+
+
+class _Handler(socketserver.StreamRequestHandler):
+
+    def handle(self):
+        line = self.rfile.readline()
+        if not line:
+            return
+        connection = _Connection(self.wfile)
+        try:
+            message = json.loads(line.decode('utf-8'))
+        except ValueError as e:
+            answer = dict(error='Invalid request: {0}'.format(e))
+        else:
+            answer = self.server.daemon.answer(message, connection)
+        try:
+            connection.send(answer)
+        except OSError:
+            logger.debug('The client is gone')
+
+
+class Daemon(object):
+    """Daemon answering the requests on the socket ``path``, see the module
+    documentation. The socket is ready as soon as the daemon is created,
+    the requests are answered by :meth:`serve`.
+
+    :param path: Path of the socket
+    :type  path: str
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.stopped = False
+        # held while a request is answered or the watcher updates the
+        # database, since both use the global configuration
+        self.lock = threading.Lock()
+        self.state = papis.config.get_state()
+        self.config_mtime = self._get_config_mtime()
+        if os.path.exists(path):
+            os.remove(path)
+        # only the user can connect to the socket
+        umask = os.umask(0o077)
+        try:
+            self.server = socketserver.UnixStreamServer(path, _Handler)
+        finally:
+            os.umask(umask)
+        self.server.daemon = self
+
+    def _get_config_mtime(self):
+        try:
+            return os.stat(papis.config.get_config_file()).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def check_configuration(self):
+        """Read the configuration again if the configuration file has
+        changed since it was read.
+        """
+        mtime = self._get_config_mtime()
+        if mtime == self.config_mtime:
+            return
+        import papis.database
+        logger.info('The configuration has changed, reading it again')
+        library = papis.config.get_lib().name
+        papis.config.reset_configuration()
+        papis.config.set_lib_from_name(library)
+        papis.database.clear_cached()
+        self.state = papis.config.get_state()
+        self.config_mtime = mtime
+
+    def answer(self, message, connection=None):
+        """Answer a request.
+
+        :param message: Request, see the module documentation
+        :type  message: dict
+        :param connection: Connection to the client, where the output of the
+            commands is sent as it is written, without it the output is in
+            the answer
+        :returns: Answer, i.e., the last line sent to the client
+        :rtype:  dict
+        """
+        op = message.get('op')
+        if op == 'ping':
+            return dict(version=papis.__version__, pid=os.getpid())
+        if op == 'stop':
+            self.stopped = True
+            return dict(stopped=True)
+        if op not in ['run', 'query']:
+            return dict(error='Unknown request {0}'.format(op))
+        with self.lock:
+            self.check_configuration()
+            try:
+                if op == 'run':
+                    if message.get('env', dict()) != get_environment():
+                        return dict(fallback=True)
+                    return self.run(
+                        message['args'], message['cwd'], message['isatty'],
+                        connection, message.get('timeout'))
+                return self.query(message)
+            except Exception as e:
+                logger.debug(traceback.format_exc())
+                return dict(error=str(e))
+            finally:
+                papis.config.set_state(self.state)
+
+    def run(self, args, cwd, isatty, connection=None, timeout=None):
+        """Run ``papis`` with the arguments ``args`` in the folder ``cwd``,
+        with the output and the logs sent to the client through
+        ``connection``, and a line ``{"alive": true}`` every
+        ``timeout / 2`` seconds without output.
+        """
+        import papis.commands.default
+        if get_served_command(args) is None:
+            return dict(fallback=True)
+        collected = dict(stdout=[], stderr=[])
+        if connection is None:
+            def send(message):
+                for name, text in message.items():
+                    collected[name].append(text)
+        else:
+            send = connection.send
+        stdout = _Output('stdout', send, isatty[0])
+        stderr = _Output('stderr', send, isatty[1])
+        done = threading.Event()
+        if connection is not None and timeout:
+            heartbeat = threading.Thread(
+                target=self._send_heartbeats,
+                args=(connection, timeout / 2, done)
+            )
+            heartbeat.start()
+        else:
+            heartbeat = None
+        # the commands set up the logging, with the buffer as stderr
+        root = logging.getLogger()
+        handlers, level = root.handlers, root.level
+        root.handlers = []
+        cwd, old_cwd = os.path.abspath(cwd), os.getcwd()
+        try:
+            os.chdir(cwd)
+            with contextlib.redirect_stdout(stdout), \
+                    contextlib.redirect_stderr(stderr):
+                try:
+                    papis.commands.default.run.main(
+                        args=list(args), prog_name='papis')
+                    exit_code = 0
+                except SystemExit as e:
+                    if e.code is None or isinstance(e.code, int):
+                        exit_code = e.code or 0
+                    else:
+                        print(e.code, file=sys.stderr)
+                        exit_code = 1
+                except BrokenPipeError:
+                    exit_code = 1
+                except Exception:
+                    traceback.print_exc()
+                    exit_code = 1
+                for output in [stdout, stderr]:
+                    try:
+                        output.flush()
+                    except BrokenPipeError:
+                        pass
+        finally:
+            os.chdir(old_cwd)
+            root.handlers = handlers
+            root.setLevel(level)
+            done.set()
+            if heartbeat is not None:
+                heartbeat.join()
+        answer = dict(exit_code=exit_code)
+        if connection is None:
+            answer.update(
+                stdout=''.join(collected['stdout']),
+                stderr=''.join(collected['stderr'])
+            )
+        return answer
+
+    @staticmethod
+    def _send_heartbeats(connection, interval, done):
+        while not done.wait(interval / 2):
+            if time.monotonic() - connection.last_sent < interval:
+                continue
+            try:
+                connection.send(dict(alive=True))
+            except OSError:
+                return
+
+    def query(self, message):
+        import papis.database
+        import papis.document
+        database = papis.database.get(message.get('library'))
+        documents = database.query(
+            message.get('query') or database.get_all_query_string(),
+            limit=message.get('limit'),
+            sort=message.get('sort')
+        )
+        return dict(documents=[
+            dict(
+                folder=document.get_main_folder(),
+                data=papis.document.to_dict(document)
+            ) for document in documents
+        ])
+
+    def serve(self, watch=False):
+        """Answer the requests until a ``stop`` request comes.
+
+        :param watch: Keep the database of the current library up to date
+            with the changes done outside of papis, see :mod:`papis.watcher`
+        :type  watch: bool
+        """
+        logger.info('Listening on {0}'.format(self.path))
+        # the commands run while the threads of the heartbeats and the
+        # watcher are alive, forking a process pool is not safe then
+        fork_enabled = papis.utils.fork_enabled
+        papis.utils.fork_enabled = False
+        stop = threading.Event()
+        if watch:
+            from papis.watcher import watch
+            watcher = threading.Thread(
+                target=watch,
+                kwargs=dict(
+                    library=papis.config.get_lib(), stop=stop, lock=self.lock)
+            )
+            watcher.start()
+        try:
+            while not self.stopped:
+                self.server.handle_request()
+        finally:
+            stop.set()
+            if watch:
+                watcher.join()
+            papis.utils.fork_enabled = fork_enabled
+            self.server.server_close()
+            if os.path.exists(self.path):
+                os.remove(self.path)
@@ -4,6 +4,62 @@ logger = logging.getLogger('database')
 DATABASES = dict()
 
 
+def stevedore_error_handler(manager, entrypoint, exception):
+    logger = logging.getLogger('database:stevedore')
+    logger.error("Error while loading entrypoint [%s]" % entrypoint)
+    logger.error(exception)
+
+
+def _create_database_mgr(names):
+    from stevedore import named
+    # Only the requested backends are loaded, so that the dependencies
+    # of the other backends (e.g. whoosh) are not needed
+    return named.NamedExtensionManager(
+        namespace='papis.database',
+        names=names,
+        invoke_on_load=False,
+        verify_requirements=True,
+        propagate_map_exceptions=True,
+        on_load_failure_callback=stevedore_error_handler
+    )
+
+
+def get_available_backends():
+    """Get the names of the database backends registered in the
+    ``papis.database`` entry point namespace.
+
+    :returns: List of backend names
+    :rtype:  list
+
+    >>> 'papis' in get_available_backends()
+    True
+    """
+    return sorted(set(
+        e.name for e in _create_database_mgr([]).list_entry_points()
+    ))
+
+
+def get_backend(name):
+    """Get the database class registered for the backend ``name``.
+
+    :param name: Name of the backend, e.g. ``papis`` or ``whoosh``
+    :type  name: str
+    :returns: Subclass of :class:`papis.database.base.Database`
+    :raises Exception: If no backend with this name can be loaded
+
+    >>> get_backend('papis')
+    <class 'papis.database.cache.Database'>
+    """
+    database_mgr = _create_database_mgr([name])
+    if name not in database_mgr.names():
+        raise Exception(
+            'No valid database type: {0} (available: {1})'.format(
+                name, ', '.join(get_available_backends())
+            )
+        )
+    return database_mgr[name].plugin
+
+
 def get(library=None):
     global DATABASES
     import papis.config
@@ -12,22 +68,127 @@ def get(library=None):
     elif isinstance(library, str):
         library = papis.config.get_lib_from_name(library)
     backend = papis.config.get('database-backend')
-    database = DATABASES.get(library)
+    # the libraries are created again every time they are set, so the
+    # databases are kept by the name and the folders of the library
+    key = (library.name, library.path_format())
+    database = DATABASES.get(key)
     # if there is already a database and the backend of the database
     # is the same as the config backend, then return that library
     # else we will (re)define the database in the dictionary DATABASES
     if database is not None and database.get_backend_name() == backend:
-        return DATABASES.get(library)
-    if backend == "papis":
-        import papis.database.cache
-        DATABASES[library] = papis.database.cache.Database(library)
-        return DATABASES.get(library)
-    elif backend == "whoosh":
-        import papis.database.whoosh
-        DATABASES[library] = papis.database.whoosh.Database(library)
-        return DATABASES.get(library)
+        database.refresh()
+        return database
+    DATABASES[key] = get_backend(backend)(library)
+    return DATABASES.get(key)
+
+
+def query_to_pick(query_string, library=None):
+    """Get the documents matching ``query_string`` among which a single
+    one is picked, e.g. by ``papis open`` or ``papis edit``. If the
+    ``pick-query-limit`` setting is set, only this number of documents is
+    retrieved, the best matches first. Otherwise all of them are retrieved
+    in the order of the library, since ranking all of them would be slower
+    than the filter of the database.
+
+    The documents come from an iterator, see
+    :meth:`papis.database.base.Database.iter_query`, so that the picker
+    shows them while the database is still searching.
+
+    :param query_string: Query string
+    :type  query_string: str
+    :param library: Library, by default the current one
+    :returns: Iterator over the documents
+    """
+    import papis.config
+    limit = papis.config.getint('pick-query-limit') or None
+    return get(library).iter_query(
+        query_string,
+        limit=limit,
+        sort='relevance' if limit else None
+    )
+
+
+def get_metrics():
+    """Get the metrics of the databases used so far, see
+    :class:`papis.database.base.Database`.
+
+    :returns: Dictionary with the name of the library of every database
+        and its metrics
+    :rtype:  dict
+    """
+    return dict(
+        (database.lib.name, database.get_metrics())
+        for database in DATABASES.values()
+    )
+
+
+#: Maximum number of libraries searched at the same time by
+#: :func:`query_libraries`.
+MAX_SEARCH_THREADS = 16
+
+
+def query_libraries(libraries, query_string=None, limit=None, sort=None):
+    """Query several libraries at the same time, every library with its own
+    database, and merge the results. The documents are tagged with the name
+    of their library.
+
+    Without ``sort`` or with ``sort='relevance'`` the documents of the
+    libraries come one library after the other, since the relevance of
+    the documents of different libraries can not be compared, otherwise
+    they are sorted together.
+
+    :param libraries: Libraries, their names or library objects
+    :type  libraries: list
+    :param query_string: Query, by default all the documents
+    :type  query_string: str
+    :param limit: Maximum number of documents to be returned
+    :type  limit: int
+    :param sort: Sort the documents, see
+        :meth:`papis.database.base.Database.query`
+    :type  sort: str
+    :returns: List of pairs with the name of the library and the document
+    :rtype:  list
+    :raises Exception: If a library can not be queried
+    """
+    import concurrent.futures
+    import papis.config
+    import papis.database.base
+    # every library is searched once, even if it is given several times
+    unique = []
+    for library in libraries:
+        if isinstance(library, str):
+            library = papis.config.get_lib_from_name(library)
+        if library.name not in [lib.name for lib in unique]:
+            unique.append(library)
+    libraries = unique
+
+    def query(library):
+        database = get(library)
+        return database.query(
+            query_string or database.get_all_query_string(),
+            limit=limit,
+            sort=sort
+        )
+
+    if len(libraries) == 1:
+        results = [query(libraries[0])]
     else:
-        raise Exception('No valid database type: {}'.format(backend))
+        with concurrent.futures.ThreadPoolExecutor(
+                max_workers=min(len(libraries), MAX_SEARCH_THREADS)
+                ) as executor:
+            results = list(executor.map(query, libraries))
+    tagged = [
+        (library.name, document)
+        for library, documents in zip(libraries, results)
+        for document in documents
+    ]
+    if sort is None or sort == 'relevance' or len(libraries) == 1:
+        return tagged[:limit]
+    documents = papis.database.base.sort_documents(
+        [document for _, document in tagged], sort, limit=limit
+    )
+    names = dict((id(document), name) for name, document in tagged)
+    return [(names[id(document)], document) for document in documents]
 
 
 def get_all_query_string():
@@ -2,22 +2,271 @@
 Here the database abstraction for the libraries is defined.
 """
 
+import contextlib
+import functools
+import heapq
+import os
+import time
 import papis.utils
 import papis.config
 import papis.library
 
 
+def parse_sort(sort):
+    """Parse a sort specification of the form ``KEY`` or ``KEY:desc``.
+
+    :param sort: Sort specification
+    :type  sort: str
+    :returns: The key and wether the order is descending
+    :rtype:  tuple
+
+    >>> parse_sort('year')
+    ('year', False)
+    >>> parse_sort('year:desc')
+    ('year', True)
+    >>> parse_sort('title:asc')
+    ('title', False)
+    """
+    key, _, order = sort.partition(':')
+    if order not in ['', 'asc', 'desc']:
+        raise ValueError(
+            "Invalid sort order '{0}', use 'asc' or 'desc'".format(order)
+        )
+    return key, order == 'desc'
+
+
+def check_limit(limit):
+    """Check the maximum number of documents that a query returns.
+
+    :param limit: Maximum number of documents or ``None`` for all of them
+    :type  limit: int
+    :raises ValueError: If the limit is negative
+
+    >>> check_limit(-1)
+    Traceback (most recent call last):
+    ...
+    ValueError: Invalid limit '-1', it can not be negative
+    """
+    if limit is not None and limit < 0:
+        raise ValueError(
+            "Invalid limit '{0}', it can not be negative".format(limit)
+        )
+
+
+def get_sort_value(value):
+    """Get a value that can be used to compare document values of
+    different types, numbers are compared as numbers and everything else
+    as lower case strings.
+
+    :param value: Value of a document key
+    :returns: Comparable tuple
+    :rtype:  tuple
+
+    >>> get_sort_value('2009') < get_sort_value(2018)
+    True
+    >>> get_sort_value('Zebra') > get_sort_value('apple')
+    True
+    """
+    try:
+        return (0, float(value))
+    except (TypeError, ValueError):
+        return (1, str(value).lower())
+
+
+def sort_documents(documents, sort, limit=None):
+    """Sort documents by a key, the documents that do not have
+    the key always come last. The values that are not numbers always
+    come after the numbers, also in descending order.
+    If only a few documents are needed,
+    use ``limit``, so that not all the documents are sorted.
+    This is the fallback for backends that can not sort by themselves.
+
+    :param documents: Documents, any iterable is accepted
+    :type  documents: list
+    :param sort: Sort specification, see :func:`parse_sort`
+    :type  sort: str
+    :param limit: Maximum number of documents to be returned
+    :type  limit: int
+    :returns: List of sorted documents
+    :rtype:  list
+
+    >>> import papis.document
+    >>> docs = [papis.document.from_data(dict(year=y))\
+                for y in [2001, '1999', '', 'unknown', 2010]]
+    >>> [d['year'] for d in sort_documents(docs, 'year')]
+    ['1999', 2001, 2010, 'unknown', '']
+    >>> [d['year'] for d in sort_documents(docs, 'year:desc')]
+    [2010, 2001, '1999', 'unknown', '']
+    >>> [d['year'] for d in sort_documents(docs, 'year:desc', limit=2)]
+    [2010, 2001]
+    """
+    key, reverse = parse_sort(sort)
+    # numbers, other values and documents without the key
+    groups = [], [], []
+    for d in documents:
+        if d[key] in ['', None]:
+            groups[2].append(d)
+        else:
+            groups[get_sort_value(d[key])[0]].append(d)
+
+    def sort_value(d):
+        return get_sort_value(d[key])
+
+    present = []
+    for group in groups[:2]:
+        if limit is not None and len(present) >= limit:
+            break
+        if limit is None:
+            present += sorted(group, key=sort_value, reverse=reverse)
+        elif reverse:
+            present += heapq.nlargest(limit, group, key=sort_value)
+        else:
+            present += heapq.nsmallest(limit, group, key=sort_value)
+    return (present + groups[2])[:limit]
+
+
+#: Functions called as ``callback(database, name, value)`` every time
+#: a database records a metric, see :meth:`Database.count` and
+#: :meth:`Database.record_time`.
+metrics_callbacks = []
+
+
+def record_query(query):
+    """Decorator for the ``query`` method of the backends, so that they
+    record the ``query`` latencies and the number of ``query_results``.
+    """
+    @functools.wraps(query)
+    def wrapper(self, query_string, limit=None, sort=None):
+        check_limit(limit)
+        with self.record_time('query'):
+            documents = query(self, query_string, limit=limit, sort=sort)
+        self.count('query_results', len(documents))
+        return documents
+    return wrapper
+
+
+def record_iter_query(iter_query):
+    """Decorator for the ``iter_query`` method of the backends, like
+    :func:`record_query`. Only the time spent finding the documents counts
+    as ``query`` latency, not the time the caller spends between them,
+    and the metrics are recorded when the iterator is exhausted or closed.
+    """
+    @functools.wraps(iter_query)
+    def wrapper(self, query_string, limit=None, sort=None):
+        # checked right away, not when the first document is needed
+        check_limit(limit)
+        return recorded(self, query_string, limit, sort)
+
+    def recorded(self, query_string, limit, sort):
+        start = time.perf_counter()
+        documents = iter_query(self, query_string, limit=limit, sort=sort)
+        elapsed = time.perf_counter() - start
+        found = 0
+        try:
+            while True:
+                start = time.perf_counter()
+                try:
+                    document = next(documents)
+                except StopIteration:
+                    break
+                finally:
+                    elapsed += time.perf_counter() - start
+                found += 1
+                yield document
+        finally:
+            if hasattr(documents, 'close'):
+                documents.close()
+            self.add_duration('query', elapsed)
+            self.count('query_results', found)
+    return wrapper
+
+
 class Database(object):
     """Abstract class for the database backends
+
+    The backends keep metrics of what they do in ``metrics``, where
+    the counters are
+
+    - ``documents_loaded``: Documents read from the cache or the library,
+    - ``cache_hits`` and ``cache_misses``: Whether the cache or index was
+      there when it was needed,
+    - ``bytes_read`` and ``bytes_written``: Data read from and written to
+      the cache,
+    - ``query_results``: Documents returned by the queries,
+
+    and the durations, with their ``count``, ``total`` and ``max`` in
+    seconds, are
+
+    - ``index_build``: Building the cache or index from the library,
+    - ``query``: Answering the queries.
     """
 
     def __init__(self, library=None):
         self.lib = library or papis.config.get_lib()
         assert(isinstance(self.lib, papis.library.Library))
+        self.metrics = dict()
+
+    def count(self, name, value=1):
+        """Add ``value`` to the counter ``name`` of the metrics.
+
+        :param name: Name of the counter, e.g., ``cache_hits``
+        :type  name: str
+        :param value: Value to be added
+        :type  value: int
+        """
+        self.metrics[name] = self.metrics.get(name, 0) + value
+        for callback in metrics_callbacks:
+            callback(self, name, value)
+
+    def add_duration(self, name, seconds):
+        """Add a duration to the metrics, see :meth:`record_time`.
+
+        :param name: Name of the duration, e.g., ``query``
+        :type  name: str
+        :param seconds: Duration in seconds
+        :type  seconds: float
+        """
+        duration = self.metrics.get(name)
+        if duration is None:
+            duration = self.metrics[name] = dict(count=0, total=0, max=0)
+        duration['count'] += 1
+        duration['total'] += seconds
+        duration['max'] = max(duration['max'], seconds)
+        for callback in metrics_callbacks:
+            callback(self, name, seconds)
+
+    @contextlib.contextmanager
+    def record_time(self, name):
+        """Context manager adding the time spent in it to the duration
+        ``name`` of the metrics.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_duration(name, time.perf_counter() - start)
+
+    def get_metrics(self):
+        """Get a copy of the metrics of the database.
+
+        :returns: Dictionary with the counters and the durations
+        :rtype:  dict
+        """
+        return dict(
+            (key, dict(value) if isinstance(value, dict) else value)
+            for key, value in self.metrics.items()
+        )
 
     def initialize(self):
         raise NotImplementedError('Initialize not implemented')
 
+    def refresh(self):
+        """Bring the database up to date with changes made by other
+        processes, it is called every time the database is reused,
+        see :func:`papis.database.get`. It does nothing by default.
+        """
+        pass
+
     def get_backend_name(self):
         raise NotImplementedError('Get backend name not implemented')
 
@@ -53,9 +302,76 @@ class Database(object):
     def delete(self, document):
         raise NotImplementedError('Delete not implemented')
 
-    def query(self, query_string):
+    def contains(self, document):
+        """Wether the folder of ``document`` is in the database. Backends
+        can override it, by default all the documents are looked through.
+
+        :param document: Papis document
+        :type  document: papis.document.Document
+        :rtype:  bool
+        """
+        folder = document.get_main_folder()
+        return any(
+            d.get_main_folder() == folder for d in self.get_all_documents()
+        )
+
+    def update_folders(self, folders):
+        """Bring the documents in ``folders`` up to date with their info
+        files, i.e., the documents are added, updated or deleted according
+        to whether the info file is there and the document is in the
+        database. It is used by :mod:`papis.watcher` for the changes done
+        outside of papis, backends can override it to apply all the changes
+        at once.
+
+        :param folders: Folders of the documents
+        :type  folders: list
+        """
+        import papis.document
+        for folder in folders:
+            document = papis.document.from_folder(folder)
+            if not os.path.exists(document.get_info_file()):
+                self.delete(document)
+            elif self.contains(document):
+                self.update(document)
+            else:
+                self.add(document)
+
+    def query(self, query_string, limit=None, sort=None):
+        """Get the documents matching query_string
+
+        :param query_string: Query string
+        :type  query_string: str
+        :param limit: Maximum number of documents to be returned,
+            all of them if it is ``None``.
+        :type  limit: int
+        :param sort: If it is ``"relevance"`` the best matching documents
+            come first. It can also be a key of the documents, optionally
+            followed by ``:desc`` for descending order, e.g., ``year:desc``
+            (see :func:`sort_documents`). If it is ``None`` the order
+            of the library is kept.
+        :type  sort: str
+        :returns: List of documents
+        :rtype:  list
+        """
         raise NotImplementedError('Query not implemented')
 
+    def iter_query(self, query_string, limit=None, sort=None):
+        """Iterator variant of :meth:`query`, the backends yield the documents
+        as they are found when they can, so that callers that only need the
+        first documents, e.g. ``papis list | head``, can stop the search by
+        closing the iterator. By default the documents of :meth:`query`
+        are yielded.
+
+        :param query_string: Query string
+        :type  query_string: str
+        :param limit: Maximum number of documents to be returned
+        :type  limit: int
+        :param sort: See :meth:`query`
+        :type  sort: str
+        :returns: Iterator over the documents
+        """
+        return iter(self.query(query_string, limit=limit, sort=sort))
+
     def query_dict(self, query_string):
         raise NotImplementedError('Query dict not implemented')
 
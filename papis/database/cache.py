@@ -7,13 +7,21 @@ import papis.docmatcher
 import papis.document
 import papis.config
 import papis.database.base
+import papis.timing
 import re
+import bisect
+import heapq
+import itertools
 import multiprocessing
+import threading
 import time
 
 
 logger = logging.getLogger("cache")
 
+#: Maximum number of cache files of a library loaded at the same time.
+MAX_LOAD_THREADS = 8
+
 
 def get_cache_file_name(directory):
     """Create a cache file name out of the path of a given directory.
@@ -52,13 +60,18 @@ def get_cache_file_path(directory):
     return os.path.join(folder, cache_name)
 
 
-def filter_documents(documents, search=""):
-    """Filter documents. It can be done in a multi core way.
+@papis.timing.span('filter')
+def filter_documents(documents, search="", limit=None):
+    """Filter documents. It is done in a multi core way in the main
+    thread and serially in other threads or when pools can not be forked,
+    see :func:`papis.utils.can_fork`.
 
     :param documents: List of papis documents.
     :type  documents: papis.documents.Document
     :param search: Valid papis search string.
     :type  search: str
+    :param limit: Stop filtering once ``limit`` documents have matched.
+    :type  limit: int
     :returns: List of filtered documents
     :rtype:  list
 
@@ -69,17 +82,85 @@ def filter_documents(documents, search=""):
     True
     >>> len(filter_documents([document], search="title = ein")) == 1
     False
+    >>> len(filter_documents([document, document], "einstein", limit=1))
+    1
 
     """
+    if limit is not None or not papis.utils.can_fork():
+        return list(iter_filter_documents(documents, search, limit=limit))
+    logger = logging.getLogger('filter')
+    pool = _start_filter_pool(documents, search)
+    begin_t = time.time()
+    result = pool.map(
+        papis.docmatcher.DocMatcher.return_if_match, documents
+    )
+    pool.close()
+    pool.join()
+    filtered_docs = [d for d in result if d is not None]
+    logger.debug(
+        "done ({} ms) ({} docs)".format(
+            1000*time.time()-1000*begin_t,
+            len(filtered_docs))
+    )
+    return filtered_docs
+
+
+def iter_filter_documents(documents, search="", limit=None):
+    """Iterator variant of :func:`filter_documents`, the documents are
+    yielded in order as soon as they are matched, and the matching stops
+    when the iterator is closed or ``limit`` documents have matched.
+
+    :param documents: List of papis documents.
+    :type  documents: papis.documents.Document
+    :param search: Valid papis search string.
+    :type  search: str
+    :param limit: Stop filtering once ``limit`` documents have matched.
+    :type  limit: int
+    :returns: Iterator over the filtered documents
+
+    >>> docs = [papis.document.from_data({'author': a})
+    ...         for a in ['einstein', 'bohr', 'einstein']]
+    >>> documents = iter_filter_documents(docs, search="einstein")
+    >>> next(documents)['author']
+    'einstein'
+    >>> documents.close()
+    """
+    if limit is not None and limit <= 0:
+        return
+    if not papis.utils.can_fork():
+        yield from itertools.islice(
+            _iter_match_serially(documents, search), limit
+        )
+        return
+    # the documents are matched in the background, only the start of
+    # the workers is timed
+    with papis.timing.span('filter'):
+        pool = _start_filter_pool(documents, search)
+    found = 0
+    try:
+        # imap keeps the order of the documents, the chunks are small so
+        # that the first documents come early
+        for d in pool.imap(
+                papis.docmatcher.DocMatcher.return_if_match,
+                documents,
+                chunksize=max(1, min(limit or 200, 200))):
+            if d is None:
+                continue
+            yield d
+            found += 1
+            if limit is not None and found >= limit:
+                break
+    finally:
+        pool.terminate()
+        pool.join()
+
+
+def _start_filter_pool(documents, search):
     logger = logging.getLogger('filter')
-    papis.docmatcher.DocMatcher.set_search(search)
-    papis.docmatcher.DocMatcher.parse()
-    papis.docmatcher.DocMatcher.set_matcher(match_document)
     # Doing this multiprocessing in filtering does not seem
     # to help much, I don't know if it's because I'm doing something
     # wrong or it is really like this.
     np = multiprocessing.cpu_count()
-    pool = multiprocessing.Pool(np)
     logger.debug(
         "Filtering {} docs (search {}) using {} cores".format(
             len(documents),
@@ -87,20 +168,133 @@ def filter_documents(documents, search=""):
             np
         )
     )
+    papis.docmatcher.DocMatcher.set_search(search)
+    papis.docmatcher.DocMatcher.parse()
+    papis.docmatcher.DocMatcher.set_matcher(match_document)
+    # the workers are forked here, after the search has been parsed
+    pool = multiprocessing.Pool(np)
     logger.debug("pool started")
+    return pool
+
+
+@papis.timing.span('filter')
+def rank_documents(documents, search="", limit=None):
+    """Filter documents and sort them by relevance, the relevance being
+    given by :func:`get_match_position`, i.e., documents matching the search
+    closer to the beginning of their match string come first. Documents
+    with the same score keep the order of ``documents``.
+
+    If a ``limit`` is given, only the best ``limit`` documents are kept
+    in a heap, and the search stops as soon as ``limit`` documents
+    with the best possible score have been found.
+
+    :param documents: List of papis documents.
+    :type  documents: papis.documents.Document
+    :param search: Valid papis search string.
+    :type  search: str
+    :param limit: Maximum number of documents to return.
+    :type  limit: int
+    :returns: List of sorted documents
+    :rtype:  list
+
+    >>> docs = [papis.document.from_data({'author': a})
+    ...         for a in ['albert einstein', 'einstein', 'bohr']]
+    >>> [d['author'] for d in rank_documents(docs, 'author = einstein')]
+    ['einstein', 'albert einstein']
+    >>> [d['author'] for d in rank_documents(docs, 'author = e', limit=1)]
+    ['einstein']
+    """
+    logger = logging.getLogger('rank')
     begin_t = time.time()
-    result = pool.map(
-        papis.docmatcher.DocMatcher.return_if_match, documents
-    )
-    pool.close()
-    pool.join()
-    filtered_docs = [d for d in result if d is not None]
+    ranges, groups = _parse_search(search)
+    # The heap keeps the worst of the best documents on top, i.e., it
+    # contains tuples (-score, -index, document)
+    heap = []
+    for i, document in enumerate(documents):
+        score = _get_score(document, ranges, groups)
+        if score is None:
+            continue
+        item = (-score, -i, document)
+        if limit is None or len(heap) < limit:
+            heapq.heappush(heap, item)
+        elif item[:2] > heap[0][:2]:
+            heapq.heapreplace(heap, item)
+        if limit is not None and len(heap) == limit and heap[0][0] == 0:
+            # nothing that comes later can beat these documents
+            break
+    ranked_docs = [item[2] for item in sorted(heap, reverse=True)]
     logger.debug(
         "done ({} ms) ({} docs)".format(
             1000*time.time()-1000*begin_t,
-            len(filtered_docs))
+            len(ranked_docs))
     )
-    return filtered_docs
+    return ranked_docs
+
+
+def _parse_search(search):
+    parsed_search = papis.docmatcher.parse_query(search)
+    ranges = list(filter(None, map(papis.docmatcher.get_range, parsed_search)))
+    groups = [
+        (
+            parsed[-1],
+            papis.docmatcher.get_doc_format().replace(
+                'DOC_KEY', parsed[0]
+            ) if len(parsed) == 3 else None
+        )
+        for parsed in parsed_search
+        if papis.docmatcher.get_range(parsed) is None
+    ]
+    return ranges, groups
+
+
+def _get_score(document, ranges, groups):
+    # sum of the match positions of the groups, None if any does not match
+    if not all(papis.docmatcher.match_range(document, r) for r in ranges):
+        return None
+    score = 0
+    for group_search, group_format in groups:
+        position = get_match_position(document, group_search, group_format)
+        if position is None:
+            return None
+        score += position
+    return score
+
+
+def _iter_match_serially(documents, search):
+    # the global search of papis.docmatcher.DocMatcher is not touched, so
+    # that several threads can match at the same time
+    ranges, groups = _parse_search(search)
+    for document in documents:
+        if _get_score(document, ranges, groups) is not None:
+            yield document
+
+
+def get_match_position(document, search, match_format=None):
+    """Position in the match string of the document where the search
+    matches, it is ``None`` if it does not match. It matches exactly
+    the same documents as :func:`match_document`.
+
+    :param document: Papis document
+    :type  document: papis.document.Document
+    :param search: A valid search string
+    :type  search: str
+    :param match_format: Python-like format string.
+    :type  match_format: str
+    :returns: Position or None
+
+    >>> document = papis.document.from_data({'author': 'einstein'})
+    >>> get_match_position(document, 'stein', '{doc[author]}')
+    3
+    >>> get_match_position(document, 'bohr', '{doc[author]}') is None
+    True
+    """
+    match_format = match_format or papis.config.get("match-format")
+    match_string = papis.utils.format_doc(match_format, document)
+    regex = r"(.*?)" + re.sub(r"\s+", ".*", search)
+    m = re.match(regex, match_string, re.IGNORECASE)
+    if m is None:
+        return None
+    return max(m.end(1), 0)
 
 
 def match_document(document, search, match_format=None):
@@ -147,11 +341,22 @@ def get_regex_from_search(search):
 
 
 class Database(papis.database.base.Database):
+    """Database keeping the documents of the library in pickled cache files,
+    one for every folder of the library. The caches of the folders are
+    loaded in parallel and merged, and the changes to a document only
+    rewrite the cache of its folder, so that adding, removing or reordering
+    folders of the library, or folders that are never changed, e.g.,
+    read-only mounts, do not invalidate the other caches.
+    """
 
     def __init__(self, library=None):
         papis.database.base.Database.__init__(self, library)
         self.logger = logging.getLogger('db:cache')
         self.documents = None
+        self.sort_indices = None
+        # modification times of the cache files when they were last read or
+        # written, to know when another process has changed them
+        self.cache_mtime = None
         self.initialize()
 
     def get_backend_name(self):
@@ -160,25 +365,85 @@ class Database(papis.database.base.Database):
     def initialize(self):
         pass
 
+    def refresh(self):
+        """Forget the documents if a cache file has been changed or
+        removed by another process since it was read, e.g., when a
+        ``papis serve`` daemon keeps the documents while documents are
+        added.
+        """
+        if self.documents is None or not papis.config.getboolean("use-cache"):
+            return
+        if self._get_cache_mtime() != self.cache_mtime:
+            self.logger.debug('The cache has changed, it will be read again')
+            self.documents = None
+            self.sort_indices = None
+
+    def _get_cache_mtime(self):
+        return tuple(
+            self._get_shard_mtime(directory) for directory in self.get_dirs()
+        )
+
+    def _get_shard_mtime(self, directory):
+        try:
+            return os.stat(self._get_cache_file_path(directory)).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
     def get_documents(self):
         if self.documents is not None:
             return self.documents
+        with papis.timing.span('database'):
+            return self._load_documents()
+
+    def _load_documents(self):
+        import concurrent.futures
         use_cache = papis.config.getboolean("use-cache")
-        cache_path = self._get_cache_file_path()
-        if use_cache and os.path.exists(cache_path):
-            self.logger.debug(
-                "Getting documents from cache in {0}".format(cache_path)
-            )
-            with open(cache_path, 'rb') as fd:
-                self.documents = pickle.load(fd)
-        else:
-            self.logger.info('Indexing library, this might take a while')
-            folders = sum([
-                papis.utils.get_folders(d) for d in self.get_dirs()
-            ], [])
-            self.documents = folders_to_documents(folders)
-            if use_cache:
-                self.save()
+        directories = self.get_dirs()
+        workers = max(1, min(len(directories), MAX_LOAD_THREADS))
+        with concurrent.futures.ThreadPoolExecutor(workers) as executor:
+            shards = list(executor.map(
+                lambda d: self._read_shard(d) if use_cache else None,
+                directories
+            ))
+            missing = [
+                directory for directory, shard in zip(directories, shards)
+                if shard is None
+            ]
+            for shard in shards:
+                if shard is not None:
+                    self.count('cache_hits')
+                    self.count('bytes_read', shard[1])
+            if missing:
+                self.logger.info('Indexing library, this might take a while')
+                self.count('cache_misses', len(missing))
+                with self.record_time('index_build'):
+                    folders = list(executor.map(
+                        papis.utils.get_folders, missing
+                    ))
+                    # a single pool reads the info files of all the folders
+                    documents = iter(folders_to_documents(
+                        list(itertools.chain.from_iterable(folders))
+                    ))
+                for directory, shard_folders in zip(missing, folders):
+                    shard = (
+                        list(itertools.islice(documents, len(shard_folders))),
+                        0, None
+                    )
+                    shards[directories.index(directory)] = shard
+                    if use_cache:
+                        self._write_shard(directory, shard[0])
+                if use_cache:
+                    self._clear_sort_indices()
+        # the documents are always in the order of the folders, so that
+        # the positions in the sorted indices are the same for everyone
+        self.documents = list(itertools.chain.from_iterable(
+            shard[0] for shard in shards
+        ))
+        self.cache_mtime = tuple(
+            self._get_shard_mtime(directory) if shard[2] is None else shard[2]
+            for directory, shard in zip(directories, shards)
+        )
+        self.count('documents_loaded', len(self.documents))
         self.logger.debug(
             "Loaded documents ({} documents)".format(
                 len(self.documents)
@@ -186,6 +451,76 @@ class Database(papis.database.base.Database):
         )
         return self.documents
 
+    def _read_shard(self, directory):
+        """Read the cache of a folder of the library.
+
+        :returns: The documents, the bytes read and the modification time
+            of the cache, or None if there is no cache
+        :rtype:  tuple
+        """
+        cache_path = self._get_cache_file_path(directory)
+        try:
+            fd = open(cache_path, 'rb')
+        except FileNotFoundError:
+            return None
+        self.logger.debug(
+            "Getting documents from cache in {0}".format(cache_path)
+        )
+        with fd:
+            mtime = os.fstat(fd.fileno()).st_mtime_ns
+            return pickle.load(fd), fd.tell(), mtime
+
+    def _write_shard(self, directory, documents):
+        path = self._get_cache_file_path(directory)
+        self.logger.debug(
+            'Saving {0} ... ({1} documents)'.format(path, len(documents))
+        )
+        self._dump(documents, path)
+
+    def _dump(self, data, path):
+        """Pickle ``data`` into a file next to ``path`` and rename it, so
+        that a crash or a concurrent reader never sees half a file.
+        """
+        # unique among the processes and their threads
+        temp_path = '{0}.{1}.{2}'.format(
+            path, os.getpid(), threading.get_ident()
+        )
+        try:
+            with open(temp_path, "wb") as fd:
+                pickle.dump(data, fd)
+                self.count('bytes_written', fd.tell())
+            os.replace(temp_path, path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+    def _get_shard(self, folder, prefixes=None):
+        """Get the folder of the library containing a document folder,
+        the documents outside of the library belong to the first folder.
+
+        :param prefixes: Prefixes of the folders of the library, see
+            :meth:`_get_shard_prefixes`
+        """
+        directories = self.get_dirs()
+        if len(directories) == 1:
+            return directories[0]
+        folder = os.path.join(os.path.abspath(folder), '')
+        for prefix, directory in prefixes or self._get_shard_prefixes():
+            if folder.startswith(prefix):
+                return directory
+        return directories[0]
+
+    def _get_shard_prefixes(self):
+        # the longest prefix wins, for folders inside of other folders
+        return sorted(
+            (
+                (os.path.join(os.path.abspath(d), ''), d)
+                for d in self.get_dirs()
+            ),
+            key=lambda prefix: -len(prefix[0])
+        )
+
     def add(self, document):
         docs = self.get_documents()
         self.logger.debug('adding ...')
@@ -194,7 +529,7 @@ class Database(papis.database.base.Database):
             docs[-1].get_main_folder() == document.get_main_folder()
         )
         assert(os.path.exists(document.get_main_folder()))
-        self.save()
+        self.save([self._get_shard(document.get_main_folder())])
 
     def update(self, document):
         if not papis.config.getboolean("use-cache"):
@@ -204,7 +539,7 @@ class Database(papis.database.base.Database):
         result = self._locate_document(document)
         index = result[0][0]
         docs[index] = document
-        self.save()
+        self.save([self._get_shard(document.get_main_folder())])
 
     def delete(self, document):
         if not papis.config.getboolean("use-cache"):
@@ -214,16 +549,53 @@ class Database(papis.database.base.Database):
         result = self._locate_document(document)
         index = result[0][0]
         docs.pop(index)
-        self.save()
+        self.save([self._get_shard(document.get_main_folder())])
+
+    def update_folders(self, folders):
+        """Bring the documents in ``folders`` up to date with their info
+        files, the cache of every folder of the library is saved once for
+        all of them, see
+        :meth:`papis.database.base.Database.update_folders`.
+        """
+        docs = self.get_documents()
+        positions = dict(
+            (d.get_main_folder(), i) for i, d in enumerate(docs)
+        )
+        removed = []
+        for folder in folders:
+            position = positions.get(folder)
+            document = papis.document.from_folder(folder)
+            if os.path.exists(document.get_info_file()):
+                if position is None:
+                    positions[folder] = len(docs)
+                    docs.append(document)
+                else:
+                    docs[position] = document
+            elif position is not None:
+                removed.append(position)
+        for position in sorted(removed, reverse=True):
+            docs.pop(position)
+        self.logger.debug('updated {0} folders'.format(len(folders)))
+        if papis.config.getboolean("use-cache"):
+            self.save(set(self._get_shard(folder) for folder in folders))
+        else:
+            self.sort_indices = None
 
     def match(self, document, query_string):
         return match_document(document, query_string)
 
     def clear(self):
-        cache_path = self._get_cache_file_path()
-        self.logger.warning("clearing cache %s " % cache_path)
-        if os.path.exists(cache_path):
-            os.remove(cache_path)
+        # the cache of the whole library comes from older versions
+        paths = set([self._get_cache_file_path()] + [
+            self._get_cache_file_path(directory)
+            for directory in self.get_dirs()
+        ])
+        for cache_path in sorted(paths):
+            if os.path.exists(cache_path):
+                self.logger.warning("clearing cache %s " % cache_path)
+                os.remove(cache_path)
+        self.documents = None
+        self._clear_sort_indices()
 
     def query_dict(self, dictionary):
         query_string = " ".join(
@@ -231,15 +603,67 @@ class Database(papis.database.base.Database):
         )
         return self.query(query_string)
 
-    def query(self, query_string):
+    @papis.database.base.record_query
+    def query(self, query_string, limit=None, sort=None):
+        self.logger.debug('Querying')
+        docs, matched = self._get_candidates(query_string, limit, sort)
+        if matched:
+            return docs if limit is None else docs[:limit]
+        if sort == 'relevance':
+            return rank_documents(docs, query_string, limit=limit)
+        return filter_documents(docs, query_string, limit=limit)
+
+    @papis.database.base.record_iter_query
+    def iter_query(self, query_string, limit=None, sort=None):
+        """The documents are matched in the background as they are needed,
+        see :func:`iter_filter_documents`, except when they are sorted by
+        relevance, since all of them have to be matched for that.
+        """
         self.logger.debug('Querying')
+        docs, matched = self._get_candidates(query_string, limit, sort)
+        if matched:
+            return iter(docs if limit is None else docs[:limit])
+        if sort == 'relevance':
+            return iter(rank_documents(docs, query_string, limit=limit))
+        return iter_filter_documents(docs, query_string, limit=limit)
+
+    def _get_candidates(self, query_string, limit=None, sort=None):
+        """Get the documents that can match the query in the order given
+        by ``sort``, and whether all of them match it, so that they do
+        not have to be filtered.
+        """
         docs = self.get_documents()
         # This makes it faster, if it's the all query string, return everything
         # without filtering
         if query_string == self.get_all_query_string():
-            return docs
-        else:
-            return filter_documents(docs, query_string)
+            if sort is not None and sort != 'relevance':
+                return self.get_sorted_documents(sort, limit=limit), True
+            return docs, True
+        parsed_search = papis.docmatcher.parse_query(query_string)
+        ranges = list(
+            filter(None, map(papis.docmatcher.get_range, parsed_search))
+        )
+        if ranges:
+            # Look the ranges up in the sorted indices, so that only the
+            # documents inside of the ranges have to be filtered
+            positions = self._get_range_positions(ranges[0])
+            for value_range in ranges[1:]:
+                positions &= self._get_range_positions(value_range)
+            if sort is not None and sort != 'relevance':
+                docs = [
+                    docs[i] for i in self._get_sorted_positions(sort)
+                    if i in positions
+                ]
+            else:
+                docs = [docs[i] for i in sorted(positions)]
+            # the ranges might be all there is to the query
+            return docs, len(ranges) == len(parsed_search) and \
+                sort != 'relevance'
+        elif sort is not None and sort != 'relevance':
+            # Filtering keeps the order, so we can filter the documents
+            # in sorted order and stop as soon as we have enough
+            docs = self.get_sorted_documents(sort)
+        return docs, False
 
     def get_all_query_string(self):
         return '.'
@@ -247,17 +671,148 @@ class Database(papis.database.base.Database):
     def get_all_documents(self):
         return self.get_documents()
 
-    def save(self):
+    def save(self, directories=None):
+        """Save the documents in the caches of the folders of the library.
+
+        :param directories: Folders of the library whose cache is saved,
+            by default all of them
+        :type  directories: list
+        """
         docs = self.get_documents()
-        self.logger.debug(
-            'Saving ... ({} documents)'.format(len(docs))
+        if directories is None:
+            directories = self.get_dirs()
+        if len(self.get_dirs()) == 1:
+            shards = dict((directory, docs) for directory in directories)
+        else:
+            prefixes = self._get_shard_prefixes()
+            shards = dict((directory, []) for directory in self.get_dirs())
+            for d in docs:
+                shard = self._get_shard(d.get_main_folder(), prefixes)
+                shards[shard].append(d)
+            # keep the documents in the order in which they are loaded
+            docs[:] = itertools.chain.from_iterable(
+                shards[directory] for directory in self.get_dirs()
+            )
+        for directory in self.get_dirs():
+            if directory in directories:
+                self._write_shard(directory, shards[directory])
+        self.cache_mtime = self._get_cache_mtime()
+        # the positions of the documents might have changed
+        self._clear_sort_indices()
+
+    @papis.timing.span('sort')
+    def get_sorted_documents(self, sort, limit=None):
+        """Get the documents sorted using a sorted index for the key,
+        see :func:`papis.database.base.sort_documents` for the sorting rules.
+        The sorted indices are built once for every key and stored alongside
+        the cache, they are rebuilt whenever the documents change.
+
+        :param sort: Sort specification, e.g., ``year:desc``
+        :type  sort: str
+        :param limit: Maximum number of documents to be returned
+        :type  limit: int
+        :returns: List of sorted documents
+        :rtype:  list
+        """
+        docs = self.get_documents()
+        positions = self._get_sorted_positions(sort)
+        return [docs[i] for i in itertools.islice(positions, limit)]
+
+    def _get_sorted_positions(self, sort):
+        """Iterate over the positions of the documents in the order given
+        by ``sort``. In descending order the numbers and the other values
+        are reversed separately, so that the numbers still come first.
+        """
+        key, reverse = papis.database.base.parse_sort(sort)
+        present, missing, values = self._get_sort_index(key)
+        if not reverse:
+            return itertools.chain(present, missing)
+        # in the sorted index all numbers come before the strings
+        split = bisect.bisect_left(values, (1,))
+        return itertools.chain(
+            reversed(present[:split]), reversed(present[split:]), missing
         )
-        path = self._get_cache_file_path()
-        with open(path, "wb+") as fd:
-            pickle.dump(docs, fd)
 
-    def _get_cache_file_path(self):
-        return get_cache_file_path(self.lib.path_format())
+    def _get_range_positions(self, value_range):
+        """Get the positions of the documents whose value lies inside of
+        a range, see :func:`papis.docmatcher.match_range`, by doing a binary
+        search in the sorted index of the key.
+        """
+        present, _, values = self._get_sort_index(value_range.key)
+        lower, upper = value_range.lower, value_range.upper
+        # numbers and strings are not compared with each other, and
+        # in the sorted index all numbers come before the strings
+        kind = (lower or upper)[0]
+        if lower is not None and upper is not None and lower[0] != upper[0]:
+            return set()
+        if lower is None:
+            start = bisect.bisect_left(values, (kind,))
+        elif value_range.lower_inclusive:
+            start = bisect.bisect_left(values, lower)
+        else:
+            start = bisect.bisect_right(values, lower)
+        if upper is None:
+            end = bisect.bisect_left(values, (kind + 1,))
+        elif value_range.upper_inclusive:
+            end = bisect.bisect_right(values, upper)
+        else:
+            end = bisect.bisect_left(values, upper)
+        return set(present[start:end])
+
+    def _get_sort_index(self, key):
+        """Get the positions of the documents that have the key sorted by
+        the value of the key, together with the positions of the documents
+        without the key and the sorted values, for binary searches.
+        """
+        docs = self.get_documents()
+        use_cache = papis.config.getboolean("use-cache")
+        sort_path = self._get_sort_index_file_path()
+        if self.sort_indices is None:
+            self.sort_indices = dict()
+            if use_cache and os.path.exists(sort_path):
+                with open(sort_path, 'rb') as fd:
+                    stored = pickle.load(fd)
+                    self.count('bytes_read', fd.tell())
+                # the caches of the folders can be shared with other
+                # libraries, so the indices are only valid for the caches
+                # they were built from
+                if isinstance(stored, tuple) and \
+                        stored[0] == self.cache_mtime:
+                    self.sort_indices = stored[1]
+        index = self.sort_indices.get(key)
+        if index is None or len(index[0]) + len(index[1]) != len(docs):
+            self.logger.debug('Building sorted index for %s' % key)
+            present, missing = [], []
+            for i, d in enumerate(docs):
+                (missing if d[key] in ['', None] else present).append(i)
+            present.sort(
+                key=lambda i: papis.database.base.get_sort_value(docs[i][key])
+            )
+            values = [
+                papis.database.base.get_sort_value(docs[i][key])
+                for i in present
+            ]
+            index = self.sort_indices[key] = (present, missing, values)
+            if use_cache:
+                self._dump((self.cache_mtime, self.sort_indices), sort_path)
+        return index
+
+    def _clear_sort_indices(self):
+        self.sort_indices = None
+        sort_path = self._get_sort_index_file_path()
+        if os.path.exists(sort_path):
+            os.remove(sort_path)
+
+    def _get_sort_index_file_path(self):
+        return self._get_cache_file_path() + '-sorted'
+
+    def _get_cache_file_path(self, directory=None):
+        """Get the path of the cache of a folder of the library, by default
+        the path named after all the folders, which is the cache of the
+        library if it has only one folder, and next to which the sorted
+        indices are kept.
+        """
+        return get_cache_file_path(directory or self.lib.path_format())
 
     def _locate_document(self, document):
         assert(isinstance(document, papis.document.Document))
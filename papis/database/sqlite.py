@@ -0,0 +1,628 @@
+"""This is the sqlite interface to papis. It only uses the ``sqlite3`` module
+of the python standard library, so it does not need any extra dependency.
+
+The database is stored in a single file which by default is in
+``$XDG_CACHE_HOME/papis/database/sqlite``. The name of the file is similar
+to the cache files of the papis cache database.
+
+The database consists of two tables. The ``documents`` table stores for
+every document its folder, the pickled document object (so that no yaml
+parsing is needed when loading the library) and one column for each of the
+fields declared in the ``sqlite-schema-fields`` setting. These columns are
+indexed, which makes :meth:`Database.query_dict` a simple lookup.
+
+The same fields are indexed by a
+`FTS5 <https://www.sqlite.org/fts5.html>`_ virtual table, which is kept in
+sync with the ``documents`` table through triggers. Queries written in the
+papis query language (see :mod:`papis.docmatcher`) are translated into FTS5
+prefix queries, and the results can be ranked with the ``bm25`` function
+by querying with ``sort='relevance'``.
+
+.. note::
+
+    FTS5 matches words and prefixes of words, so the query ``stein`` does
+    not match ``einstein`` as it would with the ``papis`` backend. Keys that
+    are not part of ``sqlite-schema-fields`` and search terms that are not
+    words are still matched the usual way on the retrieved documents.
+
+"""
+import os
+import re
+import pickle
+import itertools
+import sqlite3
+import logging
+import threading
+
+import papis.config
+import papis.document
+import papis.docmatcher
+import papis.database.base
+import papis.database.cache
+import papis.timing
+from papis.utils import get_cache_home, get_folders, folders_to_documents
+
+
+def quote_identifier(name):
+    """Quote a name so that it can be used as a sql identifier.
+
+    :param name: Column or table name
+    :type  name: str
+    :returns: Quoted name
+    :rtype:  str
+
+    >>> quote_identifier('title')
+    '"title"'
+    >>> quote_identifier('my "weird" key')
+    '"my ""weird"" key"'
+    """
+    return '"{0}"'.format(name.replace('"', '""'))
+
+
+def get_fts_terms(value, column=None):
+    """Translate a value of the papis query language into a list of FTS5
+    prefix queries, one for every word of the value.
+
+    :param value: Search value
+    :type  value: str
+    :param column: If given, the terms are restricted to this column
+    :type  column: str
+    :returns: List of FTS5 query terms
+    :rtype:  list
+
+    >>> get_fts_terms('Albert einst')
+    ['"albert"*', '"einst"*']
+    >>> get_fts_terms('ein', column='author')
+    ['"author" : "ein"*']
+    >>> get_fts_terms('.')
+    []
+    """
+    terms = ['"{0}"*'.format(t) for t in re.findall(r'\w+', value.lower())]
+    if column is not None:
+        terms = [
+            '{0} : {1}'.format(quote_identifier(column), t) for t in terms
+        ]
+    return terms
+
+
+def get_range_conditions(value_range):
+    """Get sql conditions for the column of the key of a range query.
+    The columns store the values as text, so numbers are cast before
+    comparing them. The conditions may let through documents that are not
+    in the range (e.g. ``CAST`` turns words into ``0``), so the documents
+    still have to be checked with :func:`papis.docmatcher.match_range`.
+
+    :param value_range: Range returned by :func:`papis.docmatcher.get_range`
+    :type  value_range: papis.docmatcher.Range
+    :returns: List of tuples with the condition and its parameter
+    :rtype:  list
+
+    >>> import papis.docmatcher
+    >>> get_range_conditions(
+    ...     papis.docmatcher.get_range(['year', '=', '2010..2015']))
+    [('CAST(d."year" AS REAL) >= ?', 2010.0), \
+('CAST(d."year" AS REAL) <= ?', 2015.0)]
+    >>> get_range_conditions(
+    ...     papis.docmatcher.get_range(['time-added', '>', '2019-05']))
+    [('d."time-added" > ? COLLATE NOCASE', '2019-05')]
+    """
+    column = 'd.{0}'.format(quote_identifier(value_range.key))
+    conditions = []
+    for bound, inclusive, operator in [
+            (value_range.lower, value_range.lower_inclusive, '>'),
+            (value_range.upper, value_range.upper_inclusive, '<')]:
+        if bound is None:
+            continue
+        operator += '=' if inclusive else ''
+        if bound[0] == 0:
+            conditions.append((
+                'CAST({0} AS REAL) {1} ?'.format(column, operator), bound[1]
+            ))
+        else:
+            conditions.append((
+                '{0} {1} ? COLLATE NOCASE'.format(column, operator), bound[1]
+            ))
+    return conditions
+
+
+def get_sort_number(value):
+    """Get the number to sort a value by, the same way as
+    :func:`papis.database.base.get_sort_value` does. It is registered
+    as the sql function ``papis_sort_number``.
+
+    :param value: Value of a column
+    :type  value: str
+    :returns: The number or ``None`` if the value is not a number
+    :rtype:  float
+
+    >>> get_sort_number('10'), get_sort_number('Zebra')
+    (10.0, None)
+    """
+    kind, number = papis.database.base.get_sort_value(value)
+    return number if kind == 0 else None
+
+
+class Database(papis.database.base.Database):
+
+    def __init__(self, library=None):
+        papis.database.base.Database.__init__(self, library)
+        self.logger = logging.getLogger('db:sqlite')
+        self.cache_dir = os.path.join(get_cache_home(), 'database', 'sqlite')
+        self.database_path = os.path.expanduser(
+            os.path.join(
+                self.cache_dir,
+                papis.database.cache.get_cache_file_name(
+                    self.lib.path_format()
+                ) + '.db'
+            )
+        )
+        self.fields = self.get_schema_fields()
+        # every thread has its own connection, e.g., the loader of the
+        # picker or the threads of papis.database.query_libraries
+        self.local = threading.local()
+        self.connections = []
+        self.connections_lock = threading.Lock()
+
+        self.initialize()
+
+    def get_backend_name(self):
+        return 'sqlite'
+
+    def get_schema_fields(self):
+        """Get the fields that are stored in indexed columns and in the full
+        text search table, i.e., ``sqlite-schema-fields``.
+
+        :returns: List of field names
+        :rtype:  list
+        """
+        fields = []
+        for field in papis.config.getlist('sqlite-schema-fields'):
+            if field not in fields:
+                fields.append(field)
+        return fields
+
+    def get_connection(self):
+        """Gets the connection of the current thread to the database file,
+        opening it if necessary.
+
+        :returns: Connection
+        :rtype:  sqlite3.Connection
+        """
+        connection = getattr(self.local, 'connection', None)
+        if connection is None:
+            if not os.path.exists(self.cache_dir):
+                self.logger.debug('Creating dir %s' % self.cache_dir)
+                os.makedirs(self.cache_dir)
+            # the connection is only used by this thread, but it may be
+            # closed by another one in close
+            connection = sqlite3.connect(
+                self.database_path, check_same_thread=False
+            )
+            # readers do not block the writers of other threads
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.create_function(
+                'papis_sort_number', 1, get_sort_number
+            )
+            self.local.connection = connection
+            with self.connections_lock:
+                self.connections.append(connection)
+        return connection
+
+    def close(self):
+        """Close the connections to the database file, they will be opened
+        again when they are needed.
+        """
+        with self.connections_lock:
+            connections, self.connections = self.connections, []
+            self.local = threading.local()
+        for connection in connections:
+            connection.close()
+
+    def clear(self):
+        self.close()
+        if os.path.exists(self.database_path):
+            self.logger.warning('Clearing the database')
+            os.remove(self.database_path)
+        # files of the write ahead log
+        for suffix in ['-wal', '-shm']:
+            if os.path.exists(self.database_path + suffix):
+                os.remove(self.database_path + suffix)
+
+    def match(self, document, query_string):
+        return papis.database.cache.match_document(document, query_string)
+
+    def add(self, document):
+        self.logger.debug("adding document")
+        connection = self.get_connection()
+        with connection:
+            self.add_document_with_connection(document, connection)
+
+    def update(self, document):
+        self.logger.debug("updating document")
+        columns = ['data'] + self.fields
+        values = self.get_row_values(document)
+        connection = self.get_connection()
+        with connection:
+            cursor = connection.execute(
+                'UPDATE documents SET {0} WHERE folder = ?'.format(
+                    ', '.join(
+                        '{0} = ?'.format(quote_identifier(c))
+                        for c in columns
+                    )
+                ),
+                values[1:] + [self.get_id_value(document)]
+            )
+        if cursor.rowcount == 0:
+            raise Exception(
+                'The document passed could not be found in the library'
+            )
+        self.count('bytes_written', len(values[1]))
+
+    def delete(self, document):
+        self.logger.debug("deleting document")
+        connection = self.get_connection()
+        with connection:
+            connection.execute(
+                'DELETE FROM documents WHERE folder = ?',
+                (self.get_id_value(document),)
+            )
+
+    def contains(self, document):
+        row = self.get_connection().execute(
+            'SELECT 1 FROM documents WHERE folder = ?',
+            (self.get_id_value(document),)
+        ).fetchone()
+        return row is not None
+
+    def query_dict(self, dictionary):
+        indexed = [k for k in dictionary if k in self.fields]
+        if not indexed:
+            return self.query(" ".join(
+                ["{}=\"{}\" ".format(key, val)
+                    for key, val in dictionary.items()]
+            ))
+        self.logger.debug('Querying indexed columns %s' % indexed)
+        documents = self.get_documents_from_sql(
+            'SELECT data FROM documents WHERE {0} ORDER BY id'.format(
+                ' AND '.join(
+                    '{0} = ? COLLATE NOCASE'.format(quote_identifier(k))
+                    for k in indexed
+                )
+            ),
+            [str(dictionary[k]) for k in indexed]
+        )
+        # keys that are not indexed are compared on the documents themselves
+        return [
+            d for d in documents
+            if all(
+                str(d[k]).lower() == str(v).lower()
+                for k, v in dictionary.items() if k not in indexed
+            )
+        ]
+
+    @papis.timing.span('filter')
+    def query(self, query_string, limit=None, sort=None):
+        return list(self.iter_query(query_string, limit=limit, sort=sort))
+
+    @papis.database.base.record_iter_query
+    def iter_query(self, query_string, limit=None, sort=None):
+        """The documents are read from the database as they are needed,
+        except when they are sorted by a key that is not indexed.
+        """
+        self.logger.debug('Query string %s' % query_string)
+        if query_string in ['', '*', self.get_all_query_string()]:
+            terms, residual, conditions = [], [], []
+        else:
+            terms, residual, conditions = self.translate_query(query_string)
+        order = self.get_order_by(sort, bool(terms))
+        # Sorting by keys that are not indexed is done by hand
+        sort_by_hand = order is None
+        where = [condition for condition, _ in conditions]
+        parameters = [parameter for _, parameter in conditions]
+        if terms:
+            sql = (
+                'SELECT d.data FROM documents_fts f '
+                'JOIN documents d ON d.id = f.rowid '
+            )
+            where.insert(0, 'documents_fts MATCH ?')
+            parameters.insert(0, ' AND '.join(terms))
+        else:
+            sql = 'SELECT d.data FROM documents d '
+        if where:
+            sql += 'WHERE {0} '.format(' AND '.join(where))
+        sql += 'ORDER BY {0}'.format(order or 'd.id')
+        if limit is not None and not residual and not sort_by_hand:
+            sql += ' LIMIT ?'
+            parameters.append(limit)
+        documents = self.iter_documents_from_sql(sql, parameters)
+        if residual:
+            self.logger.debug('Matching %s by hand' % residual)
+            documents = (
+                d for d in documents if self.match_parsed(d, residual)
+            )
+        if sort_by_hand:
+            return iter(papis.database.base.sort_documents(
+                documents, sort, limit=limit
+            ))
+        return itertools.islice(documents, limit)
+
+    def get_order_by(self, sort, ranked):
+        """Get the ``ORDER BY`` clause for a sort specification. The
+        documents without a value for the key come last.
+
+        :param sort: Sort specification (see
+            :meth:`papis.database.base.Database.query`)
+        :type  sort: str
+        :param ranked: Wether the full text search table is queried, so that
+            the results can be ranked.
+        :type  ranked: bool
+        :returns: Clause or ``None`` if the key is not indexed
+        :rtype:  str
+        """
+        if sort is None:
+            return 'd.id'
+        if sort == 'relevance':
+            return 'bm25(documents_fts)' if ranked else 'd.id'
+        key, reverse = papis.database.base.parse_sort(sort)
+        if key not in self.fields:
+            return None
+        # numbers are compared as numbers and always come before the rest,
+        # like in papis.database.base.sort_documents
+        return (
+            "d.{0} = '', "
+            "papis_sort_number(d.{0}) IS NULL, "
+            "papis_sort_number(d.{0}) {1}, "
+            "d.{0} COLLATE NOCASE {1}, d.id"
+        ).format(quote_identifier(key), 'DESC' if reverse else 'ASC')
+
+    def translate_query(self, query_string):
+        """Translate a query in the papis query language into a list of FTS5
+        terms. The parts of the query that can not be translated, either
+        because they refer to a key that is not indexed or because they
+        are not made of words, are returned separately.
+
+        :param query_string: Query string
+        :type  query_string: str
+        :returns: Tuple with the FTS5 terms, the untranslated groups
+            of the parsed query and the sql conditions for the ranges
+            (see :func:`get_range_conditions`)
+        :rtype:  tuple
+        """
+        terms = []
+        residual = []
+        conditions = []
+        for parsed in papis.docmatcher.parse_query(query_string):
+            value_range = papis.docmatcher.get_range(parsed)
+            if value_range is not None:
+                if value_range.key in self.fields:
+                    conditions += get_range_conditions(value_range)
+                # the conditions only narrow the documents down, the exact
+                # comparison is done by hand
+                residual.append(parsed)
+                continue
+            if len(parsed) == 3:
+                column = parsed[0]
+                if column not in self.fields:
+                    residual.append(parsed)
+                    continue
+            else:
+                column = None
+            group_terms = get_fts_terms(parsed[-1], column=column)
+            if not group_terms:
+                residual.append(parsed)
+                continue
+            terms += group_terms
+        return terms, residual, conditions
+
+    def match_parsed(self, document, parsed_search):
+        """Match a document against groups of an already parsed query.
+
+        :param document: Papis document
+        :type  document: papis.document.Document
+        :param parsed_search: Groups returned by
+            :func:`papis.docmatcher.parse_query`
+        :type  parsed_search: list
+        :returns: True if all the groups match
+        :rtype:  bool
+        """
+        for parsed in parsed_search:
+            value_range = papis.docmatcher.get_range(parsed)
+            if value_range is not None:
+                if not papis.docmatcher.match_range(document, value_range):
+                    return False
+                continue
+            if len(parsed) == 3:
+                sformat = papis.docmatcher.get_doc_format().replace(
+                    'DOC_KEY', parsed[0]
+                )
+            else:
+                sformat = None
+            if not papis.database.cache.match_document(
+                    document, parsed[-1], sformat):
+                return False
+        return True
+
+    def get_all_query_string(self):
+        return '.'
+
+    def get_all_documents(self):
+        return self.get_documents_from_sql(
+            'SELECT data FROM documents ORDER BY id'
+        )
+
+    def get_documents_from_sql(self, sql, parameters=()):
+        """Run a select statement whose first column is the pickled
+        document and return the documents.
+
+        :param sql: Sql statement
+        :type  sql: str
+        :param parameters: Parameters for the statement
+        :type  parameters: list
+        :returns: List of documents
+        :rtype:  list
+        """
+        return list(self.iter_documents_from_sql(sql, parameters))
+
+    def iter_documents_from_sql(self, sql, parameters=()):
+        """Same as :meth:`get_documents_from_sql` but the documents are
+        unpickled only as they are needed.
+        """
+        cursor = self.get_connection().execute(sql, parameters)
+        for row in cursor:
+            self.count('documents_loaded')
+            self.count('bytes_read', len(row[0]))
+            yield pickle.loads(row[0])
+
+    def get_id_value(self, document):
+        """Get the value that is stored in the unique key identifier
+        of the documents in the database. In the case of papis this is
+        just the path of the documents.
+
+        :param document: Papis document
+        :type  document: papis.document.Document
+        :returns: Path for the document
+        :rtype:  str
+        """
+        return document.get_main_folder()
+
+    def get_row_values(self, document):
+        """Get the values of the row of the ``documents`` table
+        for a document, i.e., the folder, the pickled document and the
+        values of the schema fields.
+
+        :param document: Papis document
+        :type  document: papis.document.Document
+        :returns: List of values
+        :rtype:  list
+        """
+        return [
+            self.get_id_value(document),
+            pickle.dumps(document)
+        ] + [str(document[f]) for f in self.fields]
+
+    def add_document_with_connection(self, document, connection):
+        """Helper function that adds the document to the ``documents`` table.
+        It DOES NOT commit the change, this has to be done separately.
+
+        :param document: Papis document
+        :type  document: papis.document.Document
+        :param connection: Connection to the database
+        :type  connection: sqlite3.Connection
+        """
+        columns = ['folder', 'data'] + self.fields
+        values = self.get_row_values(document)
+        connection.execute(
+            'INSERT INTO documents ({0}) VALUES ({1})'.format(
+                ', '.join(quote_identifier(c) for c in columns),
+                ', '.join('?' for c in columns)
+            ),
+            values
+        )
+        self.count('bytes_written', len(values[1]))
+
+    def index_exists(self):
+        """Check if the database file has been created with the current
+        schema fields.
+        """
+        connection = self.get_connection()
+        try:
+            row = connection.execute(
+                "SELECT value FROM meta WHERE key = 'fields'"
+            ).fetchone()
+        except sqlite3.OperationalError:
+            return False
+        return row is not None and row[0] == repr(self.fields)
+
+    def create_index(self):
+        """Create brand new tables, notice that if the tables already
+        exist they will be deleted.
+        """
+        self.logger.debug('Creating tables...')
+        columns = ', '.join(quote_identifier(f) for f in self.fields)
+        new_columns = ', '.join('new.' + quote_identifier(f)
+                                for f in self.fields)
+        old_columns = ', '.join('old.' + quote_identifier(f)
+                                for f in self.fields)
+        connection = self.get_connection()
+        with connection:
+            for table in ['documents_fts', 'documents', 'meta']:
+                connection.execute('DROP TABLE IF EXISTS ' + table)
+            connection.execute(
+                'CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT)'
+            )
+            connection.execute(
+                'CREATE TABLE documents ('
+                'id INTEGER PRIMARY KEY, '
+                'folder TEXT UNIQUE NOT NULL, '
+                'data BLOB NOT NULL{0})'.format(
+                    ''.join(', {0} TEXT'.format(quote_identifier(f))
+                            for f in self.fields)
+                )
+            )
+            for i, field in enumerate(self.fields):
+                connection.execute(
+                    'CREATE INDEX documents_field_{0} '
+                    'ON documents ({1} COLLATE NOCASE)'.format(
+                        i, quote_identifier(field)
+                    )
+                )
+            connection.execute(
+                'CREATE VIRTUAL TABLE documents_fts USING fts5('
+                "{0}, content='documents', content_rowid='id', "
+                "prefix='2 3')".format(columns)
+            )
+            # Keep the full text search table in sync with the documents
+            connection.execute(
+                'CREATE TRIGGER documents_ai AFTER INSERT ON documents BEGIN '
+                'INSERT INTO documents_fts (rowid, {0}) '
+                'VALUES (new.id, {1}); END'.format(columns, new_columns)
+            )
+            connection.execute(
+                'CREATE TRIGGER documents_ad AFTER DELETE ON documents BEGIN '
+                'INSERT INTO documents_fts (documents_fts, rowid, {0}) '
+                "VALUES ('delete', old.id, {1}); END".format(
+                    columns, old_columns
+                )
+            )
+            connection.execute(
+                'CREATE TRIGGER documents_au AFTER UPDATE ON documents BEGIN '
+                'INSERT INTO documents_fts (documents_fts, rowid, {0}) '
+                "VALUES ('delete', old.id, {1}); "
+                'INSERT INTO documents_fts (rowid, {0}) '
+                'VALUES (new.id, {2}); END'.format(
+                    columns, old_columns, new_columns
+                )
+            )
+            connection.execute(
+                "INSERT INTO meta (key, value) VALUES ('fields', ?)",
+                (repr(self.fields),)
+            )
+
+    def do_indexing(self):
+        """This function goes through all folders from the library
+        (that contain an `info.yaml` file) and adds the documents to the
+        database in a single transaction. This function is expensive and will
+        be called only if no database is present.
+        """
+        self.logger.info('Indexing library, this might take a while')
+        folders = sum([get_folders(d) for d in self.get_dirs()], [])
+        documents = folders_to_documents(folders)
+        connection = self.get_connection()
+        with connection:
+            for doc in documents:
+                self.add_document_with_connection(doc, connection)
+
+    @papis.timing.span('database')
+    def initialize(self):
+        """Function to be called everytime a database object is created.
+        It checks if the database exists with the current schema fields,
+        if not, it creates it and indexes the library.
+        """
+        if self.index_exists():
+            self.logger.debug('Initialized database found for library')
+            self.count('cache_hits')
+            return True
+        self.count('cache_misses')
+        with self.record_time('index_build'):
+            self.create_index()
+            self.do_indexing()
@@ -17,9 +17,9 @@ if the database is supposed to only contain the key fields
 ::
 
         {
-            "author": TEXT(stored=True),
-            "title": TEXT(stored=True),
-            "year": TEXT(stored=True),
+            "author": TEXT(stored=True, sortable=True),
+            "title": TEXT(stored=True, sortable=True),
+            "year": NUMERIC(stored=True, sortable=True),
             "tags": TEXT(stored=True),
         }
 
@@ -30,6 +30,15 @@ After this Schema is created, the folders of the library are recursed over
 and the documents are added to the database where only these
 properties are stored. This means, if ``publisher`` is not in the above list,
 you will not be able to parse the publisher through a search.
+The ``sortable`` fields can be used by whoosh to sort the results
+efficiently, e.g., with ``papis list --sort year``.
+
+``NUMERIC`` and ``DATETIME`` fields are indexed as numbers and dates, so that
+ranges can be searched efficiently, e.g., ``year:>=2015`` or
+``year:[2010 TO 2015]``. Dates are read in the formats given by
+:func:`get_datetime`. The values that are not numbers or dates, e.g.,
+``year: in press``, are indexed in a ``TEXT`` field next to them, see
+:func:`get_text_fallbacks`, so that ``year:press`` still finds them.
 
 .. note::
 
@@ -41,6 +50,7 @@ you will not be able to parse the publisher through a search.
 """
 import os
 import logging
+import datetime
 
 import whoosh
 import whoosh.index
@@ -50,9 +60,113 @@ import papis.config
 import papis.document
 import papis.database.base
 import papis.database.cache
+import papis.timing
 from papis.utils import get_cache_home, get_folders, folders_to_documents
 
 
+def get_datetime(value):
+    """Read a date as written in papis documents, e.g., in the
+    ``time-added`` key.
+
+    :param value: Date
+    :type  value: str
+    :returns: The date or ``None`` if it is not a date
+    :rtype:  datetime.datetime
+
+    >>> get_datetime('2019-05-21-12:30:00')
+    datetime.datetime(2019, 5, 21, 12, 30)
+    >>> get_datetime('2019-05')
+    datetime.datetime(2019, 5, 1, 0, 0)
+    >>> get_datetime('yesterday') is None
+    True
+    """
+    for date_format in ['%Y-%m-%d-%H:%M:%S', '%Y-%m-%d %H:%M:%S',
+                        '%Y-%m-%d', '%Y-%m', '%Y']:
+        try:
+            return datetime.datetime.strptime(str(value), date_format)
+        except ValueError:
+            pass
+    return None
+
+
+def get_text_fallbacks(schema_fields):
+    """Get the ``TEXT`` fields where the values of the ``NUMERIC`` and
+    ``DATETIME`` fields that are not numbers or dates are indexed.
+
+    :param schema_fields: Dictionary containing the defining fields of the
+        database Schema
+    :type  schema_fields: dict
+    :returns: Names of the fallback fields by the names of the fields
+    :rtype:  dict
+
+    >>> from whoosh.fields import TEXT, NUMERIC
+    >>> get_text_fallbacks({'year': NUMERIC(), 'title': TEXT()})
+    {'year': 'year_text_'}
+    """
+    from whoosh.fields import NUMERIC, DATETIME
+    return {
+        key: '{0}_text_'.format(key)
+        for key, field in schema_fields.items()
+        if isinstance(field, (NUMERIC, DATETIME))
+    }
+
+
+class TextFallbackPlugin(whoosh.qparser.Plugin):
+    """Searches the terms that a ``NUMERIC`` or ``DATETIME`` field can not
+    parse, e.g., ``year:2019a``, in its fallback ``TEXT`` field.
+    """
+
+    def __init__(self, fallbacks):
+        self.fallbacks = fallbacks
+
+    def filters(self, parser):
+        # after the fieldnames are set (100) but before multifield (110)
+        return [(self.do_fallbacks, 105)]
+
+    def do_fallbacks(self, parser, group):
+        from whoosh.qparser import syntax, QueryParserError
+        for node in group:
+            if isinstance(node, syntax.GroupNode):
+                self.do_fallbacks(parser, node)
+            elif isinstance(node, syntax.TextNode) and \
+                    node.fieldname in self.fallbacks:
+                field = parser.schema[node.fieldname]
+                try:
+                    error = getattr(
+                        field.parse_query(node.fieldname, node.text),
+                        'error', None)
+                except QueryParserError as e:
+                    error = e
+                if error is not None:
+                    node.set_fieldname(
+                        self.fallbacks[node.fieldname], override=True)
+        return group
+
+
+def get_schema_signature(schema):
+    """Get what describes the fields of a schema, to know if an index was
+    built with the fields of the configuration, e.g., whoosh does not
+    compare sortable fields.
+
+    :param schema: Whoosh schema
+    :type  schema: whoosh.fields.Schema
+    :returns: Names and kinds of the fields
+    :rtype:  list
+
+    >>> from whoosh.fields import Schema, TEXT, NUMERIC
+    >>> text = get_schema_signature(Schema(year=TEXT(stored=True)))
+    >>> text == get_schema_signature(Schema(year=NUMERIC(stored=True)))
+    False
+    """
+    return sorted(
+        (
+            name, type(field).__name__, bool(field.stored),
+            field.column_type is not None
+        )
+        for name, field in schema.items()
+    )
+
+
 class Database(papis.database.base.Database):
 
     def __init__(self, library=None):
@@ -84,10 +198,12 @@ class Database(papis.database.base.Database):
         pass
 
     def add(self, document):
-        schema_keys = self.get_schema_init_fields().keys()
+        # the values are converted for the fields of the index, which
+        # might have been built with another configuration
+        schema_fields = dict(self.get_schema().items())
         self.logger.debug("adding document")
         writer = self.get_writer()
-        self.add_document_with_writer(document, writer, schema_keys)
+        self.add_document_with_writer(document, writer, schema_fields)
         self.logger.debug("commiting document..")
         writer.commit()
 
@@ -107,30 +223,87 @@ class Database(papis.database.base.Database):
         self.logger.debug("commiting deletion..")
         writer.commit()
 
+    def contains(self, document):
+        with self.get_index().searcher() as searcher:
+            return searcher.document_number(
+                **{self.get_id_key(): self.get_id_value(document)}
+            ) is not None
+
     def query_dict(self, dictionary):
         query_string = " AND ".join(
             ["{}:\"{}\" ".format(key, val) for key, val in dictionary.items()]
         )
         return self.query(query_string)
 
-    def query(self, query_string):
+    @papis.timing.span('filter')
+    @papis.database.base.record_query
+    def query(self, query_string, limit=None, sort=None):
+        """Whoosh ranks the results by relevance unless they are sorted by
+        a key. If a ``limit`` is given only the ``limit`` best documents
+        are returned.
+
+        Sorting is done by whoosh if the key is a sortable field of the
+        schema, otherwise all matching documents are retrieved and sorted
+        with :func:`papis.database.base.sort_documents`.
+        """
         self.logger.debug('Query string %s' % query_string)
         index = self.get_index()
+        schema = self.get_schema()
         qp = whoosh.qparser.MultifieldParser(
             ['title', 'author', 'tags'],
-            schema=self.get_schema()
+            schema=schema
         )
         qp.add_plugin(whoosh.qparser.FuzzyTermPlugin())
+        qp.add_plugin(whoosh.qparser.GtLtPlugin())
+        qp.add_plugin(
+            TextFallbackPlugin(get_text_fallbacks(dict(schema.items()))))
         query = qp.parse(query_string)
+        search_kwargs = dict(limit=limit)
+        if sort is not None and sort != 'relevance':
+            key, reverse = papis.database.base.parse_sort(sort)
+            if key in schema and schema[key].column_type is not None:
+                search_kwargs.update(
+                    sortedby=self.get_sort_facet(key, reverse)
+                )
+            else:
+                search_kwargs.update(limit=None)
         with index.searcher() as searcher:
-            results = searcher.search(query, limit=None)
+            results = searcher.search(query, **search_kwargs)
             self.logger.debug(results)
             documents = [
                 papis.document.from_folder(r.get(self.get_id_key()))
                 for r in results
             ]
+        self.count('documents_loaded', len(documents))
+        if sort is not None and sort != 'relevance' and \
+                'sortedby' not in search_kwargs:
+            documents = papis.database.base.sort_documents(
+                documents, sort, limit=limit
+            )
         return documents
 
+    def get_sort_facet(self, key, reverse=False):
+        """Get a whoosh facet to sort by a sortable field, such that the
+        documents without a value for the field come last, as for the other
+        backends. Whoosh alone would put them first in some cases, e.g.,
+        for ``NUMERIC`` fields sorted in descending order.
+
+        :param key: Sortable field
+        :type  key: str
+        :param reverse: Descending order
+        :type  reverse: bool
+        :returns: Facet to be passed to the searcher as ``sortedby``
+        :rtype:  whoosh.sorting.MultiFacet
+        """
+        import whoosh.query
+        import whoosh.sorting
+        return whoosh.sorting.MultiFacet([
+            whoosh.sorting.QueryFacet(
+                {0: whoosh.query.Every(key)}, other=1
+            ),
+            whoosh.sorting.FieldFacet(key, reverse=reverse)
+        ])
+
     def get_all_query_string(self):
         return '*'
 
@@ -172,29 +345,41 @@ class Database(papis.database.base.Database):
         """
         return whoosh.index.exists_in(self.index_dir)
 
-    def add_document_with_writer(self, document, writer, schema_keys):
+    def add_document_with_writer(self, document, writer, schema_fields):
         """Helper function that takes a writer and a dictionary
-        containing the keys of the schema and adds the document to the writer.
-        Notice that this function does only two things, creating a suitable
-        dictionary to be added to the database and adding it to the writer.
-        It DOES NOT commit the change to the writer, this has to be done
-        separately.
+        containing the fields of the schema and adds the document to the
+        writer. Notice that this function does only two things, creating a
+        suitable dictionary to be added to the database and adding it to the
+        writer. It DOES NOT commit the change to the writer, this has to be
+        done separately.
 
         :param document: Papis document
         :type  document: papis.document.Document
         :param writer: Whoosh writer
         :type  writer: whoosh.writer
-        :param schema_keys: Dictionary containing the defining keys of the
+        :param schema_fields: Dictionary containing the defining fields of the
             database Schema
-        :type  schema_keys: dict
+        :type  schema_fields: dict
         """
+        from whoosh.fields import NUMERIC, DATETIME
+        fallbacks = get_text_fallbacks(schema_fields)
         doc_d = dict()
-        doc_d.update(
-            {
-                k: str(document[k]) or ''
-                for k in schema_keys
-            }
-        )
+        for key, field in schema_fields.items():
+            if key in fallbacks.values():
+                continue
+            text = str(document[key]) or ''
+            value = text
+            if isinstance(field, DATETIME):
+                value = get_datetime(text)
+            elif isinstance(field, NUMERIC):
+                try:
+                    value = field.numtype(float(text))
+                except ValueError:
+                    value = None
+            if value is not None:
+                doc_d[key] = value
+            elif text and fallbacks.get(key) in schema_fields:
+                doc_d[fallbacks[key]] = text
         doc_d[self.get_id_key()] = self.get_id_value(document)
         writer.add_document(**doc_d)
 
@@ -208,22 +393,30 @@ class Database(papis.database.base.Database):
         self.logger.debug('Indexing the library, this might take a while...')
         folders = sum([get_folders(d) for d in self.get_dirs()], [])
         documents = folders_to_documents(folders)
-        schema_keys = self.get_schema_init_fields().keys()
         writer = self.get_writer()
+        schema_fields = dict(writer.schema.items())
         for doc in documents:
-            self.add_document_with_writer(doc, writer, schema_keys)
+            self.add_document_with_writer(doc, writer, schema_fields)
         writer.commit()
 
+    @papis.timing.span('database')
     def initialize(self):
         """Function to be called everytime a database object is created.
         It checks if an index exists, if not, it creates one and
         indexes the library.
         """
         if self.index_exists():
-            self.logger.debug('Initialized index found for library')
-            return True
-        self.create_index()
-        self.do_indexing()
+            if get_schema_signature(self.get_schema()) == \
+                    get_schema_signature(self.create_schema()):
+                self.logger.debug('Initialized index found for library')
+                self.count('cache_hits')
+                return True
+            self.logger.warning(
+                'The schema of the index has changed, indexing again')
+        self.count('cache_misses')
+        with self.record_time('index_build'):
+            self.create_index()
+            self.do_indexing()
 
     def get_index(self):
         """Gets the index for the current library
@@ -265,7 +458,10 @@ class Database(papis.database.base.Database):
         """Returns the arguments to be passed to the whoosh schema
         object instantiation found in the method `get_schema`.
         """
-        from whoosh.fields import TEXT, ID, KEYWORD, STORED
+        # the field types are used by the prototype, which is evaluated
+        from whoosh.fields import (  # noqa: F401
+            TEXT, ID, KEYWORD, STORED, NUMERIC, DATETIME
+        )
         # This part is non-negotiable
         fields = {self.get_id_key(): ID(stored=True, unique=True)}
         user_prototype = eval(
@@ -275,5 +471,7 @@ class Database(papis.database.base.Database):
         fields_list = papis.config.getlist('whoosh-schema-fields')
         for field in fields_list:
             fields.update({field: TEXT(stored=True)})
+        for field in get_text_fallbacks(fields).values():
+            fields.setdefault(field, TEXT(stored=True))
         # self.logger.debug('Schema prototype: {}'.format(fields))
         return fields
@@ -1,7 +1,40 @@
+import re
+import collections
 import papis.config
 import logging
 
 
+#: A range query on a key, the bounds are comparable values
+#: as given by :func:`papis.database.base.get_sort_value`, or
+#: ``None`` if the range is open on that side.
+Range = collections.namedtuple(
+    'Range',
+    ['key', 'lower', 'upper', 'lower_inclusive', 'upper_inclusive']
+)
+
+
+def get_doc_format():
+    """Get the format of a key of the documents in the queries, e.g.,
+    ``{doc[DOC_KEY]}``, where ``DOC_KEY`` is replaced by the key. It is read
+    from the configuration every time, since it can change, e.g., between
+    the commands answered by ``papis serve``.
+
+    :returns: Format
+    :rtype:  str
+
+    >>> get_doc_format()
+    '{doc[DOC_KEY]}'
+    """
+    if papis.config.get('format-jinja2-enable'):
+        return (
+            '{{' +
+            papis.config.get('format-doc-name') +
+            '["DOC_KEY"]' +
+            '}}'
+        )
+    return '{' + papis.config.get('format-doc-name') + '[DOC_KEY]}'
+
+
 class DocMatcher(object):
     """This class implements the mini query language for papis.
     All its methods are static, it could be also implemented as a separate
@@ -19,15 +52,7 @@ class DocMatcher(object):
     """
     search = ""
     parsed_search = None
-    if papis.config.get('format-jinja2-enable'):
-        doc_format = (
-            '{{' +
-            papis.config.get('format-doc-name') +
-            '["DOC_KEY"]' +
-            '}}'
-        )
-    else:
-        doc_format = '{' + papis.config.get('format-doc-name') + '[DOC_KEY]}'
+    doc_format = get_doc_format()
     logger = logging.getLogger('DocMatcher')
     matcher = None
 
@@ -56,10 +81,23 @@ class DocMatcher(object):
         ([(['title', '=', 'ein'], {})], {})
         >>> DocMatcher.return_if_match(doc) is not None
         True
+        >>> doc['year'] = 1905
+        >>> _ = DocMatcher.parse('year >= 1900')
+        >>> DocMatcher.return_if_match(doc) is not None
+        True
+        >>> _ = DocMatcher.parse('year = 1800..1900')
+        >>> DocMatcher.return_if_match(doc) is not None
+        False
 
         """
         match = None
         for parsed in cls.parsed_search:
+            value_range = get_range(parsed)
+            if value_range is not None:
+                match = doc if match_range(doc, value_range) else None
+                if not match:
+                    break
+                continue
             if len(parsed) == 1:
                 search = parsed[0]
                 sformat = None
@@ -110,14 +148,24 @@ class DocMatcher(object):
         [['hello world whatever ='], ['tags', '=', 'hello ====']]
         >>> print(DocMatcher.parse('hello'))
         [['hello']]
+        >>> print(DocMatcher.parse('year >= 2015 year<2019'))
+        [['year', '>=', '2015'], ['year', '<', '2019']]
         """
         if search is None:
             search = cls.search
+        cls.doc_format = get_doc_format()
         cls.parsed_search = parse_query(search)
         return cls.parsed_search
 
 
 def parse_query(query_string):
+    """Parse a query, see :class:`DocMatcher`. The range operators, e.g.
+    ``year > 2015``, are only accepted if :func:`is_range_query` says so,
+    otherwise the words around them are searched as text.
+
+    >>> [list(g) for g in parse_query('einstein > bohr year>2015')]
+    [['einstein'], ['bohr'], ['year', '>', '2015']]
+    """
     import pyparsing
     logger = logging.getLogger('query_parser')
     logger.debug('Parsing search')
@@ -130,19 +178,158 @@ def parse_query(query_string):
         quoteChar="'", escChar='\\', escQuote='\\'
     ) ^ papis_key
 
-    equal = (
-        pyparsing.ZeroOrMore(" ") +
-        pyparsing.Literal('=') +
-        pyparsing.ZeroOrMore(" ")
-    )
+    def operator(operators):
+        return (
+            pyparsing.ZeroOrMore(" ") +
+            pyparsing.oneOf(operators) +
+            pyparsing.ZeroOrMore(" ")
+        )
+
+    range_query = (
+        papis_key + operator(RANGE_OPERATORS) + papis_value
+    ).addCondition(lambda tokens: is_range_query(*tokens))
 
     papis_query = pyparsing.ZeroOrMore(
+        pyparsing.Group(range_query) |
         pyparsing.Group(
             pyparsing.ZeroOrMore(
-                papis_key + equal
+                papis_key + operator(['='])
             ) + papis_value
-        )
+        ) |
+        # e.g. the > of 'einstein > bohr'
+        pyparsing.Suppress(operator(RANGE_OPERATORS))
     )
     parsed = papis_query.parseString(query_string)
     logger.debug('Parsed query = %s' % parsed)
     return parsed
+
+
+#: Operators that compare the values of a key, besides the usual ``=``.
+RANGE_OPERATORS = ['>=', '<=', '>', '<']
+
+#: Keys whose values are compared with the range operators even if
+#: they are not numbers or dates, e.g. ``year > unknown``.
+RANGE_KEYS = [
+    'year', 'month', 'day', 'date', 'volume', 'number', 'issue', 'pages',
+    'time-added'
+]
+
+
+def is_range_query(key, operator, value):
+    """Check if a key, a range operator and a value are meant as a range
+    query, i.e., if the value is a number or a date like ``2019-05-21``,
+    or the key is one of :data:`RANGE_KEYS`. Otherwise they are most
+    likely text, e.g. ``einstein > bohr``.
+
+    >>> is_range_query('year', '>', 'unknown')
+    True
+    >>> is_range_query('einstein', '>', 'bohr')
+    False
+    >>> is_range_query('citations', '>=', '10')
+    True
+    """
+    return key in RANGE_KEYS or is_comparable_value(value)
+
+
+def is_comparable_value(value):
+    """Check if a value of a range is a number or a date, so that regular
+    expressions and text are not mistaken for ranges.
+
+    >>> is_comparable_value('2019-05'), is_comparable_value('ein')
+    (True, False)
+    """
+    return re.match(r'^\d[\d:.-]*$', value) is not None
+
+
+def get_range(parsed):
+    """Get the range that a group of a parsed query refers to.
+    A group is a range if it uses one of the comparison operators, e.g.,
+    ``year >= 2015`` or ``year < 2000``, or if it is of the form
+    ``year = 2010..2015`` (both ends included). In the latter case one of the
+    ends can be missing, e.g., ``year = 2010..`` and they have to be numbers
+    or dates like ``2019-05-21``, so that regular expressions are not
+    mistaken for ranges.
+
+    :param parsed: A group of the result of :func:`parse_query`
+    :type  parsed: list
+    :returns: The range or ``None`` if the group is not a range
+    :rtype:  Range
+
+    >>> get_range(['year', '>=', '2015'])
+    Range(key='year', lower=(0, 2015.0), upper=None, lower_inclusive=True, \
+upper_inclusive=False)
+    >>> get_range(['year', '=', '2010..2015'])
+    Range(key='year', lower=(0, 2010.0), upper=(0, 2015.0), \
+lower_inclusive=True, upper_inclusive=True)
+    >>> get_range(['time-added', '=', '..2019-05']).upper
+    (1, '2019-05')
+    >>> get_range(['title', '=', 'a..b']) is None
+    True
+    >>> get_range(['einstein']) is None
+    True
+    """
+    import papis.database.base
+    if len(parsed) != 3:
+        return None
+    key, operator, value = parsed[0], parsed[1], parsed[2]
+    typed = papis.database.base.get_sort_value
+    if operator == '>':
+        return Range(key, typed(value), None, False, False)
+    elif operator == '>=':
+        return Range(key, typed(value), None, True, False)
+    elif operator == '<':
+        return Range(key, None, typed(value), False, False)
+    elif operator == '<=':
+        return Range(key, None, typed(value), False, True)
+    m = re.match(r'^(.*)\.\.(.*)$', value)
+    if m is None or not (m.group(1) or m.group(2)):
+        return None
+    ends = [end for end in m.groups() if end]
+    if not all(is_comparable_value(end) for end in ends):
+        return None
+    return Range(
+        key,
+        typed(m.group(1)) if m.group(1) else None,
+        typed(m.group(2)) if m.group(2) else None,
+        True, True
+    )
+
+
+def match_range(document, value_range):
+    """Check if the value of a document lies within a range. Numbers are
+    only compared with numbers, and everything else as strings, so that
+    dates in the format ``2019-05-21`` are compared correctly.
+
+    :param document: Papis document
+    :type  document: papis.document.Document
+    :param value_range: Range returned by :func:`get_range`
+    :type  value_range: Range
+    :returns: True if the value is inside the range
+    :rtype:  bool
+
+    >>> import papis.document
+    >>> doc = papis.document.from_data(dict(year='2012'))
+    >>> match_range(doc, get_range(['year', '=', '2010..2015']))
+    True
+    >>> match_range(doc, get_range(['year', '>', '2012']))
+    False
+    >>> match_range(doc, get_range(['year', '>', 'unknown']))
+    False
+    """
+    import papis.database.base
+    value = document[value_range.key]
+    if value in ['', None]:
+        return False
+    value = papis.database.base.get_sort_value(value)
+    lower, upper = value_range.lower, value_range.upper
+    if lower is not None:
+        if value[0] != lower[0] or value < lower:
+            return False
+        if value == lower and not value_range.lower_inclusive:
+            return False
+    if upper is not None:
+        if value[0] != upper[0] or value > upper:
+            return False
+        if value == upper and not value_range.upper_inclusive:
+            return False
+    return True
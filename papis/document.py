@@ -1,7 +1,6 @@
 import os
 import papis.utils
 import papis.config
-import papis.bibtex
 import logging
 import re
 import shutil
@@ -41,6 +40,7 @@ def to_bibtex(document):
     :rtype:  str
 
     """
+    import papis.bibtex
     logger = logging.getLogger("document:bibtex")
     bibtexString = ""
     bibtexType = ""
@@ -1,9 +1,7 @@
-from stevedore import extension
 import papis.config
+import papis.timing
 import logging
 import tempfile
-import papis.bibtex
-import papis.config
 
 logger = logging.getLogger("downloader")
 
@@ -23,6 +21,7 @@ def _create_downloader_mgr():
     if downloader_mgr is not None:
         return
 
+    from stevedore import extension
     downloader_mgr = extension.ExtensionManager(
         namespace='papis.downloader',
         invoke_on_load=False,
@@ -94,7 +93,9 @@ def get_downloader_by_name(name):
     return downloader_mgr[name].plugin
 
 
+@papis.timing.span('download')
 def get_info_from_url(url, data_format="bibtex", expected_doc_format=None):
+    import papis.bibtex
 
     result = {
         "data": dict(),
@@ -1,7 +1,7 @@
+import itertools
 import logging
 import papis.config
-from papis.tui.app import Picker
-from stevedore import extension
+import papis.timing
 
 logger = logging.getLogger("pick")
 
@@ -12,36 +12,96 @@ def stevedore_error_handler(manager, entrypoint, exception):
     logger.error(exception)
 
 
+pickers_mgr = None
+
+
+def _create_pickers_mgr():
+    global pickers_mgr
+
+    if pickers_mgr is not None:
+        return
+
+    from stevedore import extension
+    pickers_mgr = extension.ExtensionManager(
+        namespace='papis.picker',
+        invoke_on_load=False,
+        verify_requirements=True,
+        propagate_map_exceptions=True,
+        on_load_failure_callback=stevedore_error_handler
+    )
+
+
 def available_pickers():
+    _create_pickers_mgr()
     return pickers_mgr.entry_points_names()
 
 
+def _chain(first, others):
+    # like itertools.chain, but closing the iterator ``others``, e.g. to
+    # stop a query of the database when the picker is done
+    try:
+        for option in first:
+            yield option
+        yield from others
+    finally:
+        if hasattr(others, 'close'):
+            others.close()
+
+
+def peek(options):
+    """Check if there are options without consuming them.
+
+    :param options: List or any other iterable of options
+    :returns: Whether there are options, and the options, which are still
+        closed as ``options`` when they are an iterator
+    :rtype:  tuple
+
+    >>> empty, options = peek(iter([]))
+    >>> empty
+    False
+    >>> found, options = peek(iter(['a', 'b']))
+    >>> found, list(options)
+    (True, ['a', 'b'])
+    """
+    if isinstance(options, list):
+        return len(options) > 0, options
+    others = iter(options)
+    first = list(itertools.islice(others, 1))
+    return len(first) > 0, _chain(first, others)
+
+
 def papis_pick(
         options, default_index=0,
         header_filter=lambda x: x, match_filter=lambda x: x
         ):
-    if len(options) == 0:
+    if isinstance(options, list):
+        first = options[:2]
+    else:
+        # look at the first options without consuming the others
+        others = iter(options)
+        first = list(itertools.islice(others, 2))
+        options = _chain(first, others)
+    if len(first) == 0:
         return ""
-    if len(options) == 1:
-        return options[0]
+    if len(first) == 1:
+        return first[0]
 
+    from papis.tui.app import Picker
     picker = Picker(
         options,
         default_index,
         header_filter,
         match_filter
     )
-    picker.run()
-    return picker.options_list.get_selection()
+    try:
+        picker.run()
+        return picker.options_list.get_selection()
+    finally:
+        picker.close()
 
 
-pickers_mgr = extension.ExtensionManager(
-    namespace='papis.picker',
-    invoke_on_load=False,
-    verify_requirements=True,
-    propagate_map_exceptions=True,
-    on_load_failure_callback=stevedore_error_handler
-)
+# the options are streamed into the picker, see :class:`papis.tui.app.Picker`
+papis_pick.accepts_iterators = True
 
 
 def pick(
@@ -51,8 +111,12 @@ def pick(
         match_filter=lambda x: x
         ):
     """Construct and start a :class:`Picker <Picker>`.
+
+    The options can be any iterable, they are only turned into a list
+    for the pickers without an ``accepts_iterators`` attribute.
     """
     name = papis.config.get("picktool")
+    _create_pickers_mgr()
     try:
         picker = pickers_mgr[name].plugin
     except KeyError:
@@ -60,9 +124,12 @@ def pick(
         logger.error(
             "Registered pickers are: {0}".format(available_pickers()))
     else:
-        return picker(
-            options,
-            default_index=default_index,
-            header_filter=header_filter,
-            match_filter=match_filter
-        )
+        if not getattr(picker, 'accepts_iterators', False):
+            options = list(options)
+        with papis.timing.span('picker'):
+            return picker(
+                options,
+                default_index=default_index,
+                header_filter=header_filter,
+                match_filter=match_filter
+            )
@@ -0,0 +1,174 @@
+"""Lightweight timing of the phases of papis, e.g., loading the database,
+filtering the documents or running the picker.
+
+The phases are marked in the code with :func:`span`, either as a context
+manager or as a decorator,
+
+.. code:: python
+
+    import papis.timing
+
+    with papis.timing.span('crawl'):
+        folders = get_folders(directory)
+
+    @papis.timing.span('export')
+    def export(documents):
+        ...
+
+Spans opened inside of other spans are nested in the report, and spans
+with the same name under the same parent are added up. Nothing is recorded
+unless timing is enabled with :func:`enable`, which the ``--timings`` flag
+of ``papis`` does, so the spans cost close to nothing otherwise. Spans
+opened in other threads, e.g., the background searches of the picker,
+are reported at the top level.
+"""
+import contextlib
+import threading
+import time
+
+_enabled = False
+_lock = threading.Lock()
+_local = threading.local()
+
+
+class Node(object):
+    """Times of a phase and of the phases nested in it."""
+
+    def __init__(self, name):
+        self.name = name
+        self.calls = 0
+        self.total = 0.0
+        self.children = dict()
+
+    def child(self, name):
+        node = self.children.get(name)
+        if node is None:
+            node = self.children[name] = Node(name)
+        return node
+
+
+_root = Node('total')
+
+
+class span(contextlib.ContextDecorator):
+    """Time a phase of papis, see the module documentation.
+
+    :param name: Name of the phase
+    :type  name: str
+
+    >>> enable()
+    >>> with span('load'):
+    ...     with span('parse'):
+    ...         pass
+    >>> [(n.name, n.calls) for n in walk()]
+    [('load', 1), ('parse', 1)]
+    >>> disable()
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.node = None
+
+    def _recreate_cm(self):
+        # every call of a decorated function needs its own span
+        return span(self.name)
+
+    def __enter__(self):
+        if not _enabled:
+            return self
+        stack = _get_stack()
+        with _lock:
+            self.node = (stack[-1] if stack else _root).child(self.name)
+        stack.append(self.node)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        if self.node is None:
+            return False
+        elapsed = time.perf_counter() - self.start
+        _get_stack().pop()
+        with _lock:
+            self.node.calls += 1
+            self.node.total += elapsed
+        self.node = None
+        return False
+
+
+def _get_stack():
+    stack = getattr(_local, 'stack', None)
+    if stack is None:
+        stack = _local.stack = []
+    return stack
+
+
+def enable():
+    """Start recording the spans, the previous records are cleared."""
+    global _enabled, _root
+    with _lock:
+        _root = Node('total')
+        _root.start = time.perf_counter()
+        _enabled = True
+
+
+def disable():
+    """Stop recording the spans."""
+    global _enabled
+    with _lock:
+        if _enabled:
+            _root.total = time.perf_counter() - _root.start
+            _root.calls = 1
+        _enabled = False
+
+
+def is_enabled():
+    """Whether the spans are being recorded."""
+    return _enabled
+
+
+def walk(node=None):
+    """Iterate over the recorded phases in depth first order.
+
+    :param node: Phase to start with, by default all the phases
+    :type  node: Node
+    :returns: Iterator over :class:`Node`
+    """
+    node = node or _root
+    for child in node.children.values():
+        yield child
+        for grandchild in walk(child):
+            yield grandchild
+
+
+def format_report():
+    """Format the recorded phases as a table, the nested phases are indented
+    under the phase that contains them.
+
+    :returns: Report
+    :rtype:  str
+
+    >>> enable()
+    >>> with span('filter'):
+    ...     pass
+    >>> disable()
+    >>> print(format_report())  # doctest: +ELLIPSIS
+    phase                         calls     total ms  percent
+    filter                            1 ...
+    total                             1 ...
+    """
+    total = _root.total or 1e-9
+    lines = ['{0:<28} {1:>6} {2:>12} {3:>8}'.format(
+        'phase', 'calls', 'total ms', 'percent')]
+
+    def add(node, depth):
+        lines.append('{0:<28} {1:>6} {2:>12.1f} {3:>7.1f}%'.format(
+            '  ' * depth + node.name, node.calls,
+            1000 * node.total, 100 * node.total / total))
+        for child in node.children.values():
+            add(child, depth + 1)
+
+    for node in _root.children.values():
+        add(node, 0)
+    lines.append('{0:<28} {1:>6} {2:>12.1f} {3:>7.1f}%'.format(
+        'total', 1, 1000 * _root.total, 100.0))
+    return '\n'.join(lines)
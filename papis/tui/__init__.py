@@ -25,4 +25,5 @@ def get_default_settings():
         'go_bottom_key': 'end',
 
         "editmode": "emacs",
+        "match_mode": "regex",
     })
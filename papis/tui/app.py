@@ -12,18 +12,26 @@ from prompt_toolkit.layout.controls import (
     BufferControl,
 )
 from prompt_toolkit.layout.layout import Layout
+from concurrent.futures import ThreadPoolExecutor
 import papis.config as config
 import papis.document
+import papis.timing
+import collections
 import logging
+import operator
 
 from .widgets.command_line_prompt import Command
 from .widgets import (
     InfoWindow, CommandLinePrompt, HelpWindow, OptionsList,
     MessageToolbar
 )
+from .widgets.list import STREAM_FIRST_BATCH, prepare_pool
 
 logger = logging.getLogger('pick')
 
+#: Number of previews of the info window that are kept in memory.
+PREVIEW_CACHE_SIZE = 100
+
 _keys_info = None
 
 
@@ -172,6 +180,42 @@ def create_keybindings(app):
     return kb
 
 
+def get_preview(option, width, height):
+    """Get the text of an option for the info window, like
+    :func:`papis.document.dump` but only the lines that fit
+    in ``width`` columns and ``height`` rows, so that huge fields
+    are not formatted and lexed in full.
+
+    :param option: Option, a document or any other object
+    :param width: Number of columns
+    :type  width: int
+    :param height: Number of rows
+    :type  height: int
+    :returns: Text
+    :rtype:  str
+
+    >>> doc = papis.document.from_data(
+    ...     {'title': 'Hello World', 'abstract': 'a\\nb\\nc'})
+    >>> get_preview(doc, 13, 3)
+    'title:   Hell\\nabstract:   a\\nb\\n'
+    >>> get_preview('a\\nb', 80, 20)
+    'a\\nb\\n'
+    """
+    if hasattr(option, 'keys'):
+        texts = (
+            str(key) + ':   ' + str(option[key]) for key in option.keys()
+        )
+    else:
+        texts = [str(option)]
+    lines = []
+    for text in texts:
+        for line in text.split('\n'):
+            lines.append(line[:width] + '\n')
+            if len(lines) == height:
+                return ''.join(lines)
+    return ''.join(lines)
+
+
 def get_commands(app):
 
     kb = KeyBindings()
@@ -207,6 +251,7 @@ def get_commands(app):
         from papis.commands.edit import run
         doc = cmd.app.get_selection()
         run(doc)
+        cmd.app.clear_preview(cmd.app.options_list.current_index)
         cmd.app.renderer.clear()
 
     @kb.add(
@@ -258,7 +303,8 @@ def get_commands(app):
 class Picker(Application):
     """The :class:`Picker <Picker>` object
 
-    :param options: a list of options to choose from
+    :param options: a list or any other iterable of options to choose from,
+        options that are not in a list are added while the picker runs
     :param default_index: (optional) set this if the default
         selected option is not the first one
     """
@@ -272,6 +318,14 @@ class Picker(Application):
             ):
 
         self.info_window = InfoWindow()
+        # Previews of the options for the info window, they are made
+        # in a thread and kept by option index and size of the window
+        self.previews = collections.OrderedDict()
+        self.preview_executor = ThreadPoolExecutor(max_workers=1)
+        self.preview_key = None
+        self.preview_results = None
+        # the previews made before the last clear_preview are dropped
+        self.preview_generation = 0
         self.help_window = HelpWindow()
         self.message_toolbar = MessageToolbar(style="class:message_toolbar")
         self.error_toolbar = MessageToolbar(style="class:error_toolbar")
@@ -280,14 +334,36 @@ class Picker(Application):
             'status_line_format', section="tui"
         )
 
+        # before the threads of the picker start, see prepare_pool
+        if isinstance(options, list):
+            prepare_pool(len(options))
+        else:
+            # e.g. the documents of a query, whose number is not known
+            prepare_pool(operator.length_hint(options) or None)
+
+        # Long lists are streamed into the list once the application is
+        # set up, so that the picker is drawn as soon as the first options
+        # are processed
+        streamed_options = None
+        if not isinstance(options, list) or (
+                len(options) > STREAM_FIRST_BATCH and
+                default_index < STREAM_FIRST_BATCH):
+            streamed_options, options = options, []
+
         self.options_list = OptionsList(
             options,
             default_index,
             header_filter,
             match_filter,
-            custom_filter=~has_focus(self.help_window)
+            custom_filter=~has_focus(self.help_window),
+            search_in_background=True,
+            match_mode=config.get('match_mode', section='tui')
         )
         self.options_list.search_buffer.on_text_changed += self.update
+        # The search results come from another thread, they are applied
+        # right before drawing the next frame
+        self.options_list.on_search_done += lambda _: self.invalidate()
+        self.options_list.on_options_loaded += lambda _: self.invalidate()
 
         commands, commands_kb = get_commands(self)
         self.command_line_prompt = CommandLinePrompt(commands=commands)
@@ -352,8 +428,21 @@ class Picker(Application):
             full_screen=True,
             enable_page_navigation_bindings=True
         )
+        self.before_render += self.apply_loaded_options
+        self.before_render += self.apply_search_results
+        self.before_render += self.apply_preview
+        if streamed_options is not None:
+            self.options_list.stream_options(streamed_options)
         self.update()
 
+    def apply_loaded_options(self, *args):
+        if self.options_list.apply_loaded_options():
+            self.refresh_status_line()
+
+    def apply_search_results(self, *args):
+        if self.options_list.apply_search_results():
+            self.refresh_status_line()
+
     def deselect(self):
         self.options_list.deselect()
 
@@ -362,6 +451,8 @@ class Picker(Application):
             selected_index=int(self.options_list.current_index) + 1,
             number_of_documents=len(self.options_list.options),
         )
+        if self.options_list.loading:
+            self.status_line.text += ' (loading...)'
 
     def refresh(self, *args):
         self.refresh_status_line()
@@ -374,5 +465,67 @@ class Picker(Application):
         return self.options_list.get_selection()
 
     def update_info_window(self):
-        doc = self.options_list.get_selection()
-        self.info_window.text = papis.document.dump(doc)
+        # called on the event loop, do not wait for the search
+        doc = self.options_list.get_selection(wait=False)
+        index = self.options_list.current_index
+        if doc is None:
+            self.preview_key = None
+            self.info_window.text = ''
+            return
+        width, height = self.info_window.get_size(
+            self.output.get_size().columns
+        )
+        key = self.preview_key = (index, width, height)
+        if key in self.previews:
+            self.previews.move_to_end(key)
+            self.info_window.text = self.previews[key]
+            return
+        self.preview_executor.submit(
+            self.make_preview, key, self.preview_generation, doc
+        )
+
+    @papis.timing.span('picker preview')
+    def make_preview(self, key, generation, doc):
+        _, width, height = key
+        try:
+            text = get_preview(doc, width, height)
+        except Exception as e:
+            logger.error('Error making preview: {0}'.format(e))
+            return
+        self.preview_results = (key, generation, text)
+        self.invalidate()
+
+    def apply_preview(self, *args):
+        """Show the last preview that was made in the background, if it
+        is the preview of the selected option, and keep it. The previews
+        requested before the last :meth:`clear_preview` are dropped.
+        """
+        results, self.preview_results = self.preview_results, None
+        if results is None:
+            return
+        key, generation, text = results
+        if generation != self.preview_generation:
+            return
+        self.previews[key] = text
+        if len(self.previews) > PREVIEW_CACHE_SIZE:
+            self.previews.popitem(last=False)
+        if key == self.preview_key:
+            self.info_window.text = text
+
+    def clear_preview(self, index):
+        """Forget the previews of an option, e.g. after it is edited,
+        and make it again if it is shown.
+
+        :param index: Index of the option
+        :type  index: int
+        """
+        self.preview_generation += 1
+        for key in [key for key in self.previews if key[0] == index]:
+            del self.previews[key]
+        if self.preview_key is not None and self.preview_key[0] == index:
+            self.update_info_window()
+
+    def close(self):
+        """Stop the threads of the picker."""
+        self.preview_executor.shutdown(wait=True)
+        self.options_list.close()
@@ -46,16 +46,18 @@ class MessageToolbar(ConditionalContainer):
 
 class InfoWindow(ConditionalContainer):
 
-    def __init__(self, lexer_name='yaml'):
+    def __init__(self, lexer_name='yaml', max_height=20):
         self.buf = Buffer()
         self.buf.text = ''
+        self.max_height = max_height
         self.lexer = PygmentsLexer(find_lexer_class_by_name(lexer_name))
+        self.text_window = Window(
+            content=BufferControl(buffer=self.buf, lexer=self.lexer)
+        )
         self.window = HSplit([
             HorizontalLine(),
-            Window(
-                content=BufferControl(buffer=self.buf, lexer=self.lexer)
-            )
-        ], height=Dimension(min=5, max=20, weight=1))
+            self.text_window
+        ], height=Dimension(min=5, max=max_height, weight=1))
         super(InfoWindow, self).__init__(
             content=self.window,
             filter=has_focus(self)
@@ -69,6 +71,19 @@ class InfoWindow(ConditionalContainer):
     def text(self, text):
         self.buf.text = text
 
+    def get_size(self, columns):
+        """Get the largest size that the text can be shown in.
+
+        :param columns: Width of the terminal
+        :type  columns: int
+        :returns: Width and height
+        :rtype:  tuple
+        """
+        render_info = self.text_window.render_info
+        if render_info is not None:
+            return (render_info.window_width, render_info.window_height)
+        return (columns, self.max_height)
+
 
 class HelpWindow(ConditionalContainer):
 
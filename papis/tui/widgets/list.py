@@ -2,22 +2,406 @@ import re
 from prompt_toolkit.formatted_text.html import HTML
 from prompt_toolkit.layout.screen import Point
 from prompt_toolkit.buffer import Buffer
-from prompt_toolkit.layout.controls import FormattedTextControl
+from prompt_toolkit.layout.controls import UIControl, UIContent
+from prompt_toolkit.formatted_text.utils import split_lines
 from prompt_toolkit.layout.containers import (
     Window, ConditionalContainer, WindowAlign, ScrollOffsets
 )
 from prompt_toolkit.filters import has_focus
+from prompt_toolkit.utils import Event
+from concurrent.futures import ThreadPoolExecutor
+import collections
+import itertools
+import threading
 import multiprocessing
+import atexit
 
 import logging
+import papis.timing
+import papis.utils
 
 logger = logging.getLogger('tui:widget:list')
 
 
+#: Below this number of candidates the options are filtered in the process,
+#: shipping them to the pool would take longer than matching them.
+FILTER_CHUNK_SIZE = 20000
+
+#: Number of rendered headers that are kept in memory.
+HEADER_CACHE_SIZE = 2000
+
+#: Rows rendered around the cursor beyond the height of the window, the rest
+#: of the rows are not rendered but replaced by empty lines.
+RENDER_MARGIN = 20
+
+#: When the options come from an iterator, they are added in batches
+#: that start with this size, which is enough for the first screen, and
+#: double up to ``STREAM_MAX_BATCH``.
+STREAM_FIRST_BATCH = 100
+STREAM_MAX_BATCH = 5000
+
+#: Number of queries whose matching options are kept, so that going back
+#: to a query is immediate and new queries are only matched against the
+#: options that match the queries they contain.
+QUERY_CACHE_SIZE = 32
+
+#: Characters that make the words of a regex query more than literal text,
+#: the results of such queries are not used to narrow others.
+REGEX_SPECIAL_CHARACTERS = set('.^$*?{}|\\')
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool(start=True):
+    """Get the process pool that filters the options of long lists.
+    The pool is started the first time that it is needed and it is shared
+    by all the options lists of the process, it is stopped when the process
+    exits or by :func:`shutdown_pool`.
+
+    :param start: Start the pool if it is not started yet, the pool should
+        only be started from the main thread, see
+        :func:`papis.utils.can_fork`
+    :type  start: bool
+    :returns: Process pool, or None if it is not started and ``start``
+        is False
+    :rtype:  multiprocessing.pool.Pool
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None and start:
+            logger.debug('starting pool')
+            _pool = multiprocessing.Pool(multiprocessing.cpu_count())
+            atexit.register(shutdown_pool)
+        return _pool
+
+
+def prepare_pool(count):
+    """Start the pool of :func:`get_pool` if ``count`` options are enough
+    to be filtered in it. It is called from the main thread before the
+    threads of an options list start, since neither the searches in the
+    background nor the loader of :meth:`OptionsList.stream_options`
+    start the pool themselves.
+
+    :param count: Number of options, or None if it is not known, e.g.,
+        for the documents of a query, then the pool is started
+    :type  count: int
+    """
+    if count is not None and count < FILTER_CHUNK_SIZE:
+        return
+    if multiprocessing.cpu_count() > 1:
+        get_pool()
+
+
+def shutdown_pool():
+    """Stop the process pool of :func:`get_pool` if it was started."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            return
+        logger.debug('stopping pool')
+        # the workers only hold copies of the options, so there
+        # is nothing to finish
+        _pool.terminate()
+        _pool.join()
+        _pool = None
+        atexit.unregister(shutdown_pool)
+
+
 def match_against_regex(regex, line, index):
     return index if regex.match(line) else None
 
 
+def filter_indices(regex, lines, indices):
+    """Get the indices of the lines that match a regular expression.
+
+    :param regex: Compiled regular expression
+    :param lines: Lines, the ``i``-th line has index ``indices[i]``
+    :type  lines: list
+    :param indices: Indices of the lines
+    :type  indices: list
+    :returns: Indices of the matching lines, in the same order
+    :rtype:  list
+
+    >>> filter_indices(re.compile('.*l'), ['hello', 'bye'], [4, 7])
+    [4]
+    """
+    match = regex.match
+    return [i for i, line in zip(indices, lines) if match(line)]
+
+
+#: Scores of the fuzzy matching, in the spirit of
+#: `fzf <https://github.com/junegunn/fzf>`_
+SCORE_MATCH = 16
+SCORE_GAP_START = -3
+SCORE_GAP_EXTENSION = -1
+BONUS_BOUNDARY = 8
+BONUS_CONSECUTIVE = 4
+BONUS_FIRST_CHAR_MULTIPLIER = 2
+
+
+def fuzzy_score(query, text):
+    """Score how well a query matches a text, every word of the query
+    has to appear in the text as a subsequence, i.e., its characters have
+    to appear in order but not necessarily together. Matches at the
+    beginning of words and consecutive characters score higher,
+    and gaps between the characters lower the score.
+    Both the query and the text should be lower case.
+
+    :param query: Query typed by the user
+    :type  query: str
+    :param text: Text to be matched
+    :type  text: str
+    :returns: Score or None if it does not match
+    :rtype:  int
+
+    >>> fuzzy_score('ein', 'albert einstein')
+    80
+    >>> fuzzy_score('ein', 'werner heisenberg')
+    48
+    >>> fuzzy_score('ein bohr', 'albert einstein') is None
+    True
+    """
+    return _score_terms(query.split(), text)
+
+
+def _score_terms(terms, text):
+    find = text.find
+    rfind = text.rfind
+    score = 0
+    for term in terms:
+        # find where the first match ends, and then the last start
+        # of a match ending there, so that the match is short
+        end = -1
+        for char in term:
+            end = find(char, end + 1)
+            if end < 0:
+                return None
+        start = end + 1
+        for char in term[::-1]:
+            start = rfind(char, 0, start)
+        # score the match
+        position = previous = start - 1
+        run_bonus = 0
+        first = True
+        for char in term:
+            position = find(char, position + 1)
+            bonus = (
+                BONUS_BOUNDARY
+                if position == 0 or not text[position - 1].isalnum()
+                else 0
+            )
+            if first:
+                run_bonus = bonus
+                bonus *= BONUS_FIRST_CHAR_MULTIPLIER
+                first = False
+            elif position == previous + 1:
+                # the characters of a run have at least the bonus
+                # of the first one
+                if bonus < run_bonus:
+                    bonus = run_bonus
+                if bonus < BONUS_CONSECUTIVE:
+                    bonus = BONUS_CONSECUTIVE
+            else:
+                run_bonus = bonus
+                score += (
+                    SCORE_GAP_START +
+                    SCORE_GAP_EXTENSION * (position - previous - 2)
+                )
+            score += SCORE_MATCH + bonus
+            previous = position
+    return score
+
+
+def fuzzy_filter_indices(query, lines, indices):
+    """Get the indices of the lines that match a query fuzzily,
+    see :func:`fuzzy_score`.
+
+    :param query: Lower case query
+    :type  query: str
+    :param lines: Lower case lines, the ``i``-th line has index
+        ``indices[i]``
+    :type  lines: list
+    :param indices: Indices of the lines
+    :type  indices: list
+    :returns: List of tuples with minus the score and the index,
+        so that sorting them puts the best matches first
+    :rtype:  list
+
+    >>> lines = ['heisenberg', 'bohr', 'einstein']
+    >>> fuzzy_filter_indices('ein', lines, [0, 1, 2])
+    [(-48, 0), (-80, 2)]
+    """
+    terms = query.split()
+    result = []
+    append = result.append
+    for i, line in zip(indices, lines):
+        score = _score_terms(terms, line)
+        if score is not None:
+            append((-score, i))
+    return result
+
+
+def _filter_chunk(args):
+    function = args[0]
+    return function(*args[1:])
+
+
+def get_search_regex(query_text):
+    """Get the regular expression used to filter the options for the text
+    typed by the user, words are matched in order.
+
+    :param query_text: Text typed by the user
+    :type  query_text: str
+    :returns: Compiled regular expression
+
+    >>> get_search_regex('ein (1905)').pattern
+    '.*ein.*\\\\(1905\\\\)'
+    """
+    cleaned_search = (
+        query_text
+        .replace('(', '\\(')
+        .replace(')', '\\)')
+        .replace('+', '\\+')
+        .replace('[', '\\[')
+        .replace(']', '\\]')
+    )
+    return re.compile(r".*"+re.sub(r"\s+", ".*", cleaned_search), re.I)
+
+
+def is_subsequence(text, other):
+    """Tell if the characters of ``text`` appear in order in ``other``.
+
+    >>> is_subsequence('ein', 'einstein'), is_subsequence('ein', 'eni')
+    (True, False)
+    """
+    characters = iter(other)
+    return all(c in characters for c in text)
+
+
+def query_contains(terms, other_terms, fuzzy=False):
+    """Tell if all the options that match the words ``terms`` of a query
+    also match the words ``other_terms`` of another query.
+    For the regular expressions of :func:`get_search_regex`, this is the
+    case when the words of the other query are in order in different words
+    of the query, and for fuzzy queries, when every word of the other
+    query is a subsequence of a word of the query.
+
+    :param terms: Words of a query
+    :type  terms: list
+    :param other_terms: Words of the other query
+    :type  other_terms: list
+    :param fuzzy: Tell if the queries are fuzzy
+    :type  fuzzy: bool
+    :rtype:  bool
+
+    >>> query_contains(['einst', '1905'], ['ein'])
+    True
+    >>> query_contains(['einst', '1905'], ['190', 'ein'])
+    False
+    >>> query_contains(['einst', '1905'], ['195', 'et'], fuzzy=True)
+    True
+    """
+    if fuzzy:
+        return all(
+            any(is_subsequence(other, term) for term in terms)
+            for other in other_terms
+        )
+    terms = iter(terms)
+    return all(
+        any(other in term for term in terms)
+        for other in other_terms
+    )
+
+
+class FenwickTree(object):
+    """Fenwick tree (binary indexed tree) of numbers, it allows to change
+    single values and to get the sums of the first values in logarithmic
+    time.
+
+    :param values: Initial values
+
+    >>> tree = FenwickTree([3, 1, 2])
+    >>> tree.prefix_sum(2), tree.total
+    (4, 6)
+    >>> tree.add(0, -1)
+    >>> tree.prefix_sum(1), tree.prefix_sum(3)
+    (2, 5)
+    """
+
+    def __init__(self, values):
+        # every node i holds the sum of the values in (i - lowbit(i), i]
+        prefix = [0] + list(itertools.accumulate(values))
+        self.tree = [0] + [
+            prefix[i] - prefix[i - (i & -i)] for i in range(1, len(prefix))
+        ]
+        self.total = prefix[-1]
+
+    def add(self, position, delta):
+        """Add ``delta`` to the value at ``position``."""
+        self.total += delta
+        position += 1
+        while position < len(self.tree):
+            self.tree[position] += delta
+            position += position & -position
+
+    def append(self, value):
+        """Add a new value at the end."""
+        position = len(self.tree)
+        # the new node holds the sum of the values after position - lowbit
+        self.tree.append(
+            value +
+            self.prefix_sum(position - 1) -
+            self.prefix_sum(position - (position & -position))
+        )
+        self.total += value
+
+    def prefix_sum(self, count):
+        """Sum of the first ``count`` values."""
+        result = 0
+        while count > 0:
+            result += self.tree[count]
+            count -= count & -count
+        return result
+
+    def find(self, value):
+        """Largest number of first values whose sum is not larger than
+        ``value``, the values have to be positive.
+
+        >>> tree = FenwickTree([3, 1, 2])
+        >>> tree.find(0), tree.find(3), tree.find(5), tree.find(6)
+        (0, 1, 2, 3)
+        """
+        count = 0
+        step = 1 << (len(self.tree) - 1).bit_length()
+        while step:
+            if (count + step < len(self.tree) and
+                    self.tree[count + step] <= value):
+                count += step
+                value -= self.tree[count]
+            step >>= 1
+        return count
+
+
+class OptionsListControl(UIControl):
+    """Control that shows the options of an :class:`OptionsList`, the lines
+    of the options are only made when they are shown.
+    """
+
+    def __init__(self, options_list):
+        self.options_list = options_list
+
+    def is_focusable(self):
+        return False
+
+    def preferred_height(self, width, max_available_height, *args):
+        return self.create_content(width, None).line_count
+
+    def create_content(self, width, height):
+        return self.options_list.get_content()
+
+
 class OptionsList(ConditionalContainer):
 
     def __init__(
@@ -27,27 +411,65 @@ class OptionsList(ConditionalContainer):
             header_filter=lambda x: x,
             match_filter=lambda x: x,
             custom_filter=None,
-            search_buffer=Buffer(multiline=False),
-            cpu_count=multiprocessing.cpu_count()
+            search_buffer=None,
+            cpu_count=None,
+            search_in_background=False,
+            match_mode='regex'
             ):
 
-        assert(isinstance(options, list))
         assert(callable(header_filter))
         assert(callable(match_filter))
         assert(isinstance(default_index, int))
+        assert(match_mode in ['regex', 'fuzzy'])
 
-        self.search_buffer = search_buffer
+        self.match_mode = match_mode
+        self.search_buffer = (
+            Buffer(multiline=False) if search_buffer is None else search_buffer
+        )
         self.last_query_text = ''
         self.search_buffer.on_text_changed += self.update
 
+        # When searching in the background, every new query gets a new
+        # generation, so that searches for older queries stop early
+        # and their results are discarded
+        self.search_executor = (
+            ThreadPoolExecutor(max_workers=1)
+            if search_in_background else None
+        )
+        self.search_future = None
+        self.search_generation = 0
+        self.search_results = None
+        self.last_searched_text = ''
+        self.on_search_done = Event(self)
+
+        # Options that do not come in a list are loaded in the background
+        # in batches, which are added by apply_loaded_options
+        self.loading = False
+        self.loader = None
+        self.stop_loading = threading.Event()
+        self.loaded_batches = collections.deque()
+        self.on_options_loaded = Event(self)
+        options_iterator = None
+        if not isinstance(options, list):
+            options_iterator, options = iter(options), []
+
         self.header_filter = header_filter
         self.match_filter = match_filter
         self.current_index = default_index
         self.entries_left_offset = 0
-        self.pool = multiprocessing.Pool(cpu_count)
+        # the options are only filtered in the shared pool of get_pool
+        # when there are enough of them, see get_filtered_indices
+        self.cpu_count = (
+            multiprocessing.cpu_count() if cpu_count is None else cpu_count
+        )
 
         self.options_headers_linecount = []
-        self._indices_to_lines = []
+        # positions of the options in indices and the heights of the
+        # shown options in a Fenwick tree, so that the line of an option
+        # is found in logarithmic time
+        self.positions = dict()
+        self.lines = FenwickTree([])
+        self._marked_lines = None
 
         self._options = []
         self.marks = []
@@ -56,12 +478,7 @@ class OptionsList(ConditionalContainer):
         self.options = options
         self.cursor = Point(0, 0)
 
-        self.content = FormattedTextControl(
-            text=self.get_tokens,
-            focusable=False,
-            key_bindings=None,
-            get_cursor_position=lambda: self.cursor,
-        )
+        self.content = OptionsListControl(self)
         self.content_window = Window(
             content=self.content,
             wrap_lines=False,
@@ -88,21 +505,38 @@ class OptionsList(ConditionalContainer):
             )
         )
 
-    def __del__(self):
-        # Clean initialized pool upon deleting of the object
-        self.pool.close()
-        self.pool.join()
+        if options_iterator is not None:
+            self.stream_options(options_iterator)
+
+    def close(self):
+        """Stop the thread of the background search once the last search
+        is done and apply its results, and stop loading the options, see
+        :meth:`stream_options`. The shared pool of :func:`get_pool`
+        is not stopped, since other lists may use it.
+        """
+        self.stop_loading.set()
+        if self.loader is not None:
+            self.loader.join()
+        if self.search_executor is not None:
+            self.search_executor.shutdown(wait=True)
+            self.search_executor = None
+            self.apply_search_results()
 
     def get_line_prefix(self, line, blih):
         if self.current_index is None:
             return
         current_line = self.index_to_line(self.current_index)
-        if (0 <= line - current_line
+        if (current_line is not None and 0 <= line - current_line
                 < self.options_headers_linecount[self.current_index]):
             return [('class:options_list.selected_margin', '|')]
         else:
-            marked_clines = [self.index_to_line(i) for i in self.marks]
-            if line in marked_clines:
+            # the lines of the marks are computed once per redraw
+            key = (tuple(self.marks), self.lines.total, len(self.indices))
+            if self._marked_lines is None or self._marked_lines[0] != key:
+                self._marked_lines = (
+                    key, set(self.index_to_line(i) for i in self.marks)
+                )
+            if line in self._marked_lines[1]:
                 return [('class:options_list.marked_margin', '#')]
             else:
                 return [('class:options_list.unselected_margin', ' ')]
@@ -126,26 +560,16 @@ class OptionsList(ConditionalContainer):
         self.process_options()
 
     def move_up(self):
-        try:
-            index = self.indices.index(self.current_index)
-            index -= 1
-            if index < 0:
-                self.current_index = self.indices[-1]
-            else:
-                self.current_index = self.indices[index]
-        except ValueError:
-            pass
+        position = self.positions.get(self.current_index)
+        if position is not None:
+            self.current_index = self.indices[position - 1]
 
     def move_down(self):
-        try:
-            index = self.indices.index(self.current_index)
-            index += 1
-            if index >= len(self.indices):
-                self.current_index = self.indices[0]
-            else:
-                self.current_index = self.indices[index]
-        except ValueError:
-            pass
+        position = self.positions.get(self.current_index)
+        if position is not None:
+            self.current_index = self.indices[
+                (position + 1) % len(self.indices)
+            ]
 
     def go_top(self):
         if len(self.indices) > 0:
@@ -164,53 +588,402 @@ class OptionsList(ConditionalContainer):
 
     @property
     def search_regex(self):
-        cleaned_search = (
-            self.query_text
-            .replace('(', '\\(')
-            .replace(')', '\\)')
-            .replace('+', '\\+')
-            .replace('[', '\\[')
-            .replace(']', '\\]')
-        )
-        return re.compile(r".*"+re.sub(r"\s+", ".*", cleaned_search), re.I)
+        return get_search_regex(self.query_text)
 
     def update(self, *args):
-        self.filter_options()
-        self._indices_to_lines = []
+        if self.search_executor is None:
+            self.filter_options()
+            return
+        if self.query_text == self.last_searched_text:
+            return
+        self.last_searched_text = self.query_text
+        self.search_generation += 1
+        # options might be added while searching, so the search is done
+        # on a copy of the current ones
+        self.search_future = self.search_executor.submit(
+            self.search,
+            self.search_generation,
+            self.query_text,
+            self.last_query_text,
+            list(self.indices),
+            len(self.options_matchers)
+        )
 
-    def filter_options(self, *args):
-        indices = []
-        regex = self.search_regex
+    def search(
+            self, generation, query_text, last_query_text, last_indices,
+            count):
+        """Filter the options in the background, the results are kept
+        until they are applied with :meth:`apply_search_results`,
+        and ``on_search_done`` is fired.
+        """
+        try:
+            indices = self.get_filtered_indices(
+                query_text, last_query_text, last_indices,
+                is_cancelled=lambda: generation != self.search_generation,
+                count=count
+            )
+        except Exception as e:
+            logger.error('Error while searching: {0}'.format(e))
+            return
+        if indices is None:
+            logger.debug('search for {0} cancelled'.format(query_text))
+            return
+        self.search_results = (generation, query_text, indices, count)
+        self.on_search_done.fire()
+
+    def apply_search_results(self, wait=False):
+        """Apply the results of the last background search.
 
+        :param wait: Wait for the last search to finish
+        :type  wait: bool
+        :returns: True if new results were applied
+        :rtype:  bool
+        """
+        if wait and self.search_future is not None:
+            self.search_future.result()
+        results = self.search_results
+        if results is None or results[0] != self.search_generation:
+            return False
+        self.search_results = None
+        self.set_filtered_indices(*results[1:])
+        return True
+
+    def filter_options(self, *args):
         if self.query_text == self.last_query_text:
             return
+        self.set_filtered_indices(
+            self.query_text,
+            self.get_filtered_indices(
+                self.query_text, self.last_query_text, self.indices
+            )
+        )
+
+    def get_filtered_indices(
+            self, query_text, last_query_text, last_indices,
+            is_cancelled=lambda: False, count=None):
+        """Get the indices of the options matching a query.
 
-        if self.query_text.startswith(self.last_query_text):
-            search_indices = self.indices
+        :param query_text: Text typed by the user
+        :type  query_text: str
+        :param last_query_text: Query that gave ``last_indices``
+        :type  last_query_text: str
+        :param last_indices: Indices matching ``last_query_text``
+        :type  last_indices: list
+        :param is_cancelled: Function telling if the search should be
+            given up, it is checked between chunks of options
+        :param count: Search only the first ``count`` options
+        :type  count: int
+        :returns: List of indices or None if cancelled
+        :rtype:  list
+        """
+        if count is None:
+            count = len(self.options_matchers)
+        key = self.get_query_key(query_text)
+        if not key:
+            return list(range(count))
+        entry = self.query_cache.get(key)
+        if entry is not None and entry[0] == count:
+            self.query_cache.move_to_end(key)
+            return list(entry[1])
+        elif entry is not None:
+            # only the options added since then have to be matched
+            indices = self.match_indices(
+                query_text,
+                list(entry[1]) + list(range(entry[0], count)),
+                is_cancelled
+            )
         else:
-            search_indices = range(len(self.options_matchers))
+            indices = self.match_indices(
+                query_text,
+                self.get_candidate_indices(
+                    key, last_query_text, last_indices, count
+                ),
+                is_cancelled
+            )
+        if indices is not None:
+            self.query_cache[key] = [count, list(indices), None]
+            if len(self.query_cache) > QUERY_CACHE_SIZE:
+                self.query_cache.popitem(last=False)
+        return indices
 
-        self.last_query_text = self.query_text
+    def get_query_key(self, query_text):
+        """Get the words of a query separated by single spaces, queries with
+        the same key match the same options.
 
-        result = [
-            self.pool.apply_async(
-                match_against_regex,
-                args=(regex, opt, i,)
+        :param query_text: Text typed by the user
+        :type  query_text: str
+        :rtype:  str
+        """
+        if self.match_mode == 'fuzzy':
+            query_text = query_text.lower()
+        return ' '.join(query_text.split())
+
+    def can_narrow(self, key):
+        """Tell if the results of a query can be used to narrow the
+        results of the queries that contain it, see :func:`query_contains`.
+        """
+        return bool(key) and (
+            self.match_mode == 'fuzzy' or
+            not REGEX_SPECIAL_CHARACTERS.intersection(key)
+        )
+
+    def get_candidate_indices(self, key, last_query_text, last_indices, count):
+        """Get the indices of the options that can match a query, i.e.,
+        the options that match all the cached queries that the query
+        contains, see :func:`query_contains`.
+
+        :param key: Words of the query separated by single spaces
+        :type  key: str
+        :param last_query_text: Query that gave ``last_indices``
+        :type  last_query_text: str
+        :param last_indices: Indices matching ``last_query_text``
+        :type  last_indices: list
+        :param count: Number of options
+        :type  count: int
+        :returns: List of indices
+        :rtype:  list
+        """
+        fuzzy = self.match_mode == 'fuzzy'
+        if not self.can_narrow(key):
+            return list(range(count))
+        terms = key.split(' ')
+        # cached entries, i.e. lists with the number of options, the indices
+        # and the set of indices when it is needed, of the containing queries
+        entries = {
+            tuple(other_key.split(' ')): entry
+            for other_key, entry in self.query_cache.items()
+            if self.can_narrow(other_key) and
+            query_contains(terms, other_key.split(' '), fuzzy)
+        }
+        # the results of the last query are usually cached already
+        last_key = self.get_query_key(last_query_text)
+        if (last_key not in self.query_cache and self.can_narrow(last_key) and
+                query_contains(terms, last_key.split(' '), fuzzy)):
+            entries[tuple(last_key.split(' '))] = [count, last_indices, None]
+        # the queries contained in others do not narrow the candidates more
+        entries = [
+            entry for other_terms, entry in entries.items()
+            if not any(
+                terms_ != other_terms and entry_[0] >= entry[0] and
+                query_contains(terms_, other_terms, fuzzy)
+                for terms_, entry_ in entries.items()
             )
-            for i, opt in enumerate(self.options_matchers)
-            if i in search_indices
         ]
+        if not entries:
+            return list(range(count))
+        entries.sort(key=lambda entry: len(entry[1]) + count - entry[0])
+        smallest, others = entries[0], entries[1:]
+        for entry in others:
+            if entry[2] is None:
+                entry[2] = set(entry[1])
+        candidates = [
+            i for i in smallest[1]
+            if all(i in entry[2] or i >= entry[0] for entry in others)
+        ]
+        candidates.extend(range(smallest[0], count))
+        return candidates
 
-        indices = [d.get() for d in result if d.get() is not None]
+    @papis.timing.span('picker search')
+    def match_indices(
+            self, query_text, search_indices, is_cancelled=lambda: False):
+        """Get the indices among ``search_indices`` of the options
+        matching a query, see :meth:`get_filtered_indices`.
+        """
+        fuzzy = self.match_mode == 'fuzzy'
+        if not query_text.split():
+            return sorted(search_indices)
+        elif fuzzy:
+            function = fuzzy_filter_indices
+            pattern = query_text.lower()
+            matchers = self.options_matchers_lower
+        else:
+            function = filter_indices
+            pattern = get_search_regex(query_text)
+            matchers = self.options_matchers
+        if len(search_indices) < FILTER_CHUNK_SIZE or self.cpu_count == 1:
+            size = FILTER_CHUNK_SIZE // 4
+        else:
+            size = max(
+                FILTER_CHUNK_SIZE // 4,
+                -(-len(search_indices) // self.cpu_count)
+            )
+        chunks = (
+            (function, pattern, [matchers[i] for i in c], c)
+            for c in (
+                search_indices[i:i + size]
+                for i in range(0, len(search_indices), size)
+            )
+        )
+        pool = None
+        if len(search_indices) >= FILTER_CHUNK_SIZE and self.cpu_count > 1:
+            # forking the pool from another thread can deadlock, a search in
+            # the background only uses it if it was started already
+            pool = get_pool(start=papis.utils.can_fork())
+        if pool is None:
+            results = (_filter_chunk(chunk) for chunk in chunks)
+        else:
+            results = pool.imap(_filter_chunk, chunks)
+
+        indices = []
+        for result in results:
+            if is_cancelled():
+                return None
+            indices += result
+        if fuzzy:
+            # best matches first, and in the order of the options otherwise
+            indices = [i for _, i in sorted(indices)]
+        return indices
 
+    def set_filtered_indices(self, query_text, indices, count=None):
+        if count is not None and count < len(self.options_matchers):
+            # options were added while searching
+            indices = indices + self.match_indices(
+                query_text, list(range(count, len(self.options_matchers)))
+            )
+        self.last_query_text = query_text
         self.indices = indices
-        if len(self.indices) and self.current_index not in self.indices:
-            if self.current_index > max(self.indices):
-                self.current_index = max(self.indices)
+        self.update_positions()
+        if len(self.indices) and self.match_mode == 'fuzzy':
+            # the best match is always on top
+            self.current_index = self.indices[0]
+        elif len(self.indices) and self.current_index not in self.positions:
+            if self.current_index is None:
+                self.current_index = self.indices[0]
+            elif self.current_index > self.indices[-1]:
+                self.current_index = self.indices[-1]
             else:
                 self.current_index = self.indices[0]
 
-    def get_selection(self):
+    def stream_options(self, options):
+        """Add options from an iterable in the background, the match
+        strings are computed in the background too. The options are added
+        with :meth:`apply_loaded_options` and ``on_options_loaded`` is fired
+        every time there are options to be added.
+
+        The iterator of the options is closed by the thread when
+        :meth:`close` is called before all of them are loaded.
+
+        :param options: Iterable with the options
+        """
+        self.loading = True
+        self.loader = threading.Thread(
+            target=self.load_options, args=(iter(options),)
+        )
+        self.loader.daemon = True
+        self.loader.start()
+
+    def load_options(self, options):
+        batch_size = STREAM_FIRST_BATCH
+        try:
+            while not self.stop_loading.is_set():
+                batch, matchers = [], []
+                for option in itertools.islice(options, batch_size):
+                    batch.append(option)
+                    matchers.append(self.match_filter(option))
+                    # close does not wait for the whole batch
+                    if self.stop_loading.is_set():
+                        break
+                if batch:
+                    self.loaded_batches.append((batch, matchers))
+                    self.on_options_loaded.fire()
+                if len(batch) < batch_size:
+                    break
+                batch_size = min(2 * batch_size, STREAM_MAX_BATCH)
+        except Exception as e:
+            logger.error('Error while loading options: {0}'.format(e))
+        finally:
+            if hasattr(options, 'close'):
+                # e.g. a query of the database, which stops searching
+                options.close()
+            self.loading = False
+            self.on_options_loaded.fire()
+
+    def apply_loaded_options(self, wait=False):
+        """Add the options loaded by :meth:`stream_options` so far.
+
+        :param wait: Wait until all the options are loaded
+        :type  wait: bool
+        :returns: True if options were added
+        :rtype:  bool
+        """
+        if wait and self.loader is not None:
+            self.loader.join()
+        was_loading = self.loader is not None
+        added = False
+        options, matchers = [], []
+        while self.loaded_batches:
+            batch, batch_matchers = self.loaded_batches.popleft()
+            options.extend(batch)
+            matchers.extend(batch_matchers)
+        if options:
+            self.append_options(options, matchers)
+            added = True
+        if was_loading and not self.loading and not self.loaded_batches:
+            self.loader = None
+            if self.match_mode == 'fuzzy' and self.last_query_text.split():
+                # the options added while loading are only ranked
+                # among themselves
+                self.set_filtered_indices(
+                    self.last_query_text,
+                    self.match_indices(
+                        self.last_query_text, list(self.indices)
+                    )
+                )
+            added = True
+        return added
+
+    def append_options(self, options, matchers):
+        """Add options at the end of the list.
+
+        :param options: New options
+        :type  options: list
+        :param matchers: Match strings of the new options
+        :type  matchers: list
+        """
+        start = len(self._options)
+        self._options.extend(options)
+        self.options_matchers.extend(matchers)
+        if self.match_mode == 'fuzzy':
+            self.options_matchers_lower.extend(m.lower() for m in matchers)
+        # like in process_options, the new options are assumed to be
+        # as high as the first one
+        if start:
+            height = self.options_headers_linecount[0]
+            self.options_headers_linecount.extend([height] * len(options))
+        else:
+            self.options_headers_linecount = [1] * len(options)
+            self.get_option_header(0)
+            self.options_headers_linecount = (
+                [self.options_headers_linecount[0]] * len(options)
+            )
+            self.max_entry_height = self.options_headers_linecount[0]
+        new_indices = self.match_indices(
+            self.last_query_text, list(range(start, len(self._options)))
+        )
+        if isinstance(self.indices, range):
+            self.indices = list(self.indices)
+        if 16 * len(new_indices) > len(self.indices):
+            # building everything again is faster than adding one by one
+            self.indices.extend(new_indices)
+            self.update_positions()
+        else:
+            for index in new_indices:
+                self.positions[index] = len(self.indices)
+                self.indices.append(index)
+                self.lines.append(self.options_headers_linecount[index])
+        if self.current_index not in self.positions and self.indices:
+            self.current_index = self.indices[0]
+
+    def get_selection(self, wait=True):
+        """Get the option under the cursor.
+
+        :param wait: Wait for the background search to finish, so that
+            the option matches the last query. Otherwise the option
+            currently shown is returned.
+        :type  wait: bool
+        """
+        if self.search_executor is not None:
+            self.apply_search_results(wait=wait)
         if len(self.indices) and self.current_index is not None:
             return self.options[self.current_index]
 
@@ -218,58 +991,147 @@ class OptionsList(ConditionalContainer):
         """This function updates the cursor according to the current index
         in the list.
         """
-        try:
-            index = self.indices.index(self.current_index)
-            line = sum(
-                self.options_headers_linecount[i]
-                for i in self.indices[0:index]
-            )
-            self.cursor = Point(0, line)
-        except Exception:
-            self.cursor = Point(0, 0)
+        line = self.index_to_line(self.current_index)
+        self.cursor = Point(0, line or 0)
+
+    def update_positions(self):
+        """Build the position map and the line heights of the options
+        in ``indices``, this has to be done whenever they change.
+        """
+        self.positions = dict(zip(self.indices, range(len(self.indices))))
+        linecount = self.options_headers_linecount
+        self.lines = FenwickTree([linecount[i] for i in self.indices])
+        # the marks are on other lines now
+        self._marked_lines = None
+
+    def get_visible_range(self):
+        """Get the positions in ``indices`` of the rows that have to be
+        rendered. Whatever the scrolling of the window, only rows that are
+        less than a window height away from the cursor can be seen.
+
+        :returns: First and last (not included) position
+        :rtype:  tuple
+        """
+        render_info = self.content_window.render_info
+        height = render_info.window_height if render_info else 100
+        position = self.positions.get(self.current_index, 0)
+        return (
+            max(0, position - height - RENDER_MARGIN),
+            min(len(self.indices), position + height + RENDER_MARGIN + 1)
+        )
 
     def get_tokens(self):
+        """Render the rows that can be seen, see :meth:`get_visible_range`.
+
+        :returns: Formatted text of the rows
+        :rtype:  list
+        """
+        start, end = self.get_visible_range()
+        result = [
+            fragment
+            for i in self.indices[start:end]
+            for fragment in self.get_option_header(i)
+        ]
         self.update_cursor()
-        result = sum(
-            [self.options_headers[i] for i in self.indices],
-            []
-        )
         return result
 
+    def get_content(self):
+        """Get the content of the window. The rows that can be seen are
+        rendered first, so that their heights are known, and the lines
+        of all the other rows are only made if the window asks for them.
+
+        :rtype:  prompt_toolkit.layout.controls.UIContent
+        """
+        self.get_tokens()
+        return UIContent(
+            get_line=self.get_line,
+            line_count=self.lines.total,
+            cursor_position=self.cursor,
+            show_cursor=False
+        )
+
+    def get_line(self, line):
+        """Get the formatted text of a line of the window.
+
+        :param line: Line number
+        :type  line: int
+        :rtype:  list
+        """
+        position = self.lines.find(line)
+        if position >= len(self.indices):
+            return []
+        header = self.get_option_header(self.indices[position])
+        lines = list(split_lines(header))
+        offset = line - self.lines.prefix_sum(position)
+        return lines[offset] if offset < len(lines) else []
+
+    def get_option_header(self, index):
+        """Get the rendered header of an option, only the last
+        ``HEADER_CACHE_SIZE`` headers are kept.
+        The number of lines of the option is updated when rendering it.
+
+        :param index: Index of the option
+        :type  index: int
+        :returns: Formatted text
+        :rtype:  list
+        """
+        header = self._headers_cache.get(index)
+        if header is not None:
+            self._headers_cache.move_to_end(index)
+            return header
+        prestring = self.header_filter(self.options[index]) + '\n'
+        try:
+            header = HTML(prestring).formatted_text
+        except Exception:
+            logger.error(
+                'Error processing html for \n {0}'.format(prestring)
+            )
+            header = [('fg:red', prestring)]
+        linecount = prestring.count('\n')
+        delta = linecount - self.options_headers_linecount[index]
+        if delta:
+            self.options_headers_linecount[index] = linecount
+            if index in self.positions:
+                self.lines.add(self.positions[index], delta)
+        self._headers_cache[index] = header
+        if len(self._headers_cache) > HEADER_CACHE_SIZE:
+            self._headers_cache.popitem(last=False)
+        return header
+
     def index_to_line(self, index):
-        if not self._indices_to_lines:
-            options_headers_linecount = [
-                self.options_headers_linecount[i] if i in self.indices else 0
-                for i in range(len(self.options_headers_linecount))
-            ]
-            self._indices_to_lines = [
-                sum(options_headers_linecount[0:i])
-                for i in range(len(options_headers_linecount))
-            ]
-        return self._indices_to_lines[index]
+        """Get the first line of an option in the list.
+
+        :param index: Index of the option
+        :type  index: int
+        :returns: Line or None if the option is not shown
+        :rtype:  int
+        """
+        position = self.positions.get(index)
+        if position is None:
+            return None
+        return self.lines.prefix_sum(position)
 
     def process_options(self):
         logger.debug('processing {0} options'.format(len(self.options)))
         self.marks = []
-        self.options_headers_linecount = [
-            len(self.header_filter(o).split('\n'))
-            for o in self.options
-        ]
-        self.max_entry_height = max(self.options_headers_linecount)
-        logger.debug('processing headers')
-        self.options_headers = []
-        for o in self.options:
-            prestring = self.header_filter(o) + '\n'
-            try:
-                htmlobject = HTML(prestring).formatted_text
-            except:
-                logger.error(
-                    'Error processing html for \n {0}'.format(prestring)
-                )
-                htmlobject = [('fg:red', prestring)]
-            self.options_headers += [htmlobject]
-        logger.debug('got {0} headers'.format(len(self.options_headers)))
+        # The headers are only rendered when they are shown, until then
+        # every option is assumed to be as high as the first one
+        self._headers_cache = collections.OrderedDict()
+        self.query_cache = collections.OrderedDict()
+        self.positions = dict()
+        self.options_headers_linecount = [1] * len(self.options)
+        if self.options:
+            self.get_option_header(0)
+            self.options_headers_linecount = (
+                [self.options_headers_linecount[0]] * len(self.options)
+            )
+        self.max_entry_height = max(self.options_headers_linecount or [1])
         logger.debug('processing matchers')
         self.options_matchers = [self.match_filter(o) for o in self.options]
+        if self.match_mode == 'fuzzy':
+            self.options_matchers_lower = [
+                m.lower() for m in self.options_matchers
+            ]
         self.indices = range(len(self.options))
+        self.update_positions()
         logger.debug('got {0} matchers'.format(len(self.options_matchers)))
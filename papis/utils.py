@@ -1,17 +1,15 @@
 # -*- coding: utf-8 -*-
 import subprocess
 import multiprocessing
+import threading
 import time
 from itertools import count, product
 import os
 import re
-import papis.pick
 import papis.config
-import papis.commands
 import papis.document
-import papis.crossref
-import papis.bibtex
 import papis.exceptions
+import papis.timing
 import logging
 
 logger = logging.getLogger("utils")
@@ -37,6 +35,7 @@ def general_open(fileName, key, default_opener=None, wait=True):
     >>> general_open([path], 'editor', wait=False)
     <subprocess.Popen...>
     """
+    import papis.pick
     try:
         opener = papis.config.get(key)
     except papis.exceptions.DefaultSettingValueMissing:
@@ -94,6 +93,7 @@ def format_doc(python_format, document, key=""):
     return python_format.format(**{doc: document})
 
 
+@papis.timing.span('crawl')
 def get_folders(folder):
     """This is the main indexing routine. It looks inside ``folder`` and crawls
     the whole directory structure in search for subfolders containing an info
@@ -423,9 +423,46 @@ def get_document_extension(document_path):
         return kind.extension
 
 
+def in_main_thread():
+    """Whether the caller runs in the main thread. Forking a process pool
+    is only safe from the main thread, since a lock held by another thread
+    at the time of the fork stays locked forever in the child.
+
+    :returns: True in the main thread
+    :rtype:  bool
+
+    >>> in_main_thread()
+    True
+    """
+    return threading.current_thread() is threading.main_thread()
+
+
+#: Whether process pools can be forked at all, see :func:`can_fork`. It is
+#: turned off by processes that always run other threads, e.g. the daemon
+#: of :mod:`papis.daemon`.
+fork_enabled = True
+
+
+def can_fork():
+    """Whether the caller can fork a process pool, i.e., it runs in the
+    main thread (see :func:`in_main_thread`) and forking is not turned off
+    with :data:`fork_enabled`.
+
+    :returns: True if a process pool can be forked
+    :rtype:  bool
+
+    >>> can_fork()
+    True
+    """
+    return fork_enabled and in_main_thread()
+
+
+@papis.timing.span('parse')
 def folders_to_documents(folders):
     """Turn folders into documents, this is done in a multiprocessing way, this
-    step is quite critical for performance.
+    step is quite critical for performance. When no pool can be forked,
+    e.g. outside of the main thread, it is done serially, see
+    :func:`can_fork`.
 
     :param folders: List of folder paths.
     :type  folders: list
@@ -433,6 +470,9 @@ def folders_to_documents(folders):
     :rtype:  list
     """
     logger = logging.getLogger("utils:dir2doc")
+    if not can_fork():
+        logger.debug("converting folder into documents serially")
+        return [papis.document.from_folder(f) for f in folders]
     np = multiprocessing.cpu_count()
     logger.debug("converting folder into documents on {0} cores".format(np))
     pool = multiprocessing.Pool(np)
@@ -481,3 +521,19 @@ def get_cache_home():
     if not os.path.exists(path):
         os.makedirs(path)
     return path
+
+
+def discard_stdout():
+    """Send whatever is still written to the standard output to
+    ``os.devnull``. It is used when the reader of the output is gone, e.g.,
+    in ``papis list | head``, so that python does not fail again when it
+    flushes the output at exit.
+    """
+    import sys
+    try:
+        devnull = os.open(os.devnull, os.O_WRONLY)
+        os.dup2(devnull, sys.stdout.fileno())
+        os.close(devnull)
+    except (OSError, ValueError):
+        # the output is not a file, e.g., in the tests
+        pass
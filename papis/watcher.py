@@ -0,0 +1,332 @@
+"""Keep the database of a library up to date with the changes done outside
+of papis, e.g., editing an info file, ``git pull`` or ``rsync``.
+
+The folders of the library are watched with inotify on linux, and by
+looking at the modification times of the info files every
+``watch-poll-interval`` seconds elsewhere, or if ``watch-polling`` is set.
+Hidden folders, e.g. ``.git``, are not watched. The changes coming in bursts,
+e.g. from a ``git checkout``, are collected until nothing changes for
+``watch-debounce`` seconds and then applied at once to the database with
+:meth:`papis.database.base.Database.update_folders`.
+
+The watcher runs with ``papis watch``, or inside the daemon with
+``papis serve --watch``. From python,
+
+.. code:: python
+
+    import papis.watcher
+
+    # blocks until stop is set
+    papis.watcher.watch('papers', stop=stop_event)
+
+"""
+import logging
+import os
+import select
+import struct
+import sys
+import time
+
+import papis.config
+import papis.utils
+
+logger = logging.getLogger('watcher')
+
+# inotify(7) events
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+
+_EVENT_HEADER = struct.Struct('iIII')
+
+#: Events watched on every folder.
+WATCH_MASK = (
+    IN_CLOSE_WRITE | IN_ATTRIB | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE |
+    IN_DELETE | IN_DELETE_SELF | IN_ONLYDIR
+)
+
+
+def _walk_folders(directory):
+    """Iterate over ``directory`` and all the folders in it, except the
+    hidden ones.
+    """
+    for root, dirnames, filenames in os.walk(directory):
+        dirnames[:] = [d for d in dirnames if not d.startswith('.')]
+        yield root
+
+
+class Watcher(object):
+    """Watcher of the folders of a library, the subclasses find the paths
+    that changed in :meth:`wait`.
+
+    :param directories: Folders of the library
+    :type  directories: list
+    """
+
+    def __init__(self, directories):
+        self.directories = list(directories)
+        self.info_name = papis.config.get('info-name')
+
+    def wait(self, timeout=None):
+        """Wait until something changes in the folders.
+
+        :param timeout: Seconds to wait, forever if it is None
+        :type  timeout: float
+        :returns: Set of changed paths, the folders of the changed info files
+            and the folders that were created or removed, it is empty if
+            nothing changed before the timeout
+        :rtype:  set
+        """
+        raise NotImplementedError('wait not implemented')
+
+    def close(self):
+        pass
+
+
+class InotifyWatcher(Watcher):
+    """Watcher using inotify, it is only available on linux.
+
+    :raises OSError: If inotify is not available or the folders can not
+        be watched, e.g., because of the limit of watches of the user
+    """
+
+    def __init__(self, directories):
+        import ctypes
+        import ctypes.util
+        Watcher.__init__(self, directories)
+        libc = ctypes.CDLL(
+            ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        if not hasattr(libc, 'inotify_init1'):
+            raise OSError('inotify is not available')
+        self._libc = libc
+        self._libc.inotify_add_watch.argtypes = [
+            ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        self._fd = libc.inotify_init1(os.O_CLOEXEC | os.O_NONBLOCK)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+        self._paths = dict()
+        try:
+            for directory in self.directories:
+                self.add_watches(directory)
+        except OSError:
+            self.close()
+            raise
+        logger.debug('Watching {0} folders'.format(len(self._paths)))
+
+    def add_watches(self, directory):
+        """Watch ``directory`` and all the folders in it."""
+        import ctypes
+        for folder in _walk_folders(directory):
+            wd = self._libc.inotify_add_watch(
+                self._fd, os.fsencode(folder), WATCH_MASK)
+            if wd < 0:
+                errno = ctypes.get_errno()
+                raise OSError(
+                    errno, 'Can not watch {0}: {1}'.format(
+                        folder, os.strerror(errno)))
+            self._paths[wd] = folder
+
+    def _read_events(self):
+        try:
+            data = os.read(self._fd, 1 << 16)
+        except BlockingIOError:
+            return
+        offset = 0
+        while offset < len(data):
+            wd, mask, cookie, length = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            name = os.fsdecode(data[offset:offset + length].rstrip(b'\0'))
+            offset += length
+            yield wd, mask, name
+
+    def wait(self, timeout=None):
+        ready, _, _ = select.select([self._fd], [], [], timeout)
+        paths = set()
+        if not ready:
+            return paths
+        for wd, mask, name in self._read_events():
+            if mask & IN_Q_OVERFLOW:
+                logger.warning('Too many changes, looking at everything')
+                paths.update(self.directories)
+                continue
+            if mask & IN_IGNORED:
+                self._paths.pop(wd, None)
+                continue
+            folder = self._paths.get(wd)
+            if folder is None or not name:
+                continue
+            path = os.path.join(folder, name)
+            if mask & IN_ISDIR:
+                if name.startswith('.'):
+                    continue
+                if mask & (IN_CREATE | IN_MOVED_TO):
+                    try:
+                        self.add_watches(path)
+                    except OSError as e:
+                        logger.warning(e)
+                paths.add(path)
+            elif name == self.info_name:
+                paths.add(folder)
+        return paths
+
+    def close(self):
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+
+class PollingWatcher(Watcher):
+    """Watcher looking at the modification times of the info files every
+    ``watch-poll-interval`` seconds.
+    """
+
+    def __init__(self, directories):
+        Watcher.__init__(self, directories)
+        self.interval = papis.config.getfloat('watch-poll-interval')
+        self._snapshot = self.get_snapshot()
+
+    def get_snapshot(self):
+        """Get the modification times and sizes of the info files of the
+        library.
+
+        :returns: Dictionary with the folder of every info file and its
+            modification time and size
+        :rtype:  dict
+        """
+        snapshot = dict()
+        for directory in self.directories:
+            for folder in _walk_folders(directory):
+                try:
+                    stat = os.stat(os.path.join(folder, self.info_name))
+                except OSError:
+                    continue
+                snapshot[folder] = (stat.st_mtime_ns, stat.st_size)
+        return snapshot
+
+    def wait(self, timeout=None):
+        end = None if timeout is None else time.monotonic() + timeout
+        while True:
+            delay = self.interval
+            if end is not None:
+                delay = min(delay, max(0, end - time.monotonic()))
+            time.sleep(delay)
+            snapshot = self.get_snapshot()
+            paths = set(
+                folder for folder in set(snapshot) | set(self._snapshot)
+                if snapshot.get(folder) != self._snapshot.get(folder)
+            )
+            self._snapshot = snapshot
+            if paths or (end is not None and time.monotonic() >= end):
+                return paths
+
+
+def get_watcher(directories):
+    """Get a watcher for the folders of a library, an
+    :class:`InotifyWatcher` if it is possible and a :class:`PollingWatcher`
+    otherwise.
+
+    :param directories: Folders of the library
+    :type  directories: list
+    :returns: Watcher
+    :rtype:  Watcher
+    """
+    if sys.platform.startswith('linux') and \
+            not papis.config.getboolean('watch-polling'):
+        try:
+            return InotifyWatcher(directories)
+        except OSError as e:
+            logger.warning(
+                'Could not use inotify ({0}), polling instead'.format(e))
+    return PollingWatcher(directories)
+
+
+def get_changes(watcher, debounce=None, timeout=None):
+    """Wait for changes, and once something has changed, keep collecting
+    the changes until nothing changes for ``debounce`` seconds.
+
+    :param watcher: Watcher
+    :type  watcher: Watcher
+    :param debounce: Seconds without changes, by default ``watch-debounce``
+    :type  debounce: float
+    :param timeout: Seconds to wait for the first change
+    :type  timeout: float
+    :returns: Set of changed paths, see :meth:`Watcher.wait`
+    :rtype:  set
+    """
+    if debounce is None:
+        debounce = papis.config.getfloat('watch-debounce')
+    paths = watcher.wait(timeout)
+    while paths:
+        more = watcher.wait(debounce)
+        if not more:
+            break
+        paths |= more
+    return paths
+
+
+def apply_changes(database, paths):
+    """Update the documents of ``database`` that are in the changed
+    ``paths`` or in folders inside of them, see
+    :meth:`papis.database.base.Database.update_folders`.
+
+    :param database: Database of the library
+    :type  database: papis.database.base.Database
+    :param paths: Changed paths, see :meth:`Watcher.wait`
+    :type  paths: set
+    :returns: Folders of the documents that were updated
+    :rtype:  list
+    """
+    known = [d.get_main_folder() for d in database.get_all_documents()]
+    folders = set()
+    for path in paths:
+        prefix = os.path.join(path, '')
+        folders.update(
+            folder for folder in known
+            if folder == path or folder.startswith(prefix)
+        )
+        if os.path.isdir(path):
+            folders.update(papis.utils.get_folders(path))
+    folders = sorted(folders)
+    if folders:
+        logger.info('Updating {0} documents'.format(len(folders)))
+        database.update_folders(folders)
+    return folders
+
+
+def watch(library=None, stop=None, lock=None, timeout=1):
+    """Keep the database of ``library`` up to date until ``stop`` is set.
+
+    :param library: Library, by default the current library
+    :type  library: papis.library.Library or str
+    :param stop: Event stopping the watcher, it watches forever if it is None
+    :type  stop: threading.Event
+    :param lock: Lock held while the database is updated, e.g., so that
+        it is not queried at the same time
+    :type  lock: threading.Lock
+    :param timeout: Seconds between the checks of ``stop``
+    :type  timeout: float
+    """
+    import threading
+    import papis.database
+    lock = lock or threading.Lock()
+    debounce = papis.config.getfloat('watch-debounce')
+    database = papis.database.get(library)
+    watcher = get_watcher(database.get_dirs())
+    logger.info('Watching library {0}'.format(database.get_lib()))
+    try:
+        while stop is None or not stop.is_set():
+            paths = get_changes(watcher, debounce, timeout)
+            if not paths:
+                continue
+            with lock:
+                apply_changes(papis.database.get(database.lib), paths)
+    finally:
+        watcher.close()
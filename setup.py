@@ -140,6 +140,11 @@ setup(
             'json=papis.commands.export:export_to_json',
             'yaml=papis.commands.export:export_to_yaml',
         ],
+        'papis.database': [
+            'papis=papis.database.cache:Database',
+            'whoosh=papis.database.whoosh:Database',
+            'sqlite=papis.database.sqlite:Database',
+        ],
         'papis.picker': [
             'papis=papis.pick:papis_pick',
         ],
@@ -158,7 +163,9 @@ setup(
             "rename=papis.commands.rename:cli",
             "rm=papis.commands.rm:cli",
             "run=papis.commands.run:cli",
+            "serve=papis.commands.serve:cli",
             "update=papis.commands.update:cli",
+            "watch=papis.commands.watch:cli",
         ],
         'papis.downloader': [
             "acs=papis.downloaders.acs:Downloader",
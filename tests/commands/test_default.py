@@ -1,5 +1,18 @@
+import json
+import os
+import pstats
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import papis.commands
+import papis.config
+import papis.database
 import tests.cli
-from papis.commands.default import run
+from papis.commands.default import run, MultiCommand
 
 
 class TestCli(tests.cli.TestCli):
@@ -16,8 +29,134 @@ class TestCli(tests.cli.TestCli):
         ])
         self.assertTrue(result.exit_code == 0)
 
+    def invoke_on_test_library(self, args):
+        library = papis.config.get_lib()
+        try:
+            return self.invoke(['--lib', library.paths[0]] + args)
+        finally:
+            papis.config.set_lib(library)
+
+    def test_timings(self):
+        # the documents have to be loaded
+        papis.database.clear_cached()
+        result = self.invoke_on_test_library(
+            ['--timings', 'list', 'krishnamurti'])
+        self.assertEqual(result.exit_code, 0)
+        phases = [line.split()[0] for line in result.output.splitlines()]
+        for phase in ['phase', 'config', 'database', 'filter', 'total']:
+            self.assertIn(phase, phases)
+
+    def test_profile(self):
+        path = os.path.join(tempfile.mkdtemp(), 'papis.prof')
+        result = self.invoke_on_test_library(['--profile', path, 'list'])
+        self.assertEqual(result.exit_code, 0)
+        stats = pstats.Stats(path)
+        self.assertTrue(any(
+            function.endswith('list.py') for function, _, _ in stats.stats))
+
+    def test_metrics_file(self):
+        path = os.path.join(tempfile.mkdtemp(), 'metrics.json')
+        for i in range(2):
+            result = self.invoke_on_test_library(
+                ['--metrics-file', path, 'list'])
+            self.assertEqual(result.exit_code, 0)
+        with open(path) as fd:
+            lines = [json.loads(line) for line in fd]
+        self.assertEqual(len(lines), 2)
+        self.assertEqual(lines[0]['command'], 'list')
+        metrics = list(lines[0]['databases'].values())[0]
+        self.assertTrue(metrics['query_results'] > 0)
+
     # def test_set(self):
         # result = self.invoke([
             # '--set', 'something', '42'
         # ])
         # self.assertTrue(result.exit_code == 0)
+
+
+class TestRegistry(unittest.TestCase):
+
+    def setUp(self):
+        self.path = os.path.join(tempfile.mkdtemp(), 'commands.json')
+        self.patcher = patch(
+            'papis.commands.get_registry_path', lambda: self.path)
+        self.patcher.start()
+
+    def tearDown(self):
+        self.patcher.stop()
+
+    def test_reuse(self):
+        registry = papis.commands.get_registry()
+        self.assertTrue(os.path.exists(self.path))
+        self.assertEqual(
+            registry['add']['entry_point'], 'papis.commands.add:cli')
+        with patch('papis.commands.make_registry') as make_registry:
+            self.assertEqual(papis.commands.get_registry(), registry)
+            self.assertFalse(make_registry.called)
+
+    def test_invalidate(self):
+        papis.commands.get_registry()
+        key = papis.commands.get_registry_key()
+        key[0] = 'another version'
+        with patch('papis.commands.get_registry_key', lambda: key):
+            with patch(
+                    'papis.commands.make_registry',
+                    return_value=dict()) as make_registry:
+                self.assertEqual(papis.commands.get_registry(), dict())
+                self.assertTrue(make_registry.called)
+
+    def test_new_script(self):
+        scripts = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, scripts)
+        with patch('papis.config.get_scripts_folder', lambda: scripts):
+            with patch('papis.commands.get_external_scripts') as external:
+                papis.commands.get_registry_key()
+                # the folders are not listed to make the key
+                self.assertFalse(external.called)
+            # the modification time might not change in the same tick
+            os.utime(scripts, (0, 0))
+            key = papis.commands.get_registry_key()
+            with open(os.path.join(scripts, 'papis-hello'), 'w'):
+                pass
+            self.assertNotEqual(papis.commands.get_registry_key(), key)
+
+    def test_script_overrides_command(self):
+        scripts = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, scripts)
+        path = os.path.join(scripts, 'papis-add')
+        with open(path, 'w') as fd:
+            fd.write('#!/bin/sh\n# papis-short-help: My own add\n')
+        os.chmod(path, 0o755)
+        with patch('papis.config.get_scripts_folder', lambda: scripts):
+            registry = papis.commands.make_registry()
+        self.assertEqual(registry['add']['path'], path)
+        self.assertIsNone(registry['add']['entry_point'])
+        self.assertEqual(
+            registry['open']['entry_point'], 'papis.commands.open:cli')
+
+    def test_stale_entry_point(self):
+        registry = papis.commands.get_registry()
+        registry['add']['entry_point'] = 'papis.commands.nonexistent:cli'
+        mc = MultiCommand()
+        mc._scripts = registry
+        self.assertEqual(mc.get_command(None, 'add').name, 'add')
+        self.assertEqual(
+            mc.scripts['add']['entry_point'], 'papis.commands.add:cli')
+
+    def test_only_invoked_command_is_imported(self):
+        code = (
+            'import sys\n'
+            'import papis.commands\n'
+            'papis.commands.get_registry_path = lambda: {0!r}\n'
+            'from papis.commands.default import MultiCommand\n'
+            'MultiCommand().get_command(None, "list")\n'
+            'print(" ".join(m for m in sys.modules\n'
+            '               if m.startswith("papis.commands.")))\n'
+        ).format(self.path)
+        # the first run makes the registry for the sys.path of python
+        subprocess.check_output([sys.executable, '-c', code])
+        output = subprocess.check_output(
+            [sys.executable, '-c', code], universal_newlines=True)
+        self.assertEqual(
+            set(output.split()),
+            {'papis.commands.default', 'papis.commands.list'})
@@ -58,6 +58,10 @@ class TestCli(tests.cli.TestCli):
         self.do_test_cli_function_exists()
         self.do_test_help()
 
+    def test_format(self):
+        result = self.invoke(['krishnamurti', '--format', 'nope'])
+        self.assertEqual(result.exit_code, 2)
+
     def test_json(self):
 
         # output stdout
@@ -1,9 +1,11 @@
 import os
+import time
 import unittest
+import unittest.mock
 import tests
 import papis.config
 import papis.database
-from papis.commands.list import run
+from papis.commands.list import run, iter_run, echo_objects, run_libraries
 
 
 class Test(unittest.TestCase):
@@ -48,3 +50,82 @@ class Test(unittest.TestCase):
         assert(isinstance(folders, list))
         for f in folders:
             assert(os.path.exists(f))
+
+    def test_list_invalid_sort(self):
+        from click.testing import CliRunner
+        from papis.commands.list import cli
+        result = CliRunner().invoke(cli, ['--sort', 'year:foo'])
+        self.assertEqual(result.exit_code, 2)
+        self.assertIn("Invalid sort order 'foo'", result.output)
+
+    def test_list_negative_limit(self):
+        from click.testing import CliRunner
+        from papis.commands.list import cli
+        result = CliRunner().invoke(cli, ['--limit', '-1'])
+        self.assertEqual(result.exit_code, 2)
+
+    def test_list_sort_limit(self):
+        docs = run(
+            query=papis.database.get_all_query_string(),
+            sort='year:desc',
+            limit=2
+        )
+        assert(len(docs) == 2)
+        assert(int(docs[0]['year']) >= int(docs[1]['year']))
+
+    def test_iter_run(self):
+        folders = run(
+            query=papis.database.get_all_query_string(),
+            folders=True
+        )
+        self.assertEqual(
+            list(iter_run(
+                query=papis.database.get_all_query_string(),
+                folders=True
+            )),
+            folders
+        )
+
+    def test_echo_objects_broken_pipe(self):
+        closed = []
+
+        def objects():
+            try:
+                for i in range(10):
+                    yield i
+            finally:
+                closed.append(True)
+
+        def echo(message):
+            raise BrokenPipeError()
+
+        with unittest.mock.patch('click.echo', echo), \
+                unittest.mock.patch('papis.utils.discard_stdout') as discard:
+            echo_objects(objects())
+        self.assertEqual(closed, [True])
+        self.assertTrue(discard.called)
+
+    def test_echo_objects_in_time(self):
+        written = []
+
+        def objects():
+            yield 'first'
+            # a slow search, the first line is written in the meantime
+            time.sleep(1)
+            self.assertEqual(written, ['first'])
+            yield 'second'
+
+        with unittest.mock.patch('click.echo', written.append):
+            echo_objects(objects())
+        self.assertEqual(written, ['first', 'second'])
+
+    def test_run_libraries(self):
+        lib = papis.config.get_lib()
+        folders = run(query=papis.database.get_all_query_string(),
+                      folders=True)
+        self.assertEqual(
+            run_libraries([lib, lib], folders=True), folders
+        )
+        lines = run_libraries([lib], fmt='{doc[title]}', limit=1)
+        self.assertEqual(len(lines), 1)
+        self.assertTrue(lines[0].startswith(lib.name + '\t'))
@@ -10,6 +10,7 @@ import papis.document
 from papis.commands.open import run, cli
 import re
 import os
+from unittest.mock import patch
 
 
 class TestRun(unittest.TestCase):
@@ -31,6 +32,28 @@ class TestCli(tests.cli.TestCli):
         self.do_test_cli_function_exists()
         self.do_test_help()
 
+    def test_relevance_only_with_limit(self):
+        db = papis.database.get()
+        for limit, sort in [('0', None), ('5', 'relevance')]:
+            papis.config.set('pick-query-limit', limit)
+            with patch.object(db, 'iter_query', return_value=[]) as query:
+                self.invoke(['einstein'])
+            query.assert_called_once_with(
+                'einstein', limit=int(limit) or None, sort=sort)
+        papis.config.set('pick-query-limit', '0')
+
+    def test_cancel_pick(self):
+        db = papis.database.get()
+        for documents, warned in [([], True), (db.get_all_documents(), False)]:
+            with patch.object(db, 'iter_query', return_value=documents), \
+                    patch('papis.api.pick_doc', return_value=None), \
+                    patch('papis.commands.open.logging') as logging:
+                result = self.invoke(['einstein'])
+            self.assertEqual(result.exit_code, 0)
+            # cancelling the picker is not a query without documents
+            self.assertEqual(
+                logging.getLogger.return_value.warning.called, warned)
+
     def test_tool(self):
         result = self.invoke([
             'doc without files'
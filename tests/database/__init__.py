@@ -4,12 +4,62 @@ import papis.api
 import papis.config
 import papis.document
 import papis.database
+import papis.library
 import unittest
 import tests
 import tempfile
+import time
+import shutil
+from unittest.mock import patch
+
+
+def create_synthetic_library(size, test):
+    """Create a library with ``size`` documents without files, its folder
+    is removed when ``test`` is done.
+
+    :param test: Test case using the library
+    :type  test: unittest.TestCase
+    :returns: Library object
+    :rtype:  papis.library.Library
+    """
+    folder = tempfile.mkdtemp(prefix='papis-test-synthetic-library-')
+    test.addCleanup(shutil.rmtree, folder, ignore_errors=True)
+    for i in range(size):
+        doc = papis.document.from_data({
+            'author': 'Author{0} Surname{1}'.format(i, i % 7),
+            'title': 'Synthetic title number {0} tag{1}'.format(i, i % 10),
+            'year': str(1900 + i % 120),
+            'doi': '10.1000/synthetic.{0}'.format(i),
+        })
+        doc.set_folder(os.path.join(folder, str(i)))
+        os.makedirs(doc.get_main_folder())
+        doc.save()
+    return papis.library.Library(
+        'synthetic-{0}'.format(os.path.basename(folder)), [folder]
+    )
 
 
 class DatabaseTest(unittest.TestCase):
+    """Conformance tests that every database backend should pass.
+    To test a new backend, subclass it and set ``database-backend``
+    before calling :meth:`DatabaseTest.setUpClass`.
+
+    The timing budgets are given in seconds for a library of
+    ``timing_library_size`` documents. They depend on the machine, so they
+    are only checked if the environment variable ``PAPIS_TEST_TIMINGS``
+    is set.
+    """
+
+    check_timings = bool(os.environ.get('PAPIS_TEST_TIMINGS'))
+    timing_library_size = 300
+    max_indexing_time = 20.0
+    max_loading_time = 2.0
+    max_query_time = 1.0
+    max_update_time = 1.0
+
+    #: Query for the documents with a year greater or equal than a number
+    #: in the query language of the backend
+    year_range_query_format = 'year >= {0}'
 
     @classmethod
     def setUpClass(cls):
@@ -123,6 +173,283 @@ class DatabaseTest(unittest.TestCase):
     def test_backend_name(self):
         self.assertTrue(papis.database.get().get_backend_name() is not None)
 
+    def test_backend_registered(self):
+        self.assertTrue(
+            papis.config.get('database-backend') in
+            papis.database.get_available_backends()
+        )
+
+    def test_query_dict_not_found(self):
+        database = papis.database.get()
+        docs = database.query_dict({'title': 'this title does not exist'})
+        self.assertEqual(len(docs), 0)
+
+    def test_query_limit(self):
+        database = papis.database.get()
+        docs = database.query(database.get_all_query_string(), limit=1)
+        self.assertEqual(len(docs), 1)
+        # a negative limit is not "no limit" in any backend
+        with self.assertRaises(ValueError):
+            database.query(database.get_all_query_string(), limit=-1)
+        with self.assertRaises(ValueError):
+            database.iter_query(database.get_all_query_string(), limit=-1)
+        docs = database.query(
+            database.get_all_query_string(), limit=1, sort='relevance'
+        )
+        self.assertEqual(len(docs), 1)
+
+    def test_query_relevance(self):
+        database = papis.database.get()
+        query = database.get_all_query_string()
+        self.assertEqual(
+            sorted(d.get_main_folder() for d in database.query(query)),
+            sorted(
+                d.get_main_folder()
+                for d in database.query(query, sort='relevance')
+            )
+        )
+
+    def test_query_sort(self):
+        import papis.database.base
+        database = papis.database.get()
+        query = database.get_all_query_string()
+        docs = database.query(query, sort='year')
+        self.assertEqual(len(docs), len(database.query(query)))
+        years = [
+            papis.database.base.get_sort_value(d['year'])
+            for d in docs if d['year']
+        ]
+        self.assertEqual(years, sorted(years))
+        docs = database.query(query, sort='year:desc', limit=1)
+        self.assertEqual(len(docs), 1)
+        self.assertEqual(
+            papis.database.base.get_sort_value(docs[0]['year']),
+            max(years)
+        )
+
+    def get_database_with_years(self, years):
+        folder = tempfile.mkdtemp(prefix='papis-test-sort-library-')
+        self.addCleanup(shutil.rmtree, folder, ignore_errors=True)
+        for year in years:
+            doc = papis.document.from_data(dict(title='Sort', year=year))
+            doc.set_folder(os.path.join(folder, year))
+            os.makedirs(doc.get_main_folder())
+            doc.save()
+        library = papis.library.Library(
+            'sort-{0}'.format(os.path.basename(folder)), [folder]
+        )
+        return papis.database.get(library)
+
+    def test_query_sort_numbers(self):
+        database = self.get_database_with_years(['10', '2', '100', '9'])
+        query = database.get_all_query_string()
+        self.assertEqual(
+            [d['year'] for d in database.query(query, sort='year')],
+            ['2', '9', '10', '100']
+        )
+        self.assertEqual(
+            [d['year'] for d in database.query(query, sort='year:desc')],
+            ['100', '10', '9', '2']
+        )
+        self.assertEqual(
+            [d['year'] for d in database.query(
+                query, sort='year', limit=2)],
+            ['2', '9']
+        )
+
+    def test_query_sort_mixed(self):
+        database = self.get_database_with_years(['10', 'unknown', '2', '100'])
+        query = database.get_all_query_string()
+        # the values that are not numbers come last in both directions
+        self.assertEqual(
+            [d['year'] for d in database.query(query, sort='year')],
+            ['2', '10', '100', 'unknown']
+        )
+        self.assertEqual(
+            [d['year'] for d in database.query(query, sort='year:desc')],
+            ['100', '10', '2', 'unknown']
+        )
+        self.assertEqual(
+            [d['year'] for d in database.query(
+                query, sort='year:desc', limit=3)],
+            ['100', '10', '2']
+        )
+
+    def test_iter_query(self):
+        database = papis.database.get()
+        query = database.get_all_query_string()
+        for sort in [None, 'year']:
+            self.assertEqual(
+                [d.get_main_folder() for d in database.iter_query(
+                    query, sort=sort)],
+                [d.get_main_folder() for d in database.query(
+                    query, sort=sort)]
+            )
+        documents = database.iter_query(query)
+        self.assertTrue(next(documents) is not None)
+        if hasattr(documents, 'close'):
+            documents.close()
+
+    def test_query_range(self):
+        import papis.docmatcher
+        database = papis.database.get()
+        docs = database.get_all_documents()
+        years = sorted(
+            int(d['year']) for d in docs if str(d['year']).isdigit()
+        )
+        self.assertTrue(len(years) > 1)
+        year = years[len(years) // 2]
+        value_range = papis.docmatcher.get_range(['year', '>=', str(year)])
+        self.assertEqual(
+            sorted(
+                d.get_main_folder()
+                for d in database.query(
+                    self.year_range_query_format.format(year)
+                )
+            ),
+            sorted(
+                d.get_main_folder() for d in docs
+                if papis.docmatcher.match_range(d, value_range)
+            )
+        )
+
+    def test_metrics(self):
+        import papis.database.base
+        library = create_synthetic_library(20, self)
+        database = papis.database.get(library)
+        database.get_all_documents()
+        metrics = database.get_metrics()
+        self.assertEqual(metrics.get('cache_misses'), 1)
+        self.assertEqual(metrics['index_build']['count'], 1)
+
+        papis.database.clear_cached()
+        database = papis.database.get(library)
+        recorded = []
+        papis.database.base.metrics_callbacks.append(
+            lambda db, name, value: recorded.append((db, name)))
+        try:
+            docs = database.query(database.get_all_query_string())
+        finally:
+            papis.database.base.metrics_callbacks.pop()
+        self.assertEqual(len(docs), 20)
+        metrics = database.get_metrics()
+        self.assertEqual(metrics.get('cache_hits'), 1)
+        self.assertEqual(metrics['query']['count'], 1)
+        self.assertEqual(metrics['query_results'], 20)
+        self.assertTrue(metrics['documents_loaded'] >= 20)
+        self.assertIn((database, 'query'), recorded)
+        self.assertEqual(papis.database.get_metrics()[library.name], metrics)
+
+    def test_query_libraries(self):
+        libraries = [
+            create_synthetic_library(5, self),
+            create_synthetic_library(3, self)
+        ]
+        for library in libraries:
+            papis.config.set('dir', library.paths[0], section=library.name)
+            self.addCleanup(
+                papis.config.get_configuration().remove_section,
+                library.name
+            )
+        tagged = papis.database.query_libraries(libraries)
+        self.assertEqual(
+            [name for name, _ in tagged],
+            [libraries[0].name] * 5 + [libraries[1].name] * 3
+        )
+        for name, document in tagged:
+            self.assertTrue(
+                document.get_main_folder().startswith(
+                    papis.config.get_lib_from_name(name).paths[0]))
+        tagged = papis.database.query_libraries(
+            [library.name for library in libraries], sort='year:desc',
+            limit=4
+        )
+        self.assertEqual(len(tagged), 4)
+        years = [int(document['year']) for _, document in tagged]
+        self.assertEqual(years, sorted(years, reverse=True))
+
+    def test_query_libraries_without_fork(self):
+        libraries = [
+            create_synthetic_library(5, self),
+            create_synthetic_library(3, self)
+        ]
+        # the worker threads must not fork process pools
+        with patch("multiprocessing.Pool", side_effect=AssertionError):
+            tagged = papis.database.query_libraries(
+                libraries, query_string='synthetic')
+        self.assertEqual(len(tagged), 8)
+
+    def test_contains(self):
+        library = create_synthetic_library(2, self)
+        database = papis.database.get(library)
+        document = database.get_all_documents()[0]
+        self.assertTrue(database.contains(document))
+        database.delete(document)
+        self.assertFalse(database.contains(document))
+
+    def test_update_folders(self):
+        library = create_synthetic_library(5, self)
+        database = papis.database.get(library)
+        self.assertEqual(len(database.get_all_documents()), 5)
+        folder = library.paths[0]
+        # a document is edited, one removed and one added outside of papis
+        edited = papis.document.from_folder(os.path.join(folder, '0'))
+        edited['title'] = 'Edited outside of papis'
+        edited.save()
+        shutil.rmtree(os.path.join(folder, '1'))
+        added = papis.document.from_data({'title': 'Added outside of papis'})
+        added.set_folder(os.path.join(folder, 'new'))
+        os.makedirs(added.get_main_folder())
+        added.save()
+        database.update_folders(
+            [os.path.join(folder, name) for name in ['0', '1', 'new']])
+        titles = [d['title'] for d in database.get_all_documents()]
+        self.assertEqual(len(titles), 5)
+        self.assertIn('Edited outside of papis', titles)
+        self.assertIn('Added outside of papis', titles)
+        self.assertNotIn(
+            os.path.join(folder, '1'),
+            [d.get_main_folder() for d in database.get_all_documents()]
+        )
+        papis.database.clear_cached()
+
+    def assertTimeWithin(self, begin_t, budget):
+        if self.check_timings:
+            self.assertLess(time.time() - begin_t, budget)
+
+    def test_timings(self):
+        library = create_synthetic_library(self.timing_library_size, self)
+
+        begin_t = time.time()
+        database = papis.database.get(library)
+        self.assertTimeWithin(begin_t, self.max_indexing_time)
+
+        # a fresh object must reuse the index or cache built above
+        papis.database.clear_cached()
+        begin_t = time.time()
+        database = papis.database.get(library)
+        docs = database.get_all_documents()
+        self.assertTimeWithin(begin_t, self.max_loading_time)
+        self.assertEqual(len(docs), self.timing_library_size)
+
+        begin_t = time.time()
+        docs = database.query_dict({'doi': '10.1000/synthetic.42'})
+        self.assertTimeWithin(begin_t, self.max_query_time)
+        self.assertEqual(len(docs), 1)
+
+        begin_t = time.time()
+        docs[0]['title'] = 'Updated synthetic title'
+        docs[0].save()
+        database.update(docs[0])
+        self.assertTimeWithin(begin_t, self.max_update_time)
+
+        begin_t = time.time()
+        docs = database.query(database.get_all_query_string())
+        self.assertTimeWithin(begin_t, self.max_query_time)
+        self.assertEqual(len(docs), self.timing_library_size)
+
+        papis.database.clear_cached()
+
     def test_backend(self):
         self.assertEqual(
             papis.config.get('database-backend'),
@@ -1,5 +1,7 @@
 import papis.library
+import papis.database
 import papis.database.base
+import papis.database.cache
 
 
 def test_main_database_methods():
@@ -87,3 +89,15 @@ def test_main_database_methods():
     else:
         assert(False)
 
+
+def test_get_backend():
+    assert(
+        papis.database.get_backend('papis') is papis.database.cache.Database
+    )
+    assert('papis' in papis.database.get_available_backends())
+    try:
+        papis.database.get_backend('this backend does not exist')
+    except Exception as e:
+        assert('No valid database type' in str(e))
+    else:
+        assert(False)
@@ -2,6 +2,7 @@ import tests.database
 import papis.config
 import papis.database
 import os
+import papis.library
 
 class Test(tests.database.DatabaseTest):
 
@@ -18,6 +19,52 @@ class Test(tests.database.DatabaseTest):
         docs = database.query('.')
         self.assertTrue(len(docs) > 0)
 
+    def test_query_relevance_order(self):
+        database = papis.database.get()
+        docs = database.query('author = r', sort='relevance')
+        self.assertTrue(len(docs) > 1)
+        positions = [
+            d['author'].lower().index('r') for d in docs
+        ]
+        self.assertEqual(positions, sorted(positions))
+        docs = database.query('author = r', limit=1, sort='relevance')
+        self.assertEqual(len(docs), 1)
+        self.assertEqual(docs[0]['author'].lower().index('r'), positions[0])
+
+    def test_sorted_index(self):
+        db = papis.database.get()
+        docs = db.query(db.get_all_query_string(), sort='title')
+        self.assertTrue(os.path.exists(db._get_sort_index_file_path()))
+        db.sort_indices = None
+        # Now the sorted index is read again from disk
+        self.assertEqual(
+            db.query(db.get_all_query_string(), sort='title'), docs
+        )
+        db.save()
+        self.assertFalse(os.path.exists(db._get_sort_index_file_path()))
+
+    def test_query_range_sorted(self):
+        import papis.docmatcher
+        db = papis.database.get()
+        query = 'year = 1000..2100'
+        value_range = papis.docmatcher.get_range(['year', '=', '1000..2100'])
+        expected = [
+            d for d in db.query(db.get_all_query_string(), sort='year:desc')
+            if papis.docmatcher.match_range(d, value_range)
+        ]
+        self.assertTrue(len(expected) > 1)
+        self.assertEqual(db.query(query, sort='year:desc'), expected)
+        self.assertEqual(db.query(query, sort='year:desc', limit=1),
+                         expected[:1])
+        # the range and the rest of the query are combined
+        author = expected[0]['author']
+        self.assertEqual(
+            [d.get_main_folder()
+             for d in db.query(query + ' author = "' + author + '"')],
+            [d.get_main_folder() for d in db.get_documents()
+             if d in expected and d['author'] == author]
+        )
+
     def test_cache_path(self):
         database = papis.database.get()
         assert(os.path.exists(database._get_cache_file_path()))
@@ -31,6 +78,26 @@ class Test(tests.database.DatabaseTest):
         Nf = len(db.get_documents())
         self.assertEqual(Ni, Nf)
 
+    def test_save_interrupted(self):
+        db = papis.database.get()
+        db.save()
+        path = db._get_cache_file_path()
+        with open(path, 'rb') as fd:
+            before = fd.read()
+        # a lambda cannot be pickled, the writing fails half-way
+        db.get_documents().append(lambda: None)
+        try:
+            self.assertRaises(Exception, db.save)
+        finally:
+            db.get_documents().pop()
+        with open(path, 'rb') as fd:
+            self.assertEqual(fd.read(), before)
+        self.assertEqual(
+            [name for name in os.listdir(os.path.dirname(path))
+             if name.startswith(os.path.basename(path) + '.')],
+            []
+        )
+
     def test_failed_location_in_cache(self):
         db = papis.database.get()
         doc = db.get_documents()[0]
@@ -41,3 +108,55 @@ class Test(tests.database.DatabaseTest):
             self.assertTrue(True)
         else:
             self.assertTrue(False)
+
+    def test_refresh(self):
+        db = papis.database.get()
+        docs = db.get_documents()
+        other = papis.database.get_backend('papis')(db.lib)
+        other.get_documents().pop()
+        other.save()
+        # the database forgets the documents saved by someone else
+        self.assertEqual(papis.database.get(), db)
+        self.assertEqual(len(db.get_documents()), len(docs) - 1)
+        db.get_documents().append(docs[-1])
+        db.save()
+        db.refresh()
+        self.assertEqual(len(db.get_documents()), len(docs))
+
+    def test_shards(self):
+        libraries = [
+            tests.database.create_synthetic_library(4, self),
+            tests.database.create_synthetic_library(3, self)
+        ]
+        paths = [library.paths[0] for library in libraries]
+        library = papis.library.Library('test-shards', paths)
+        db = papis.database.get(library)
+        self.assertEqual(len(db.get_documents()), 7)
+        self.assertEqual(db.get_metrics()['cache_misses'], 2)
+        shards = [db._get_cache_file_path(path) for path in paths]
+        for shard in shards:
+            self.assertTrue(os.path.exists(shard))
+
+        # only the cache of the folder of the document is written
+        mtime = os.stat(shards[1]).st_mtime_ns
+        doc = [
+            d for d in db.get_documents()
+            if d.get_main_folder().startswith(paths[0])
+        ][0]
+        doc['title'] = 'Changed title'
+        db.update(doc)
+        self.assertEqual(os.stat(shards[1]).st_mtime_ns, mtime)
+
+        # the caches are shared with other libraries with the same folders
+        papis.database.clear_cached()
+        reordered = papis.database.get(
+            papis.library.Library('test-shards-reordered', paths[::-1]))
+        self.assertEqual(len(reordered.get_documents()), 7)
+        self.assertEqual(reordered.get_metrics()['cache_hits'], 2)
+        self.assertNotIn('cache_misses', reordered.get_metrics())
+        self.assertIn(
+            'Changed title', [d['title'] for d in reordered.get_documents()]
+        )
+        self.assertEqual(
+            len(papis.database.get(libraries[1]).get_documents()), 3
+        )
@@ -0,0 +1,84 @@
+import threading
+import tests.database
+import papis.config
+import papis.database
+
+
+class Test(tests.database.DatabaseTest):
+
+    @classmethod
+    def setUpClass(cls):
+        papis.config.set('database-backend', 'sqlite')
+        tests.database.DatabaseTest.setUpClass()
+
+    def test_backend_name(self):
+        self.assertTrue(papis.config.get('database-backend') == 'sqlite')
+
+    def test_query(self):
+        database = papis.database.get()
+        docs = database.query('.')
+        self.assertTrue(len(docs) > 0)
+
+    def test_query_language(self):
+        database = papis.database.get()
+        docs = database.get_all_documents()
+
+        def folders(documents):
+            return sorted(d.get_main_folder() for d in documents)
+
+        self.assertEqual(
+            folders(database.query('author = popper')),
+            folders(d for d in docs if 'Popper' in d['author'])
+        )
+        self.assertEqual(
+            folders(database.query('turin comp')),
+            folders(d for d in docs if 'Computable' in d['title'])
+        )
+        # volume is not an indexed field, so it is matched by hand
+        self.assertEqual(
+            folders(database.query('volume = s2-42')),
+            folders(d for d in docs if d['volume'] == 's2-42')
+        )
+        self.assertEqual(database.query('author = nobodyknows'), [])
+
+    def test_load_again(self):
+        database = papis.database.get()
+        n = len(database.get_all_documents())
+        database.close()
+        database.initialize()
+        self.assertEqual(len(database.get_all_documents()), n)
+
+    def test_connection_per_thread(self):
+        database = papis.database.get()
+        query = database.get_all_query_string()
+        n = len(database.query(query))
+        # a thread reads the documents while another one writes
+        documents = database.iter_query(query)
+        first = next(documents)
+        connections = []
+
+        def update():
+            connections.append(database.get_connection())
+            database.update(first)
+
+        thread = threading.Thread(target=update)
+        thread.start()
+        thread.join()
+        self.assertEqual(len(connections), 1)
+        self.assertTrue(connections[0] is not database.get_connection())
+        self.assertEqual(len([first] + list(documents)), n)
+
+    def test_reindex_on_schema_change(self):
+        database = papis.database.get()
+        self.assertTrue(database.index_exists())
+        # the other tests use the database with the usual fields
+        self.addCleanup(database.initialize)
+        self.addCleanup(setattr, database, 'fields', database.fields)
+        database.fields = database.fields + ['volume']
+        self.assertFalse(database.index_exists())
+        database.initialize()
+        self.assertTrue(database.index_exists())
+        docs = database.query_dict({'volume': 'I'})
+        self.assertTrue(len(docs) >= 1)
+        for doc in docs:
+            self.assertEqual(doc['volume'], 'I')
@@ -4,6 +4,8 @@ import papis.database
 
 class Test(tests.database.DatabaseTest):
 
+    year_range_query_format = 'year:>={0}'
+
     @classmethod
     def setUpClass(cls):
         papis.config.set('database-backend', 'whoosh')
@@ -18,3 +20,40 @@ class Test(tests.database.DatabaseTest):
         database = papis.database.get()
         docs = database.query('*')
         self.assertTrue(len(docs) > 0)
+
+    def test_schema_changed(self):
+        import whoosh.index
+        from whoosh.fields import TEXT
+        database = papis.database.get()
+        # an index built when year was a text field
+        fields = database.get_schema_init_fields()
+        fields['year'] = TEXT(stored=True)
+        whoosh.index.create_in(
+            database.index_dir, whoosh.fields.Schema(**fields))
+        self.assertIsInstance(database.get_schema()['year'], TEXT)
+        database.initialize()
+        self.assertNotIsInstance(database.get_schema()['year'], TEXT)
+        self.assertTrue(len(database.get_all_documents()) > 0)
+        doc = database.get_all_documents()[0]
+        database.update(doc)
+
+    def test_year_text_fallback(self):
+        database = papis.database.get()
+        doc = database.get_all_documents()[0]
+        year = doc['year']
+        folder = doc.get_main_folder()
+        try:
+            for value, query in [('in press', 'year:"in press"'),
+                                 ('2019a', 'year:2019a')]:
+                doc['year'] = value
+                database.update(doc)
+                self.assertEqual(
+                    [d.get_main_folder() for d in database.query(query)],
+                    [folder])
+                self.assertNotIn(
+                    folder,
+                    [d.get_main_folder()
+                     for d in database.query('year:>=1000')])
+        finally:
+            doc['year'] = year
+            database.update(doc)
@@ -0,0 +1,35 @@
+import filecmp
+import os
+
+import papis.utils
+from benchmarks.library import get_library, make_library, get_folder_name
+from benchmarks.suite import run_suite, compare, select
+
+
+def test_make_library(tmp_path):
+    first = make_library(str(tmp_path / 'first'), 12, seed=3)
+    second = make_library(str(tmp_path / 'second'), 12, seed=3)
+    folders = papis.utils.get_folders(first)
+    assert(len(folders) == 12)
+    comparison = filecmp.dircmp(
+        os.path.join(first, get_folder_name(7)),
+        os.path.join(second, get_folder_name(7)))
+    assert(sorted(comparison.same_files) == ['info.yaml', 'paper.pdf'])
+    documents = papis.utils.folders_to_documents(folders)
+    assert(all(len(d.get_files()) == 1 for d in documents))
+    assert(all(d['author_list'] for d in documents))
+    # a complete library is reused
+    assert(make_library(first, 12, seed=3) == first)
+
+
+def test_run_suite(tmp_path):
+    library_dir = str(tmp_path)
+    names = select(['crawl', 'parse', 'cache.*', 'query.author'])
+    results = run_suite(10, names, repeat=2, library_dir=library_dir)
+    assert(results['size'] == 10)
+    assert(sorted(results['benchmarks']) == sorted(names))
+    assert(all(r['count'] == 2 for r in results['benchmarks'].values()))
+    assert(os.path.exists(get_library(10, folder=library_dir)))
+    rows = compare([results], [results])
+    assert([row[1] for row in rows] == names)
+    assert(all(row[4] == 1 and row[5] == '' for row in rows))
@@ -175,6 +175,21 @@ def test_set_lib_from_real_lib():
     assert get_lib_name() == libname
 
 
+def test_set_libs_from_names():
+    dirs = [tempfile.mkdtemp(), tempfile.mkdtemp()]
+    for name, libdir in zip(['test-libs-a', 'test-libs-b'], dirs):
+        set('dir', libdir, section=name)
+    libs = papis.config.get_libs_from_name('test-libs-a, test-libs-b')
+    assert [lib.name for lib in libs] == ['test-libs-a', 'test-libs-b']
+    all_names = [lib.name for lib in papis.config.get_libs_from_name('all')]
+    assert 'test-libs-a' in all_names and 'test-libs-b' in all_names
+    papis.config.set_libs(libs)
+    assert get_lib_name() == 'test-libs-a'
+    assert papis.config.get_libs() == libs
+    set_lib_from_name('test-libs-b')
+    assert [lib.name for lib in papis.config.get_libs()] == ['test-libs-b']
+
+
 def test_reset_configuration():
     set('test_reset_configuration', 'mordor')
     assert get('test_reset_configuration') == 'mordor'
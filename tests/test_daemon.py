@@ -0,0 +1,132 @@
+import io
+import os
+import socket
+import tempfile
+import threading
+import unittest
+
+import tests
+import papis.config
+import papis.daemon
+import papis.utils
+import papis.commands.list
+
+
+class Test(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        tests.setup_test_library()
+        cls.path = os.path.join(tempfile.mkdtemp(), 'daemon.sock')
+        papis.config.set('daemon-socket', cls.path)
+        papis.config.set('use-daemon', 'True')
+        daemon = papis.daemon.Daemon(cls.path)
+        cls.thread = threading.Thread(target=daemon.serve)
+        cls.thread.start()
+        cls.library = papis.config.get_lib()
+
+    @classmethod
+    def tearDownClass(cls):
+        papis.daemon.request(dict(op='stop'))
+        cls.thread.join()
+        papis.config.set('use-daemon', 'False')
+        assert(not os.path.exists(cls.path))
+        assert(papis.utils.can_fork())
+
+    def run_in_daemon(self, args):
+        stdout, stderr = io.StringIO(), io.StringIO()
+        exit_code = papis.daemon.run_in_daemon(
+            ['--lib', self.library.paths[0]] + args, stdout, stderr)
+        if exit_code is None:
+            return None
+        return dict(
+            exit_code=exit_code,
+            stdout=stdout.getvalue(),
+            stderr=stderr.getvalue()
+        )
+
+    def test_ping(self):
+        self.assertTrue(papis.daemon.is_running())
+        # the daemon never forks process pools
+        self.assertFalse(papis.utils.can_fork())
+        self.assertTrue(papis.daemon.is_running(self.path))
+        self.assertFalse(papis.daemon.is_running(self.path + '-nothing'))
+
+    def test_list(self):
+        answer = self.run_in_daemon(['list', '--format', '{doc[title]}'])
+        self.assertEqual(answer['exit_code'], 0)
+        titles = papis.commands.list.run(
+            query='.', library=self.library.name, fmt='{doc[title]}')
+        self.assertTrue(len(titles) > 1)
+        self.assertEqual(answer['stdout'].splitlines(), titles)
+
+    def test_error(self):
+        answer = self.run_in_daemon(['list', '--no-such-option'])
+        self.assertEqual(answer['exit_code'], 2)
+        self.assertIn('--no-such-option', answer['stderr'])
+
+    def test_fallback(self):
+        self.assertIsNone(self.run_in_daemon(['list', '--pick']))
+        self.assertIsNone(self.run_in_daemon(['export']))
+        self.assertIsNone(self.run_in_daemon(['list', '--help']))
+        self.assertIsNone(self.run_in_daemon(['open']))
+        self.assertIsNotNone(self.run_in_daemon(['export', '--all']))
+        papis.config.set('use-daemon', 'False')
+        try:
+            self.assertIsNone(self.run_in_daemon(['list']))
+        finally:
+            papis.config.set('use-daemon', 'True')
+        # the daemon does not have the environment of the client
+        env = dict(papis.daemon.get_environment(), PAPIS_TEST='client')
+        answer = papis.daemon.request(dict(
+            op='run', args=['list'], cwd=os.getcwd(),
+            isatty=[False, False], env=env
+        ))
+        self.assertEqual(answer, dict(fallback=True))
+
+    def test_streamed(self):
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.connect(self.path)
+            sock.sendall(papis.daemon.json.dumps(dict(
+                op='run', args=['--lib', self.library.paths[0], 'list'],
+                cwd=os.getcwd(), isatty=[False, False],
+                env=papis.daemon.get_environment()
+            )).encode('utf-8') + b'\n')
+            with sock.makefile('rb') as fd:
+                answers = [papis.daemon.json.loads(line) for line in fd]
+        self.assertEqual(answers[-1], dict(exit_code=0))
+        self.assertTrue(any('stdout' in answer for answer in answers))
+
+    def test_timeout(self):
+        # a daemon that never answers
+        path = self.path + '-stuck'
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        server.bind(path)
+        server.listen(1)
+        papis.config.set('daemon-timeout', '0.2')
+        papis.config.set('daemon-socket', path)
+        try:
+            self.assertIsNone(self.run_in_daemon(['list']))
+        finally:
+            papis.config.set('daemon-timeout', '2.0')
+            papis.config.set('daemon-socket', self.path)
+            server.close()
+            os.remove(path)
+
+    def test_configuration_is_restored(self):
+        answer = self.run_in_daemon(
+            ['--set', 'format-doc-name', 'paper',
+             'list', '--format', '{paper[title]}'])
+        self.assertEqual(answer['exit_code'], 0)
+        self.assertEqual(papis.config.get('format-doc-name'), 'doc')
+        self.assertEqual(papis.config.get_lib(), self.library)
+
+    def test_query(self):
+        docs = papis.daemon.query('krishnamurti')
+        self.assertEqual(len(docs), 1)
+        self.assertTrue(os.path.exists(docs[0].get_info_file()))
+        docs = papis.daemon.query(sort='year:desc', limit=2)
+        self.assertEqual(len(docs), 2)
+        self.assertTrue(int(docs[0]['year']) >= int(docs[1]['year']))
+        with self.assertRaises(Exception):
+            papis.daemon.query(library='no such library')
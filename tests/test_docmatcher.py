@@ -19,3 +19,47 @@ def test_parse_query():
     assert(r[1][1] == '=')
     assert(r[1][2] == 'Albert einstein')
 
+
+def test_parse_range_query():
+    r = parse_query('year>=2015 einstein year < 2019')
+    assert(list(r[0]) == ['year', '>=', '2015'])
+    assert(list(r[1]) == ['einstein'])
+    assert(list(r[2]) == ['year', '<', '2019'])
+
+    r = get_range(parse_query('year = 2010..2015')[0])
+    assert(r.key == 'year')
+    assert(r.lower == (0, 2010.0)); assert(r.upper == (0, 2015.0))
+    assert(r.lower_inclusive and r.upper_inclusive)
+
+    r = get_range(parse_query('time-added = 2019-05-01..')[0])
+    assert(r.lower == (1, '2019-05-01')); assert(r.upper is None)
+
+    # regular expressions are not ranges
+    assert(get_range(parse_query('title = ein..stein')[0]) is None)
+    assert(get_range(parse_query('title = ..')[0]) is None)
+
+    # and neither is text around a comparison operator
+    r = parse_query('einstein > bohr')
+    assert([list(g) for g in r] == [['einstein'], ['bohr']])
+    r = parse_query('a<b year > unknown')
+    assert([list(g) for g in r] == [['a'], ['b'], ['year', '>', 'unknown']])
+
+
+def test_match_range():
+    import papis.document
+    docs = [
+        papis.document.from_data(dict(year=y))
+        for y in ['2009', 2015, '2019', 'unknown', '']
+    ]
+
+    def years(query):
+        r = get_range(parse_query(query)[0])
+        return [d['year'] for d in docs if match_range(d, r)]
+
+    assert(years('year >= 2015') == [2015, '2019'])
+    assert(years('year > 2015') == ['2019'])
+    assert(years('year <= 2015') == ['2009', 2015])
+    assert(years('year < 2015') == ['2009'])
+    assert(years('year = 2010..2019') == [2015, '2019'])
+    assert(years('year = ..2009') == ['2009'])
+    assert(years('year > a') == ['unknown'])
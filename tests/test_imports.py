@@ -0,0 +1,56 @@
+import subprocess
+import sys
+
+# Modules of the commands that only list or query documents, they should
+# import quickly since papis is often called many times from scripts
+LIGHT_MODULES = [
+    'papis.commands.list',
+    'papis.commands.export',
+    'papis.api',
+    'papis.database',
+    'papis.document',
+]
+
+# Modules that are slow to import and only needed by some commands
+HEAVY_MODULES = [
+    'prompt_toolkit',
+    'pygments',
+    'habanero',
+    'requests',
+    'bs4',
+    'stevedore',
+    'papis.tui',
+    'papis.pick',
+    'papis.crossref',
+    'papis.arxiv',
+    'papis.bibtex',
+]
+
+
+def get_imported_modules(module):
+    """Import a module in a new python process and get the names of all
+    the modules that it imports.
+    """
+    result = subprocess.run(
+        [
+            sys.executable, '-c',
+            'import sys; import {0}; print("\\n".join(sys.modules))'
+            .format(module)
+        ],
+        stdout=subprocess.PIPE,
+        universal_newlines=True,
+        check=True
+    )
+    return result.stdout.split()
+
+
+def test_light_modules():
+    for module in LIGHT_MODULES:
+        heavy = [
+            name for name in get_imported_modules(module)
+            if any(
+                name == heavy or name.startswith(heavy + '.')
+                for heavy in HEAVY_MODULES
+            )
+        ]
+        assert heavy == [], module
@@ -0,0 +1,50 @@
+import unittest
+from unittest.mock import patch
+
+from papis.pick import papis_pick
+
+
+class FakePicker(object):
+    """Picker that reads the options until the last one it is told to
+    pick, like a user picking before all the options are loaded.
+    """
+
+    pick = 1
+
+    def __init__(self, options, *args):
+        self.options = options
+        self.options_list = self
+
+    def run(self):
+        for i, option in enumerate(self.options):
+            if i == self.pick:
+                self.selection = option
+                break
+
+    def get_selection(self):
+        return self.selection
+
+    def close(self):
+        self.options.close()
+
+
+class Test(unittest.TestCase):
+
+    def get_options(self, count):
+        self.closed = False
+        try:
+            for i in range(count):
+                yield 'option {0}'.format(i)
+        finally:
+            self.closed = True
+
+    def test_generator(self):
+        with patch('papis.tui.app.Picker', FakePicker):
+            self.assertEqual(papis_pick(self.get_options(5)), 'option 1')
+        # the options that were not needed are not searched
+        self.assertTrue(self.closed)
+
+    def test_few_options(self):
+        self.assertEqual(papis_pick(self.get_options(0)), '')
+        self.assertEqual(papis_pick(self.get_options(1)), 'option 0')
+        self.assertEqual(papis_pick(['option']), 'option')
@@ -0,0 +1,77 @@
+import threading
+
+import papis.timing
+from papis.timing import span
+
+
+def get_phases():
+    return [(node.name, node.calls) for node in papis.timing.walk()]
+
+
+def test_disabled():
+    papis.timing.enable()
+    papis.timing.disable()
+    with span('load'):
+        pass
+    assert not papis.timing.is_enabled()
+    assert get_phases() == []
+
+
+def test_nested():
+    papis.timing.enable()
+    with span('database'):
+        with span('crawl'):
+            pass
+        with span('parse'):
+            pass
+    with span('filter'):
+        pass
+    with span('filter'):
+        pass
+    papis.timing.disable()
+    assert get_phases() == [
+        ('database', 1), ('crawl', 1), ('parse', 1), ('filter', 2)
+    ]
+    report = papis.timing.format_report().splitlines()
+    assert [line.split()[0] for line in report] == [
+        'phase', 'database', 'crawl', 'parse', 'filter', 'total'
+    ]
+    assert report[2].startswith('  crawl')
+
+
+def test_decorator():
+    @span('fib')
+    def fib(n):
+        return n if n < 2 else fib(n - 1) + fib(n - 2)
+
+    papis.timing.enable()
+    assert fib(3) == 2
+    papis.timing.disable()
+    assert get_phases() == [('fib', 1), ('fib', 2), ('fib', 2)]
+
+
+def test_threads():
+    papis.timing.enable()
+
+    def search():
+        with span('search'):
+            pass
+
+    with span('picker'):
+        thread = threading.Thread(target=search)
+        thread.start()
+        thread.join()
+    papis.timing.disable()
+    assert get_phases() == [('picker', 1), ('search', 1)]
+    assert [n.name for n in papis.timing.walk()][1] == 'search'
+    picker = next(papis.timing.walk())
+    assert picker.children == dict()
+
+
+def test_parse():
+    import papis.utils
+    papis.timing.enable()
+    papis.utils.folders_to_documents([])
+    papis.utils.in_main_thread()
+    papis.timing.disable()
+    assert get_phases() == [('parse', 1)]
@@ -0,0 +1,125 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+
+import papis.config
+import papis.database
+import papis.document
+import papis.library
+import papis.watcher
+import tests
+import tests.database
+
+
+def add_document(folder, title):
+    document = papis.document.from_data({'title': title})
+    document.set_folder(folder)
+    os.makedirs(folder)
+    document.save()
+    return document
+
+
+class WatcherTest(unittest.TestCase):
+
+    watcher_class = papis.watcher.InotifyWatcher
+
+    @classmethod
+    def setUpClass(cls):
+        tests.setup_test_library()
+        papis.config.set('watch-poll-interval', '0.05')
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp(prefix='papis-test-watcher-')
+        add_document(os.path.join(self.folder, 'a', 'einstein'), 'Einstein')
+        os.makedirs(os.path.join(self.folder, '.git', 'objects'))
+        self.watcher = self.watcher_class([self.folder])
+
+    def tearDown(self):
+        self.watcher.close()
+
+    def get_changes(self):
+        return papis.watcher.get_changes(
+            self.watcher, debounce=0.2, timeout=5)
+
+    def test_no_changes(self):
+        self.assertEqual(self.watcher.wait(0.1), set())
+
+    def test_edit(self):
+        folder = os.path.join(self.folder, 'a', 'einstein')
+        document = papis.document.from_folder(folder)
+        document['year'] = 1905
+        document.save()
+        self.assertEqual(self.get_changes(), set([folder]))
+
+    def test_add_and_remove(self):
+        folder = os.path.join(self.folder, 'b', 'bohr')
+        add_document(folder, 'Bohr')
+        changes = self.get_changes()
+        self.assertTrue(changes)
+        self.assertTrue(all(
+            folder == path or folder.startswith(path + os.sep)
+            for path in changes
+        ))
+        shutil.rmtree(os.path.join(self.folder, 'a'))
+        changes = self.get_changes()
+        self.assertTrue(changes)
+        self.assertTrue(all(
+            path.startswith(os.path.join(self.folder, 'a'))
+            for path in changes
+        ))
+
+    def test_hidden_folders(self):
+        with open(os.path.join(self.folder, '.git', 'objects', 'x'), 'w'):
+            pass
+        self.assertEqual(self.watcher.wait(0.2), set())
+
+    def test_apply_changes(self):
+        library = papis.library.Library('watched', [self.folder])
+        database = papis.database.get(library)
+        self.assertEqual(len(database.get_all_documents()), 1)
+        add_document(os.path.join(self.folder, 'b', 'bohr'), 'Bohr')
+        shutil.rmtree(os.path.join(self.folder, 'a'))
+        papis.watcher.apply_changes(database, self.get_changes())
+        titles = [d['title'] for d in database.get_all_documents()]
+        self.assertEqual(titles, ['Bohr'])
+        papis.database.clear_cached()
+
+
+class PollingWatcherTest(WatcherTest):
+
+    watcher_class = papis.watcher.PollingWatcher
+
+
+class WatchTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        tests.setup_test_library()
+        papis.config.set('watch-debounce', '0.1')
+
+    def test_watch(self):
+        # not the test library, which is shared with the other tests
+        library = tests.database.create_synthetic_library(3, self)
+        database = papis.database.get(library)
+        count = len(database.get_all_documents())
+        stop = threading.Event()
+        thread = threading.Thread(
+            target=papis.watcher.watch,
+            kwargs=dict(library=library, stop=stop, timeout=0.1))
+        thread.start()
+        try:
+            # the watcher needs some time to watch the folders
+            time.sleep(0.5)
+            add_document(
+                os.path.join(library.paths[0], 'watched'), 'Watched')
+            for _ in range(50):
+                if len(database.get_all_documents()) > count:
+                    break
+                time.sleep(0.1)
+        finally:
+            stop.set()
+            thread.join()
+        self.assertEqual(len(database.get_all_documents()), count + 1)
@@ -1,6 +1,5 @@
 from papis.tui.app import *
 import papis.config as config
-from prompt_toolkit.application.current import get_app
 
 
 def test_settings():
@@ -23,4 +22,100 @@ def test_settings():
     config.get('go_bottom_key', section='tui')
     config.get("editmode", section='tui')
 
-    ki = get_keys_info()
+    get_keys_info()
+
+
+def test_preview():
+    import papis.document
+    docs = [
+        papis.document.from_data({'title': 'Title {0}'.format(i)})
+        for i in range(3)
+    ]
+    picker = Picker(docs, header_filter=lambda d: d['title'])
+    picker.info_window.get_size = lambda columns: (80, 10)
+    picker.options_list.move_down()
+    picker.update_info_window()
+    picker.preview_executor.shutdown(wait=True)
+    picker.apply_preview()
+    assert(picker.info_window.text == 'title:   Title 1\n')
+    assert(list(picker.previews) == [(1, 80, 10)])
+    # previews are cached until the option is edited
+    picker.previews[(1, 80, 10)] = 'cached'
+    picker.update_info_window()
+    assert(picker.info_window.text == 'cached')
+    # or the window is resized
+    picker.info_window.get_size = lambda columns: (7, 10)
+    picker.preview_executor = ThreadPoolExecutor(max_workers=1)
+    picker.update_info_window()
+    picker.preview_executor.shutdown(wait=True)
+    picker.apply_preview()
+    assert(picker.info_window.text == 'title: \n')
+    picker.preview_executor = ThreadPoolExecutor(max_workers=1)
+    picker.clear_preview(1)
+    picker.preview_executor.shutdown(wait=True)
+    assert(not picker.previews)
+    picker.close()
+
+
+def test_stale_preview():
+    from unittest.mock import Mock
+    import papis.document
+    docs = [papis.document.from_data({'title': 'Title'})]
+    picker = Picker(docs, header_filter=lambda d: d['title'])
+    picker.update_info_window()
+    picker.preview_executor.shutdown(wait=True)
+    # the option is edited while its preview is being made
+    picker.preview_executor = Mock()
+    picker.clear_preview(0)
+    picker.apply_preview()
+    assert(not picker.previews)
+    assert(picker.info_window.text == '')
+    # and the preview is made again
+    assert(picker.preview_executor.submit.called)
+    picker.preview_executor = ThreadPoolExecutor(max_workers=1)
+    picker.close()
+
+
+def test_preview_does_not_wait_for_search():
+    from unittest.mock import Mock
+    import papis.document
+    docs = [
+        papis.document.from_data({'title': 'Title {0}'.format(i)})
+        for i in range(3)
+    ]
+    picker = Picker(docs, header_filter=lambda d: d['title'])
+    picker.info_window.get_size = lambda columns: (80, 10)
+    search_future = picker.options_list.search_future
+    picker.options_list.search_future = Mock()
+    picker.update_info_window()
+    picker.preview_executor.shutdown(wait=True)
+    picker.apply_preview()
+    assert(not picker.options_list.search_future.result.called)
+    assert(picker.info_window.text == 'title:   Title 0\n')
+    # but accepting the selection does
+    assert(picker.get_selection() is docs[0])
+    assert(picker.options_list.search_future.result.called)
+    picker.options_list.search_future = search_future
+    picker.preview_executor = ThreadPoolExecutor(max_workers=1)
+    picker.close()
+
+
+def test_streamed_options_use_pool():
+    from unittest.mock import patch
+    import papis.tui.widgets.list
+    from papis.tui.widgets.list import FILTER_CHUNK_SIZE, shutdown_pool
+    shutdown_pool()
+    options = (str(i) for i in range(FILTER_CHUNK_SIZE + 1000))
+    with patch('multiprocessing.cpu_count', return_value=2):
+        picker = Picker(options)
+        # the pool is started before the loader, from the main thread
+        pool = papis.tui.widgets.list._pool
+        assert(pool is not None)
+        picker.options_list.apply_loaded_options(wait=True)
+        with patch.object(pool, 'imap', wraps=pool.imap) as imap:
+            picker.options_list.search_buffer.text = '99'
+            picker.options_list.search_future.result()
+            assert(imap.called)
+        assert(picker.get_selection() == '99')
+    picker.close()
+    shutdown_pool()
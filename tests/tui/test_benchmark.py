@@ -0,0 +1,13 @@
+from benchmarks.picker import (
+    run_benchmark, format_results, BACKSPACE, MOVE_DOWN
+)
+
+
+def test_run_benchmark():
+    results = run_benchmark(200, 'ab' + BACKSPACE + MOVE_DOWN)
+    assert(results['size'] == 200)
+    assert(results['visible']['count'] == 3)
+    assert(results['move']['count'] == 1)
+    assert(results['frames'] > 0)
+    assert(results['first_frame'] <= results['loaded'])
+    assert('200 options' in format_results(results))
@@ -21,6 +21,7 @@ def test_info_window():
     assert(iw.text == '')
     iw.text = ' info'
     assert(iw.text == ' info')
+    assert(iw.get_size(80) == (80, iw.max_height))
     assert(not iw.filter())
     app.layout.focus(iw.window)
     assert(app.layout.has_focus(iw))
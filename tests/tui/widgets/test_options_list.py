@@ -1,5 +1,6 @@
 from papis.tui.widgets.list import *
 from prompt_toolkit.layout.screen import Point
+import itertools
 import re
 
 
@@ -85,3 +86,306 @@ def test_basic():
 def test_match_against_regex():
     assert(match_against_regex(re.compile(r'.*he.*'), 'he', 2) == 2)
     assert(match_against_regex(re.compile(r'hes'), 'he', 2) is None)
+
+
+def test_filter_indices():
+    lines = ['hello', 'world', 'bye']
+    assert(filter_indices(re.compile('.*o'), lines, [3, 5, 8]) == [3, 5])
+    assert(filter_indices(re.compile('.*z'), lines, [3, 5, 8]) == [])
+
+
+def test_filter_chunks():
+    options = [str(i) for i in range(FILTER_CHUNK_SIZE + 1000)]
+    ol = OptionsList(options, cpu_count=2)
+    ol.search_buffer.text = '99'
+    expected = [i for i, o in enumerate(options) if '99' in o]
+    assert(ol.indices == expected)
+    # the query got longer, so only the previous matches are searched
+    ol.search_buffer.text = '999'
+    assert(ol.indices == [i for i in expected if '999' in options[i]])
+    assert(ol.get_selection() == options[ol.indices[0]])
+    del ol
+
+
+def test_shared_pool():
+    import papis.tui.widgets.list
+    shutdown_pool()
+    # short lists are filtered without starting the pool
+    ol = OptionsList([str(i) for i in range(1000)], cpu_count=2)
+    ol.search_buffer.text = '99'
+    assert(papis.tui.widgets.list._pool is None)
+    options = [str(i) for i in range(FILTER_CHUNK_SIZE + 1000)]
+    ol = OptionsList(options, cpu_count=2)
+    ol.search_buffer.text = '99'
+    pool = papis.tui.widgets.list._pool
+    assert(pool is not None)
+    ol = OptionsList(options, cpu_count=2)
+    ol.search_buffer.text = '98'
+    assert(papis.tui.widgets.list._pool is pool)
+    shutdown_pool()
+    assert(papis.tui.widgets.list._pool is None)
+
+
+def test_pool_in_background():
+    import papis.tui.widgets.list
+    shutdown_pool()
+    options = [str(i) for i in range(FILTER_CHUNK_SIZE + 1000)]
+    # the searches in the background do not fork the pool
+    ol = OptionsList(options, search_in_background=True, cpu_count=2)
+    ol.search_buffer.text = '99'
+    assert(ol.get_selection() == '99')
+    assert(papis.tui.widgets.list._pool is None)
+    ol.close()
+    # but they use it if it was started in the main thread
+    prepare_pool(len(options))
+    pool = papis.tui.widgets.list._pool
+    assert(pool is not None or multiprocessing.cpu_count() == 1)
+    ol = OptionsList(options, search_in_background=True, cpu_count=2)
+    ol.search_buffer.text = '98'
+    assert(ol.get_selection() == '98')
+    assert(papis.tui.widgets.list._pool is pool)
+    ol.close()
+    shutdown_pool()
+
+
+def test_search_in_background():
+    options = [str(i) for i in range(1000)]
+    ol = OptionsList(options, search_in_background=True)
+    done = []
+    ol.on_search_done += lambda o: done.append(o.search_generation)
+    ol.search_buffer.text = '1'
+    ol.search_buffer.text = '12'
+    ol.search_buffer.text = '99'
+    # the selection always waits for the last search
+    assert(ol.get_selection() == '99')
+    assert(ol.indices == [i for i, o in enumerate(options) if '99' in o])
+    assert(done[-1] == ol.search_generation)
+    # results are applied only once
+    assert(not ol.apply_search_results())
+    # stale results are discarded
+    ol.search_results = (ol.search_generation - 1, '1', [1], 1000)
+    assert(not ol.apply_search_results())
+    # the last search is applied when closing
+    ol.search_buffer.text = '98'
+    ol.close()
+    assert(ol.search_executor is None)
+    assert(ol.get_selection() == '98')
+
+
+def test_virtual_rendering():
+    rendered = []
+
+    def header_filter(option):
+        rendered.append(option)
+        return '{0}\n  line'.format(option)
+
+    from prompt_toolkit.buffer import Buffer
+    options = [str(i) for i in range(10000)]
+    ol = OptionsList(
+        options, header_filter=header_filter, search_buffer=Buffer()
+    )
+    assert(len(rendered) == 1)
+    content = ol.get_content()
+    assert(len(rendered) < 500)
+    assert(content.line_count == 2 * len(options))
+    assert(content.get_line(3) == [('', '  line')])
+    assert(content.get_line(4) == [('', '2')])
+    ol.go_bottom()
+    tokens = ol.get_tokens()
+    assert(tokens[-1] == ('', '9999\n  line\n'))
+    assert(ol.cursor == Point(0, 2 * (len(options) - 1)))
+    content = ol.get_content()
+    assert(content.get_line(2 * len(options) - 2) == [('', '9999')])
+    assert(len(rendered) < 1000)
+    assert(ol.index_to_line(9999) == 2 * 9999)
+    del ol
+
+
+def test_fenwick_tree():
+    import random
+    values = [random.randint(1, 5) for i in range(100)]
+    tree = FenwickTree(iter(values))
+    for i in range(20):
+        position = random.randrange(len(values))
+        delta = random.randint(-1, 3)
+        values[position] += delta
+        tree.add(position, delta)
+    assert(tree.total == sum(values))
+    for i in range(len(values) + 1):
+        assert(tree.prefix_sum(i) == sum(values[:i]))
+    for i in range(50):
+        values.append(random.randint(1, 5))
+        tree.append(values[-1])
+    tree.add(120, 2)
+    values[120] += 2
+    assert(tree.total == sum(values))
+    for i in range(len(values) + 1):
+        assert(tree.prefix_sum(i) == sum(values[:i]))
+
+
+def test_positions():
+    from prompt_toolkit.buffer import Buffer
+    ol = OptionsList(
+        [str(i) for i in range(100)],
+        header_filter=lambda x: x + ('\nsecond' if x.endswith('1') else ''),
+        search_buffer=Buffer()
+    )
+    ol.search_buffer.text = '1'
+    assert(ol.positions == dict((i, p) for p, i in enumerate(ol.indices)))
+    ol.get_tokens()
+    assert(ol.index_to_line(ol.indices[2]) ==
+           sum(ol.options_headers_linecount[i] for i in ol.indices[:2]))
+    assert(ol.index_to_line(2) is None)
+    ol.go_bottom()
+    ol.move_down()
+    assert(ol.current_index == ol.indices[0])
+    ol.move_up()
+    assert(ol.current_index == ol.indices[-1])
+    del ol
+
+
+def test_marked_lines():
+    ol = OptionsList([str(i) for i in range(100)])
+    ol.set_filtered_indices('2', ol.match_indices('2', list(range(100))))
+    ol.current_index = ol.indices[0]
+    ol.marks.append(12)
+    line = ol.index_to_line(12)
+    assert(ol.get_line_prefix(line, 0)[0][1] == '#')
+    # as many matches, but 12 is not one of them
+    ol.set_filtered_indices('3', ol.match_indices('3', list(range(100))))
+    assert(len(ol.indices) == len(ol.match_indices('2', list(range(100)))))
+    assert(ol.get_line_prefix(line, 0)[0][1] != '#')
+    del ol
+
+
+def test_fuzzy_score():
+    assert(fuzzy_score('', 'anything') == 0)
+    assert(fuzzy_score('abc', 'ab') is None)
+    # word boundaries are better than the middle of words
+    assert(fuzzy_score('st', 'string') > fuzzy_score('st', 'list'))
+    # consecutive characters are better than gaps
+    assert(fuzzy_score('ein', 'einstein') > fuzzy_score('ein', 'e i n'))
+    # the shortest match is scored
+    assert(fuzzy_score('ab', 'a xx ab') == fuzzy_score('ab', 'ab'))
+
+
+def test_fuzzy_mode():
+    from prompt_toolkit.buffer import Buffer
+    options = ['Heisenberg Werner', 'Bohr Niels', 'Einstein Albert', 'Eisen']
+    ol = OptionsList(options, match_mode='fuzzy', search_buffer=Buffer())
+    ol.search_buffer.text = 'ein'
+    assert(ol.indices == [2, 3, 0])
+    assert(ol.get_selection() == 'Einstein Albert')
+    ol.search_buffer.text = 'ein wer'
+    assert(ol.indices == [0])
+    ol.search_buffer.text = ''
+    assert(ol.indices == [0, 1, 2, 3])
+    del ol
+
+
+def test_close_while_streaming():
+    closed = []
+
+    def options():
+        try:
+            for i in itertools.count():
+                yield str(i)
+        finally:
+            closed.append(True)
+
+    ol = OptionsList(options(), search_buffer=Buffer(multiline=False))
+    ol.close()
+    # the endless options are not loaded anymore
+    assert(closed == [True])
+    assert(not ol.loading)
+
+    # closing in the middle of a batch does not wait for the rest of it
+    loaded = []
+
+    def slow_options():
+        for i in itertools.count():
+            loaded.append(i)
+            if i == STREAM_FIRST_BATCH + 50:
+                ol.stop_loading.set()
+            yield str(i)
+
+    ol = OptionsList([], search_buffer=Buffer(multiline=False))
+    ol.stream_options(slow_options())
+    ol.loader.join()
+    assert(len(loaded) == STREAM_FIRST_BATCH + 51)
+    ol.close()
+
+
+def test_stream_options():
+    options = [str(i) for i in range(1000)]
+    ol = OptionsList(
+        (o for o in options), search_buffer=Buffer(multiline=False)
+    )
+    ol.apply_loaded_options(wait=True)
+    assert(not ol.loading)
+    assert(ol.options == options)
+    assert(list(ol.indices) == list(range(1000)))
+    assert(ol.index_to_line(999) == 999)
+    assert(ol.get_selection() == '0')
+    assert(not ol.apply_loaded_options())
+
+    # the query is applied to the options that come later
+    ol = OptionsList([], search_buffer=Buffer(multiline=False))
+    ol.search_buffer.text = '99'
+    ol.stream_options(iter(options))
+    ol.apply_loaded_options(wait=True)
+    assert(ol.indices == [i for i, o in enumerate(options) if '99' in o])
+    assert(ol.get_selection() == '99')
+    ol.move_down()
+    assert(ol.get_selection() == '199')
+
+    # options added while searching in the background are filtered too
+    ol = OptionsList(
+        options[:100], search_in_background=True,
+        search_buffer=Buffer(multiline=False)
+    )
+    ol.search_buffer.text = '5'
+    ol.search_future.result()
+    ol.append_options(options[100:], options[100:])
+    ol.apply_search_results()
+    assert(ol.indices == [i for i, o in enumerate(options) if '5' in o])
+
+
+def test_query_cache():
+    options = ['{0} {1}'.format(i % 7, i % 11) for i in range(1000)]
+    ol = OptionsList(options, search_buffer=Buffer(multiline=False))
+    searched = []
+    match_indices = ol.match_indices
+
+    def spy(query_text, search_indices, *args):
+        searched.append(len(search_indices))
+        return match_indices(query_text, search_indices, *args)
+
+    ol.match_indices = spy
+    ol.search_buffer.text = '3'
+    ol.search_buffer.text = '3 5'
+    assert(searched == [1000, len([o for o in options if '3' in o])])
+    # going back to a query does not match the options again
+    ol.search_buffer.text = '3'
+    assert(searched[2:] == [])
+    assert(ol.indices == [i for i, o in enumerate(options) if '3' in o])
+
+    # the cached queries in the query narrow the candidates
+    ol.search_buffer.text = '5'
+    ol.search_buffer.text = '5 3'
+    assert(searched[-1] == len([
+        o for o in options if '3' in o and '5' in o
+    ]))
+    assert(ol.indices == [
+        i for i, o in enumerate(options) if re.match('.*5.*3', o)
+    ])
+    # an edit in the middle of the query narrows from a contained query
+    ol.search_buffer.text = '5 4'
+    ol.search_buffer.text = '5 34'
+    assert(searched[-1] == len([
+        o for o in options
+        if re.match('.*5.*3', o) and re.match('.*5.*4', o)
+    ]))
+    assert(ol.indices == [
+        i for i, o in enumerate(options) if re.match('.*5.*34', o)
+    ])